@@ -0,0 +1,56 @@
+# Copyright © 2024 UNISI Tech. All rights reserved.
+"""
+A client scrolling a 100 000 row persistent table chunk by chunk, 1 ms
+between its requests: the wait per chunk and the chunks left cached, with an
+unbounded delta_list and no read-ahead (the former get_chunk) against the
+bounded LRU delta_list (config.chunk_cache) and get_chunk reading the next
+chunk ahead.
+
+    python benchmarks/bench_chunk_cache.py [rows]
+"""
+import asyncio, os, sys, tempfile, time
+import bench_utils
+from bench_utils import report
+
+import config
+from unisi.common import ArgObject
+from unisi.db import Database
+from unisi.dbunits import Dblist
+from unisi.tables import get_chunk
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+async def former_get_chunk(obj, start_index):
+    delta, data = await obj.rows.aget_delta_chunk(start_index)
+    return {'update': 'updates', 'index': delta, 'data': data}
+
+async def scroll(table, get):
+    table.rows = Dblist(table.rows.dbtable, init_list = [])
+    waits = []
+    for start in range(0, ROWS, table.rows.limit):
+        begin = time.perf_counter()
+        await get(table, start)
+        waits.append(time.perf_counter() - begin)
+        await asyncio.sleep(0.001)
+    return sum(waits) / len(waits), table.rows.delta_list.stats
+
+def main():
+    folder = tempfile.mkdtemp(prefix = 'unisi_bench_')
+    db = Database(os.path.join(folder, 'chunks.db'))
+    dbtable = db.create_table('Orders', {'item': str, 'qty': int, 'price': float}, limit = 100)
+    dbtable.append_rows([[f'item {i}', i % 50, i * 0.5] for i in range(ROWS)])
+    table = ArgObject(rows = dbtable.list)
+    rows = []
+    for name, size, get in (('unbounded, no read-ahead', 0, former_get_chunk),
+            (f'LRU of {config.chunk_cache}, read-ahead', config.chunk_cache, get_chunk)):
+        config.chunk_cache = size
+        wait, stats = asyncio.run(scroll(table, get))
+        rows.append([name, wait * 1e3, str(stats['chunks']), str(stats['hits']), str(stats['misses']),
+            str(stats['evictions']), str(stats['read_aheads'])])
+    report(f'scrolling {ROWS} rows by chunks of {dbtable.limit}, wait per chunk in ms', rows,
+        ['delta_list', 'wait', 'cached', 'hits', 'misses', 'evictions', 'read-aheads'])
+    db.close()
+    Database.delete(folder)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# Copyright © 2024 UNISI Tech. All rights reserved.
+"""
+Connect latency of 100 concurrent websocket connects to the real server
+handler: from opening the socket to receiving the screen, with each session
+loading its screen from the importlib loader (the former path: a stat, a
+__pycache__ read and an unmarshal every time) against the compiled code cache
+of unisi/modules.py.
+
+The screen is a 150-field form split into blocks, plus a blocks module.
+
+    python benchmarks/bench_connect.py
+"""
+import asyncio, importlib.util, os, statistics, sys, tempfile, time
+import bench_utils
+from bench_utils import report
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+CONNECTS = 100
+
+def screen_source():
+    lines = ['from unisi import *', 'from blocks.footer import footer', "name = 'Form'", '']
+    for i in range(150):
+        lines.append(f"field{i} = Edit('Field {i}', '', lambda _, value: setattr(field{i}, 'value', value.strip()))")
+    for b in range(15):
+        fields = ', '.join(f'field{i}' for i in range(b * 10, b * 10 + 10))
+        lines.append(f"block{b} = Block('Block {b}', [{fields}])")
+    lines.append(f"blocks = [{', '.join(f'block{b}' for b in range(15))}, footer]")
+    return '\n'.join(lines) + '\n'
+
+def make_app():
+    app = tempfile.mkdtemp(prefix = 'unisi_bench_app_')
+    for folder in ('screens', 'blocks'):
+        os.makedirs(os.path.join(app, folder))
+    with open(os.path.join(app, 'screens', 'form.py'), 'w') as file:
+        file.write(screen_source())
+    with open(os.path.join(app, 'blocks', 'footer.py'), 'w') as file:
+        file.write("from unisi import *\nfooter = Block('Footer', Button('Submit'))\n")
+    os.chdir(app)
+    sys.path.insert(0, app)
+
+def loader_code(path):
+    """what spec.loader.exec_module did before the code cache"""
+    name = os.path.basename(path)[:-3]
+    return importlib.util.spec_from_file_location(name, path).loader.get_code(name)
+
+async def connect(session, url):
+    start = time.perf_counter()
+    async with session.ws_connect(url) as ws:
+        await ws.receive()
+        latency = time.perf_counter() - start
+        await ws.send_str('close')
+    return latency
+
+async def connects(server):
+    url = server.make_url('/ws')
+    async with aiohttp.ClientSession() as session:
+        await connect(session, url) #warm up
+        return await asyncio.gather(*(connect(session, url) for _ in range(CONNECTS)))
+
+async def main():
+    make_app()
+    from unisi import modules, server
+    from unisi.users import User
+    User._screen_registry_ready = False
+    app = web.Application()
+    app.add_routes([web.get('/ws', server.websocket_handler)])
+    async with TestServer(app) as test_server:
+        rows = []
+        cached = modules.screen_code
+        for title, code in (('importlib loader', loader_code), ('code cache', cached)):
+            modules.screen_code = code
+            latencies = sorted(await connects(test_server))
+            rows.append([title, statistics.median(latencies) * 1e3,
+                latencies[int(CONNECTS * 0.95) - 1] * 1e3, latencies[-1] * 1e3])
+        modules.screen_code = cached
+    report(f'{CONNECTS} concurrent connects, ms to the screen', rows, ['screen code', 'p50', 'p95', 'max'])
+
+if __name__ == '__main__':
+    asyncio.run(main())
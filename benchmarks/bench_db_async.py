@@ -0,0 +1,66 @@
+# Copyright © 2024 UNISI Tech. All rights reserved.
+"""
+Event loop latency while N sessions scroll a 100 000 row persistent table:
+every chunk read by get_delta_chunk in the event loop against
+aget_delta_chunk reading it in the reader threads of the Database. A ticker
+task sleeping 1 ms measures how late the loop wakes it up.
+
+    python benchmarks/bench_db_async.py [rows]
+"""
+import asyncio, os, random, statistics, sys, tempfile, time
+import bench_utils
+from bench_utils import report
+
+from unisi.db import Database
+from unisi.dbunits import Dblist
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+READS = 40 #chunks per scroller
+
+async def ticker(lateness, stop):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lateness.append(time.perf_counter() - start - 0.001)
+
+async def scroller(table, read_async, seed):
+    rand = random.Random(seed)
+    rows = Dblist(table, init_list = [])
+    for _ in range(READS):
+        index = rand.randrange(table.limit, table.length)
+        if read_async:
+            delta, _ = await rows.aget_delta_chunk(index)
+        else:
+            delta, _ = rows.get_delta_chunk(index)
+            await asyncio.sleep(0) #the next message
+        rows.delta_list.pop(delta, None)
+
+async def run(table, scrollers, read_async):
+    lateness, stop = [], asyncio.Event()
+    tick = asyncio.create_task(ticker(lateness, stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(scroller(table, read_async, i) for i in range(scrollers)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await tick
+    lateness.sort()
+    return elapsed, statistics.median(lateness), lateness[int(len(lateness) * 0.99)], lateness[-1]
+
+def main():
+    path = os.path.join(tempfile.mkdtemp(prefix = 'unisi_bench_'), 'scroll.db')
+    db = Database(path)
+    table = db.create_table('Orders', {'item': str, 'qty': int, 'price': float, 'note': str}, limit = 100)
+    table.append_rows([[f'item {i}', i % 50, i * 0.5, f'note for order {i}'] for i in range(ROWS)])
+    rows = []
+    for scrollers in (1, 10, 50):
+        for read_async in (False, True):
+            elapsed, p50, p99, worst = asyncio.run(run(table, scrollers, read_async))
+            rows.append([str(scrollers), 'aget_delta_chunk' if read_async else 'get_delta_chunk',
+                f'{scrollers * READS / elapsed:.0f}', p50 * 1e3, p99 * 1e3, worst * 1e3])
+    report(f'event loop lateness with scrollers of {ROWS} rows, {READS} chunks each, ms', rows,
+        ['scrollers', 'read', 'chunks/s', 'p50', 'p99', 'max'])
+    db.close()
+    Database.delete(os.path.dirname(path))
+
+if __name__ == '__main__':
+    main()
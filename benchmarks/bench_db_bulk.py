@@ -0,0 +1,58 @@
+# Copyright © 2024 UNISI Tech. All rights reserved.
+"""
+Bulk inserts of 10 000 and 100 000 rows into a persistent table and of as
+many links into a junction table: a commit per statement (the former
+behaviour) against one unit of work, db.transaction().
+
+    python benchmarks/bench_db_bulk.py [rows ...]
+"""
+import os, sys, tempfile, time
+import bench_utils
+from bench_utils import report
+
+from unisi.db import Database
+
+SIZES = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000]
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+def main():
+    folder = tempfile.mkdtemp(prefix = 'unisi_bench_')
+    rows = []
+    for size in SIZES:
+        data = [[f'item {i}', i % 50, i * 0.5] for i in range(size)]
+        db = Database(os.path.join(folder, f'bulk{size}.db'))
+        orders = db.create_table('Orders', {'item': str, 'qty': int, 'price': float})
+        users = db.create_table('Users', {'name': str}, rows = [['Alice']])
+        relname, _ = orders.setup_junction('Users', {})
+
+        def per_row():
+            for row in data:
+                orders.append_row(row)
+        def per_row_in_transaction():
+            with db.transaction():
+                for row in data:
+                    orders.append_row(row)
+        ids = [row[-1] for row in orders.append_rows(data)]
+        def links_per_row():
+            for id in ids:
+                orders.add_link(id, 'Users', 1, link_index_name = relname)
+        def links_in_transaction():
+            orders.add_links('Users', ids, 1, link_index_name = relname)
+
+        for name, commit, batched in (
+                ('append_row', per_row, per_row_in_transaction),
+                ('Dblist.extend', per_row, lambda: orders.list.extend(data)),
+                ('add_links', links_per_row, links_in_transaction)):
+            before, after = timed(commit), timed(batched)
+            rows.append([str(size), name, before * 1e3, after * 1e3, f'{size / after:.0f}', f'{before / after:.1f}x'])
+        db.close()
+    report('bulk inserts, ms', rows,
+        ['rows', 'operation', 'commit per row', 'transaction', 'rows/s', 'speedup'])
+    Database.delete(folder)
+
+if __name__ == '__main__':
+    main()
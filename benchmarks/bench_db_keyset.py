@@ -0,0 +1,51 @@
+# Copyright © 2024 UNISI Tech. All rights reserved.
+"""
+Chunk reads of a 1 100 000 row persistent table at offsets 0, 100 000 and
+1 000 000: LIMIT/OFFSET (the former read_rows) against the keyset reads of
+Dbtable.read_rows, scrolling on from the previous chunk or jumping there
+through the sampled offset -> ID map.
+
+    python benchmarks/bench_db_keyset.py [rows]
+"""
+import os, sys, tempfile, time
+import bench_utils
+from bench_utils import measure, report
+
+from unisi.db import Database
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_100_000
+OFFSETS = [offset for offset in (0, 100_000, 1_000_000) if offset < ROWS]
+
+def main():
+    folder = tempfile.mkdtemp(prefix = 'unisi_bench_')
+    db = Database(os.path.join(folder, 'keyset.db'))
+    table = db.create_table('Orders', {'item': str, 'qty': int, 'price': float}, limit = 100)
+    for start in range(0, ROWS, 100_000):
+        table.append_rows([[f'item {i}', i % 50, i * 0.5] for i in range(start, min(start + 100_000, ROWS))])
+    offset_query = f'SELECT {table._select_cols()} FROM [Orders] ORDER BY ID LIMIT ? OFFSET ?'
+
+    start = time.perf_counter()
+    table.read_rows(skip = table.sample_every)
+    sampling = time.perf_counter() - start
+
+    rows = []
+    for offset in OFFSETS:
+        expected = db.qlist(offset_query, (table.limit, offset), table._row_to_list)
+        table.read_rows(skip = max(offset - table.limit, 0))
+        keys = {offset: table._keys[offset]} if offset else {}
+        def scroll():
+            table._keys = dict(keys)
+            return table.read_rows(skip = offset)
+        def jump():
+            table._keys = {}
+            return table.read_rows(skip = offset)
+        assert scroll() == jump() == expected
+        old = measure(lambda: db.qlist(offset_query, (table.limit, offset), table._row_to_list))
+        rows.append([str(offset), old * 1e3, measure(scroll) * 1e3, measure(jump) * 1e3])
+    report(f'chunk of {table.limit} rows of {ROWS}, ms (offset -> ID map sampled in {sampling * 1e3:.0f} ms)',
+        rows, ['offset', 'LIMIT/OFFSET', 'keyset scroll', 'keyset jump'])
+    db.close()
+    Database.delete(folder)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+# Copyright © 2024 UNISI Tech. All rights reserved.
+"""
+Search of a 1 000 000 row persistent table, as typed into the search field of
+its Table: LIKE over every searchable column (the former search_rows)
+against the FTS5 trigram index of Dbtable.setup_fts, for a string matching
+many rows, one row and none, and for calc_linked_rows_fk.
+
+    python benchmarks/bench_db_search.py [rows]
+"""
+import os, random, sys, tempfile, time
+import bench_utils
+from bench_utils import measure, report
+
+from unisi.db import Database
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+WORDS = ['red', 'green', 'blue', 'large', 'small', 'steel', 'wooden', 'chair', 'table', 'lamp', 'shelf', 'desk']
+
+def main():
+    rand = random.Random(1)
+    folder = tempfile.mkdtemp(prefix = 'unisi_bench_')
+    db = Database(os.path.join(folder, 'search.db'))
+    db.create_table('Customers', {'name': str}, rows = [[f'customer {i}'] for i in range(100)])
+    table = db.create_table('Orders', {'item': str, 'note': str, 'qty': int})
+    table.setup_fk('Customers')
+    for start in range(0, ROWS, 100_000):
+        table.append_rows([[' '.join(rand.sample(WORDS, 3)), f'order note {i}', i % 50, i % 100 + 1]
+            for i in range(start, min(start + 100_000, ROWS))])
+    table.append_row(['golden throne', 'the only one', 1, 7])
+
+    start = time.perf_counter()
+    table.setup_fts()
+    indexing = time.perf_counter() - start
+
+    searches = [('many rows', 'steel chair'), ('one row', 'golden'), ('no row', 'platinum')]
+    rows = []
+    for name, search in searches:
+        for label, call in (('search_rows', lambda: table.search_rows(search)),
+                ('calc_linked_rows_fk', lambda: table.calc_linked_rows_fk([7], search))):
+            fts = table.fts
+            with_index = call().cache
+            indexed = measure(call, repeat = 3)
+            table.fts = None
+            assert call().cache == with_index
+            like = measure(call, repeat = 3)
+            table.fts = fts
+            rows.append([label, f'{search!r} ({name})', str(len(with_index)), like * 1e3, indexed * 1e3,
+                f'{like / indexed:.0f}x'])
+    report(f'search of {ROWS} rows, ms (index built in {indexing:.1f} s)', rows,
+        ['method', 'search', 'rows', 'LIKE', 'FTS5', 'speedup'])
+    db.close()
+    Database.delete(folder)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# Copyright © 2024 UNISI Tech. All rights reserved.
+"""
+Recipients of dbupdates among 5 000 connected sessions spread over 100
+screens, the updated table shown on 1 or 10 of them: the former scan of all
+sessions per update against the screen index of Unishare.sessions (the
+sessions of a screen, the screens of a table in dbshare).
+
+    python benchmarks/bench_dbshare_index.py [sessions]
+"""
+import sys
+from collections import defaultdict
+import bench_utils
+from bench_utils import measure, report
+
+from unisi.common import ArgObject, Unishare
+from unisi.dbunits import dbshare
+from unisi.users import dbupdate_deliveries
+
+SESSIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+SCREENS = 100
+
+class Session:
+    """stands in for a connected User: its screen and hibernation flag"""
+    def __init__(self, screen):
+        self.screen = screen
+        self.hibernated = False
+
+def scan_deliveries(updates, sender = None):
+    screen_users = defaultdict(list)
+    for user in Unishare.sessions.values():
+        if not user.hibernated:
+            screen_users[user.screen.name].append(user)
+    deliveries = []
+    for id, id_updates in updates.items():
+        screen2el_bl = dbshare[id]
+        for update in id_updates:
+            if update:
+                exclude = update.get('exclude', False)
+                for scr_name, elem_blocks in screen2el_bl.items():
+                    recipients = [user for user in screen_users.get(scr_name, ())
+                        if not exclude or user is not sender]
+                    for elem_block in elem_blocks:
+                        deliveries.append(({**update, **elem_block}, recipients))
+    return deliveries
+
+def main():
+    screens = [ArgObject(name = f'Screen {i}') for i in range(SCREENS)]
+    Unishare.sessions.clear()
+    for i in range(SESSIONS):
+        Unishare.sessions[f'session{i}'] = Session(screens[i % SCREENS])
+    row = [f'cell {c}' for c in range(20)] + [1]
+    rows = []
+    for shown_on in (1, 10):
+        dbshare.clear()
+        for screen in screens[:shown_on]:
+            dbshare['table'][screen.name].append({'element': 'Orders', 'block': 'Main'})
+        for nupdates in (1, 20):
+            updates = {'table': [dict(type = 'action', update = 'update', index = i, data = row, exclude = True)
+                for i in range(nupdates)]}
+            recipients = sum(len(users) for _, users in dbupdate_deliveries(updates))
+            assert recipients == sum(len(users) for _, users in scan_deliveries(updates))
+            scan = measure(lambda: scan_deliveries(updates), number = 20)
+            index = measure(lambda: dbupdate_deliveries(updates), number = 20)
+            rows.append([str(shown_on), str(nupdates), str(recipients), scan * 1e3, index * 1e3, f'{scan / index:.0f}x'])
+    report(f'dbupdate recipients among {SESSIONS} sessions on {SCREENS} screens, ms per call', rows,
+        ['screens of the table', 'updates', 'recipients', 'scan', 'index', 'speedup'])
+    Unishare.sessions.clear()
+    dbshare.clear()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+# Copyright © 2024 UNISI Tech. All rights reserved.
+"""
+Update messages for one changed property of a big unit: the whole unit
+against an update carrying only the changed properties (a session on
+/ws?delta, see User._set_deltas).
+
+    python benchmarks/bench_delta.py
+"""
+import bench_utils
+from bench_utils import measure, report
+
+from unisi import Select, Table
+from unisi.common import Message, toJson
+from unisi.units import take_delta
+
+class Session:
+    """what set_reactivity needs of a User"""
+    def register_changed_unit(self, unit, property = None, value = None):
+        pass
+
+def update_message(unit, delta):
+    message = Message(unit)
+    message.updates[0]['path'] = [unit.name, 'Block']
+    if delta:
+        message.updates[0]['delta'] = delta
+    return message
+
+def scenarios():
+    options = [f'option {i}' for i in range(10_000)]
+    select = Select('Select', options[0], options = options)
+    yield '10k-option Select, value', select, lambda: setattr(select, 'value', options[5000])
+
+    headers = [f'column {c}' for c in range(50)]
+    rows = [[f'r{r}c{c}' for c in range(50)] for r in range(2000)]
+    table = Table('Wide', headers = headers, rows = rows)
+    yield '2000x50 Table, selection', table, lambda: setattr(table, 'value', 7)
+    yield '2000x50 Table, one cell', table, lambda: table.rows[7].__setitem__(3, 'edited')
+
+def main():
+    rows = []
+    session = Session()
+    for title, unit, change in scenarios():
+        unit.set_reactivity(session)
+        take_delta(unit)
+        change()
+        delta = take_delta(unit)
+        full_message, delta_message = update_message(unit, None), update_message(unit, delta)
+        full_text, delta_text = toJson(full_message), toJson(delta_message)
+        full = measure(lambda: toJson(full_message))
+        partial = measure(lambda: toJson(delta_message))
+        rows.append([title, ','.join(delta), str(len(full_text)), str(len(delta_text)),
+            full * 1e3, partial * 1e3, f'{full / partial:.0f}x'])
+    report('update message for one change, bytes and encode ms', rows,
+        ['unit, change', 'delta', 'whole bytes', 'delta bytes', 'whole ms', 'delta ms', 'speedup'])
+
+if __name__ == '__main__':
+    main()
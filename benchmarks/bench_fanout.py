@@ -0,0 +1,67 @@
+# Copyright © 2024 UNISI Tech. All rights reserved.
+"""
+User.sync_dbupdates fan-out with N shared sessions: the former
+encode-per-recipient loop against the encode-once fan_out.
+
+    python benchmarks/bench_fanout.py
+"""
+import asyncio
+import bench_utils
+from bench_utils import measure, report
+
+from unisi.common import ArgObject, Unishare, toJson
+from unisi.dbunits import dbshare, dbupdates
+from unisi.users import User
+
+class Session:
+    """stands in for a connected User: a screen name and a websocket send"""
+    def __init__(self, screen):
+        self.screen = screen
+        self.frames = 0
+
+    async def send(self, res):
+        if type(res) != str:
+            res = toJson(res)
+        self.frames += 1
+
+async def legacy_sync_dbupdates(self):
+    sync_calls = []
+    for id, updates in dbupdates.items():
+        for update in updates:
+            if update:
+                screen2el_bl = dbshare[id]
+                exclude = update.get('exclude', False)
+                for user in Unishare.sessions.values():
+                    if not exclude or user is not self:
+                        scr_name = user.screen.name
+                        if scr_name in screen2el_bl:
+                            for elem_block in screen2el_bl[scr_name]:
+                                sync_calls.append(user.send({**update, **elem_block}))
+    dbupdates.clear()
+    await asyncio.gather(*sync_calls)
+
+def run(sync, origin, nupdates):
+    row = [f'cell {c}' for c in range(20)] + [1]
+    for i in range(nupdates):
+        dbupdates['table'].append(dict(type = 'action', update = 'update', index = i, data = row, exclude = True))
+    asyncio.run(sync(origin))
+
+def main():
+    screens = [ArgObject(name = 'Orders'), ArgObject(name = 'Other')]
+    dbshare.clear()
+    dbshare['table']['Orders'].append({'element': 'Orders', 'block': 'Main'})
+    rows = []
+    for nsessions in (10, 100, 1000):
+        Unishare.sessions.clear()
+        sessions = [Session(screens[i % 4 == 3]) for i in range(nsessions)]
+        Unishare.sessions.update({i: s for i, s in enumerate(sessions)})
+        origin = sessions[0]
+        for nupdates in (1, 20):
+            old = measure(lambda: run(legacy_sync_dbupdates, origin, nupdates))
+            new = measure(lambda: run(User.sync_dbupdates, origin, nupdates))
+            rows.append([str(nsessions), str(nupdates), old * 1e3, new * 1e3, f'{old / new:.1f}x'])
+    report('sync_dbupdates, ms per call', rows, ['sessions', 'updates', 'per-recipient', 'fan_out', 'speedup'])
+    Unishare.sessions.clear()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+# Copyright © 2024 UNISI Tech. All rights reserved.
+"""
+10 000 connected sessions nobody touches any more: the memory they take with
+their screens loaded and after the idle pass of config.hibernate saved them to
+their session databases, the time to hibernate a session and to wake it up
+with the next message.
+
+The screen is an order form: a 50-option Select, a 200-row Table and a
+20-field ParamBlock, some of them edited by the session before it goes idle.
+
+    python benchmarks/bench_hibernation.py [sessions]
+"""
+import asyncio, gc, os, sys, tempfile, time, tracemalloc
+import bench_utils
+from bench_utils import report
+
+from unisi.common import ReceivedMessage, Unishare, toJson
+from unisi.users import User, hibernate_idle
+from unisi.utils import config
+
+SESSIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+WOKEN = 200
+
+screen_source = '''
+from unisi import *
+
+name = 'Order'
+
+customer = Select('Customer', 'Customer 0', options = [f'Customer {i}' for i in range(50)])
+lines = Table('Lines', headers = ['Id', 'Product', 'Quantity', 'Price'],
+    rows = [[i, f'Product {i}', i % 7, i * 1.5] for i in range(200)])
+details = ParamBlock('Details', row = 4, **{f'field{i}': '' for i in range(20)})
+blocks = [Block('Order', customer, lines), details]
+'''
+
+def make_app():
+    app = tempfile.mkdtemp(prefix = 'unisi_bench_app_')
+    os.makedirs(os.path.join(app, 'screens'))
+    with open(os.path.join(app, 'screens', 'order.py'), 'w') as file:
+        file.write(screen_source)
+    os.chdir(app)
+    User._screen_registry_ready = False
+
+def traced():
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+def main():
+    make_app()
+    User('warmup')
+    tracemalloc.start()
+    base = traced()
+    for i in range(SESSIONS):
+        user = User(f'bench{i}')
+        user.screen_module.customer.value = f'Customer {i % 50}'
+        toJson(user.screen)
+        user.last_activity -= 3600
+        Unishare.sessions[user.session] = user
+    loaded = traced() - base
+
+    start = time.perf_counter()
+    hibernated = hibernate_idle(60)
+    hibernate_seconds = time.perf_counter() - start
+    assert len(hibernated) == SESSIONS
+    idle = traced() - base
+    tracemalloc.stop()
+
+    message = ReceivedMessage({'block': 'Order', 'element': 'Customer', 'event': 'changed', 'value': 'Customer 1'})
+    async def wake():
+        for user in hibernated[:WOKEN]:
+            user.send = None
+            await user.result4message(message)
+    start = time.perf_counter()
+    asyncio.run(wake())
+    wake_seconds = time.perf_counter() - start
+
+    rows = [['screens loaded', f'{loaded / SESSIONS / 1024:.1f}', f'{loaded / 2 ** 20:.0f}', '', ''],
+        ['hibernated', f'{idle / SESSIONS / 1024:.1f}', f'{idle / 2 ** 20:.0f}',
+            hibernate_seconds / SESSIONS * 1e3, wake_seconds / WOKEN * 1e3]]
+    report(f'{SESSIONS} idle sessions of one screen, config.shared_screens {config.shared_screens}', rows,
+        ['sessions', 'KB/session', 'MB total', 'hibernate ms', 'wake ms'])
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+# Copyright © 2024 UNISI Tech. All rights reserved.
+"""
+Element lookup for a response carrying many changed units: the linear scan
+of the screen (User._scan_path) against the per-screen layout index used by
+User.find_path, the way Message.fill_paths4 calls it.
+
+    python benchmarks/bench_lookup.py
+"""
+import bench_utils
+from bench_utils import measure, report
+
+from unisi import Block, Edit, User
+from unisi.common import ArgObject, ReceivedMessage
+
+def make_user(nblocks, nunits):
+    blocks = [Block(f'block {b}', *[Edit(f'edit {b}.{u}', u) for u in range(nunits)]) for b in range(nblocks)]
+    user = User.__new__(User)
+    user.active_dialog = None
+    user.screen_module = ArgObject(screen = ArgObject(name = 'Bench', blocks = blocks, toolbar = []))
+    return user, [unit for block in blocks for unit in block.value]
+
+def main():
+    rows = []
+    for nblocks, nunits in ((20, 10), (100, 10), (200, 20)):
+        user, units = make_user(nblocks, nunits)
+        for nchanged in (10, 100):
+            changed = units[-nchanged:]
+            scan = measure(lambda: [user._scan_path(unit) for unit in changed])
+            index = measure(lambda: [user.find_path(unit) for unit in changed])
+            rows.append([str(len(units)), str(nchanged), scan * 1e3, index * 1e3, f'{scan / index:.0f}x'])
+        messages = [ReceivedMessage(dict(block = f'block {b}', element = f'edit {b}.0')) for b in range(nblocks)]
+        scan = measure(lambda: [user._scan_element(m) for m in messages])
+        index = measure(lambda: [user.find_element(m) for m in messages])
+        rows.append([str(len(units)), f'{nblocks} msgs', scan * 1e3, index * 1e3, f'{scan / index:.0f}x'])
+    report('find_path / find_element, ms per response', rows,
+        ['screen units', 'changed', 'linear scan', 'layout index', 'speedup'])
+
+if __name__ == '__main__':
+    main()
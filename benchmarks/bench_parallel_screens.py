@@ -0,0 +1,76 @@
+# Copyright © 2024 UNISI Tech. All rights reserved.
+"""
+64 sessions created by 8 threads: screen loading serialized by a global lock
+(the former ModulesMixin.module_lock around every load_screen) against per-user
+blocks modules (ModulesMixin.import_block), which need no lock.
+
+The screen fills a table from a database while it is executed: a small SQLite
+query plus a 20 ms sleep standing for the round trip to a database server.
+Waits like that overlap between threads, the Python work itself is bound by
+the GIL (and here by the CPUs, see the title). It also imports a blocks module.
+
+    python benchmarks/bench_parallel_screens.py
+"""
+import os, sqlite3, sys, tempfile, threading, time
+from concurrent.futures import ThreadPoolExecutor
+import bench_utils
+from bench_utils import report
+
+SESSIONS = 64
+THREADS = 8
+
+screen_source = '''
+import sqlite3, time
+from unisi import *
+from blocks.summary import summary
+
+name = 'Orders'
+time.sleep(0.02) #the database server round trip
+with sqlite3.connect('orders.db') as connection:
+    rows = connection.execute(
+        'select customer, count(*), sum(amount) from orders group by customer order by 3 desc limit 50').fetchall()
+table = Table('Top customers', headers = ['Customer', 'Orders', 'Amount'], rows = [list(row) for row in rows])
+blocks = [Block('Orders', table), summary]
+'''
+
+def make_app():
+    app = tempfile.mkdtemp(prefix = 'unisi_bench_app_')
+    for folder in ('screens', 'blocks'):
+        os.makedirs(os.path.join(app, folder))
+    with open(os.path.join(app, 'screens', 'orders.py'), 'w') as file:
+        file.write(screen_source)
+    with open(os.path.join(app, 'blocks', 'summary.py'), 'w') as file:
+        file.write("from unisi import *\nsummary = Block('Summary', Text('Top 50 customers'))\n")
+    with sqlite3.connect(os.path.join(app, 'orders.db')) as connection:
+        connection.execute('create table orders (customer integer, amount real)')
+        connection.executemany('insert into orders values (?, ?)', ((i % 500, i * 0.01) for i in range(5_000)))
+    os.chdir(app)
+    sys.path.insert(0, app)
+
+def create_sessions(User, prefix):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(THREADS) as pool:
+        users = list(pool.map(lambda i: User(f'{prefix}{i}'), range(SESSIONS)))
+    assert all(user.screen_module for user in users)
+    return time.perf_counter() - start
+
+def main():
+    make_app()
+    from unisi.users import User
+    User._screen_registry_ready = False
+    User('warmup')
+    load_screen = User.load_screen
+    module_lock = threading.RLock()
+    def locked_load_screen(self, file):
+        with module_lock:
+            return load_screen(self, file)
+    rows = []
+    for title, loader in (('global module_lock', locked_load_screen), ('per-user blocks', load_screen)):
+        User.load_screen = loader
+        seconds = create_sessions(User, title.split()[0])
+        rows.append([title, seconds * 1e3, seconds / SESSIONS * 1e3, f'{SESSIONS / seconds:.0f}'])
+    User.load_screen = load_screen
+    report(f'{SESSIONS} sessions created by {THREADS} threads, {os.cpu_count()} CPU', rows, ['screen loading', 'total ms', 'ms/session', 'sessions/s'])
+
+if __name__ == '__main__':
+    main()
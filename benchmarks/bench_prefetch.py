@@ -0,0 +1,86 @@
+# Copyright © 2024 UNISI Tech. All rights reserved.
+"""
+First navigation to a second screen over the real websocket handler, with
+config.prefetch off and with a per-session budget: the time from the
+navigation message to the new screen, and the memory the prefetched screens
+take while they wait to be visited.
+
+Each of 20 sessions connects to a small Start screen, reads it for 300 ms and
+opens Reports. Reports fills a 2000-row table and waits 30 ms for its database
+while it is executed.
+
+    python benchmarks/bench_prefetch.py
+"""
+import asyncio, json, os, statistics, sys, tempfile, time
+import bench_utils
+from bench_utils import report
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+SESSIONS = 20
+BUDGET = 4 * 1024 * 1024
+
+start_source = '''
+from unisi import *
+name = 'Start'
+order = 0
+blocks = [Block('Welcome', Text('Choose a report'))]
+'''
+
+reports_source = '''
+import time
+from unisi import *
+name = 'Reports'
+order = 1
+time.sleep(0.03) #the database round trip
+table = Table('Sales', headers = ['Id', 'Region', 'Amount'],
+    rows = [[i, f'region {i % 20}', i * 2.5] for i in range(2000)])
+blocks = [Block('Sales', table)]
+'''
+
+def make_app():
+    app = tempfile.mkdtemp(prefix = 'unisi_bench_app_')
+    os.makedirs(os.path.join(app, 'screens'))
+    for file, source in (('start.py', start_source), ('reports.py', reports_source)):
+        with open(os.path.join(app, 'screens', file), 'w') as out:
+            out.write(source)
+    os.chdir(app)
+    sys.path.insert(0, app)
+
+async def session(client, url):
+    async with client.ws_connect(url) as ws:
+        await ws.receive()
+        await asyncio.sleep(0.3)
+        start = time.perf_counter()
+        await ws.send_str(json.dumps({'block': 'root', 'element': None, 'event': 'changed', 'value': 'reports'}))
+        await ws.receive()
+        latency = time.perf_counter() - start
+        await ws.send_str('close')
+    return latency
+
+async def main():
+    make_app()
+    from unisi import server
+    from unisi.prefetch import Prefetcher
+    from unisi.users import User
+    from unisi.utils import config
+    User._screen_registry_ready = False
+    app = web.Application()
+    app.add_routes([web.get('/ws', server.websocket_handler)])
+    rows = []
+    async with TestServer(app) as test_server:
+        url = test_server.make_url('/ws')
+        async with aiohttp.ClientSession() as client:
+            for title, budget in (('off', 0), (f'{BUDGET // 1024} KB budget', BUDGET)):
+                config.prefetch = budget
+                await session(client, url) #warm up
+                latencies = sorted(await asyncio.gather(*(session(client, url) for _ in range(SESSIONS))))
+                rows.append([title, statistics.median(latencies) * 1e3, latencies[-1] * 1e3,
+                    f"{Prefetcher.sizes.get('reports.py', 0) / 1024 if budget else 0:.0f}"])
+    report(f'first navigation of {SESSIONS} sessions, ms to the screen', rows,
+        ['prefetch', 'p50 ms', 'max ms', 'prefetched KB/session'])
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,44 @@
+# Copyright © 2024 UNISI Tech. All rights reserved.
+"""
+Decoding 100 000 fetched rows into lists, for a table of plain columns and
+one with converted ones (BOOLEAN, DATE, JSON): the former _row_to_list
+(sqlite3.Row access by name, table_fields lookup and _convert_value per
+cell) against the decoder compiled once per schema.
+
+    python benchmarks/bench_row_decoder.py [rows]
+"""
+import sqlite3, sys
+from datetime import date
+import bench_utils
+from bench_utils import measure, report
+
+from unisi.db import Database, _convert_value
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+def former_row_to_list(table, row):
+    result = []
+    for i, key in enumerate(table._all_columns):
+        val = row[i] if not isinstance(row, sqlite3.Row) else row[key]
+        dtype = table.table_fields.get(key, "")
+        result.append(_convert_value(val, dtype))
+    return result
+
+def main():
+    db = Database(':memory:')
+    plain = db.create_table('Plain', {'item': str, 'qty': int, 'price': float, 'note': str})
+    plain.append_rows([[f'item {i}', i % 50, i * 0.5, f'note {i}'] for i in range(ROWS)])
+    typed = db.create_table('Typed', {'item': str, 'paid': bool, 'day': date, 'tags': list})
+    typed.append_rows([[f'item {i}', i % 2 == 0, date(2024, 1, 1 + i % 28), ['a', i % 7]] for i in range(ROWS)])
+    rows = []
+    for table in (plain, typed):
+        fetched = db._conn.execute(f'SELECT {table._select_cols()} FROM [{table.id}] ORDER BY ID').fetchall()
+        assert [former_row_to_list(table, row) for row in fetched] == [table._row_to_list(row) for row in fetched]
+        old = measure(lambda: [former_row_to_list(table, row) for row in fetched], repeat = 3)
+        new = measure(lambda: [table._row_to_list(row) for row in fetched], repeat = 3)
+        rows.append([table.id, ', '.join(table.table_fields.values()), old * 1e3, new * 1e3, f'{old / new:.1f}x'])
+    report(f'decoding {ROWS} rows, ms', rows, ['table', 'columns', 'former', 'compiled', 'speedup'])
+    db.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+# Copyright © 2024 UNISI Tech. All rights reserved.
+"""
+Bytes sent for tab switching between screens, whole screens (toJson) against
+screens with block reuse markers (User.encode_screen, a client on /ws?reuse).
+Between visits one block of the screen changes.
+
+    python benchmarks/bench_screen_reuse.py
+"""
+import bench_utils
+from bench_utils import measure, report
+
+from unisi import Block, Edit, Screen, User
+from unisi.common import toJson
+
+def make_screen(name, nblocks, nunits):
+    screen = Screen(name)
+    screen.blocks = [Block(f'{name} block {b}', *[Edit(f'edit {u}', 'x' * 20) for u in range(nunits)])
+        for b in range(nblocks)]
+    screen.toolbar = []
+    return screen
+
+def main():
+    rows = []
+    for nscreens, nblocks, nunits in ((3, 5, 10), (5, 20, 10), (10, 40, 20)):
+        screens = [make_screen(f'Tab {i}', nblocks, nunits) for i in range(nscreens)]
+        user = User.__new__(User)
+        user.sent_blocks = {}
+        visits = 0
+        full = reused = 0
+        for round in range(5):
+            for screen in screens:
+                screen.blocks[round % nblocks].value[0].value = f'round {round}'
+                full += len(toJson(screen))
+                reused += len(user.encode_screen(screen))
+                visits += 1
+        screen = screens[0]
+        encode_full = measure(lambda: toJson(screen), number = 10)
+        encode_reuse = measure(lambda: user.encode_screen(screen), number = 10)
+        rows.append([f'{nscreens}x{nblocks}x{nunits}', str(visits), f'{full // 1024} KB', f'{reused // 1024} KB',
+            f'{full / reused:.1f}x', encode_full * 1e3, encode_reuse * 1e3])
+    report('tab switching, bytes sent and encode ms per screen', rows,
+        ['screens x blocks x units', 'visits', 'whole screens', 'with reuse', 'saved', 'toJson ms', 'encode_screen ms'])
+
+if __name__ == '__main__':
+    main()
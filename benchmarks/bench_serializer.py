@@ -0,0 +1,60 @@
+# Copyright © 2024 UNISI Tech. All rights reserved.
+"""
+toJson (unisi/serialize.py) against the former jsonpickle encoding on large
+screens, tables and graphs. Also checks both produce the same JSON.
+
+    python benchmarks/bench_serializer.py
+"""
+import json
+import bench_utils
+from bench_utils import measure, report
+
+import jsonpickle
+from unisi import Block, Edit, Select, Switch, Button, Table, Net, Message, serialize
+from unisi.containers import Screen
+from unisi.graphs import Topology
+
+def jsonpickle_encode(obj):
+    return jsonpickle.encode(obj, unpicklable = False, keys = False)
+
+def large_screen(nblocks = 200, nunits = 10):
+    screen = Screen('Large')
+    screen.blocks = [Block(f'block {b}', *[
+        Edit(f'edit {b}.{u}', f'value {u}') if u % 3 == 0 else
+        Select(f'select {b}.{u}', 'a', options = ['a', 'b', 'c', 'd', 'e']) if u % 3 == 1 else
+        Switch(f'switch {b}.{u}', bool(u % 2)) for u in range(nunits)],
+        Button(f'button {b}', lambda *_: None)) for b in range(nblocks)]
+    screen.toolbar = []
+    return screen
+
+def wide_table(nrows = 10_000, ncols = 8):
+    return Table('Wide', headers = [f'col {c}' for c in range(ncols)],
+        rows = [[f'cell {r}.{c}' if c % 2 else r * c for c in range(ncols)] for r in range(nrows)])
+
+def large_net(nunits = 2_000):
+    units = [Edit(f'node {i}', i) for i in range(nunits)]
+    topology = Topology()
+    for i in range(0, nunits - 1):
+        topology[units[i]][units[i + 1]] = {}
+    return Net('Net', topology = topology)
+
+def main():
+    cases = [
+        ('screen 200x10 units', large_screen()),
+        ('table 10k x 8', wide_table()),
+        ('graph 2k nodes', large_net()),
+        ('message 500 updates', Message(*[Edit(f'e{i}', i) for i in range(500)])),
+    ]
+    rows = []
+    for title, obj in cases:
+        assert json.loads(jsonpickle_encode(obj)) == json.loads(serialize.to_json(obj)), title
+        old = measure(lambda: jsonpickle_encode(obj))
+        new = measure(lambda: serialize.to_json(obj))
+        plain = measure(lambda: serialize.to_plain(obj))
+        rows.append([title, old * 1e3, new * 1e3, plain * 1e3, f'{old / new:.1f}x'])
+    backend = 'orjson' if serialize.orjson else 'json'
+    report(f'Serialization, ms per call (text backend: {backend})', rows,
+        ['payload', 'jsonpickle', 'toJson', 'to_plain only', 'speedup'])
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+# Copyright © 2024 UNISI Tech. All rights reserved.
+"""
+Memory of 1000 sessions' reactive screens: the unit _mark_changed as the
+former per-unit closure against the slotted ChangeMarker.
+
+Every session builds its own screen units: a 200-field ParamBlock, a
+50-node Net and a table, made reactive and sent once.
+
+    python benchmarks/bench_session_memory.py
+"""
+import tracemalloc
+import bench_utils
+from bench_utils import report
+
+from unisi import Block, Edit, ParamBlock, Table, units
+from unisi.common import flatten, toJson
+from unisi.graphs import Net, Topology
+
+SESSIONS = 1000
+
+class Session:
+    """what set_reactivity needs of a User"""
+    def register_changed_unit(self, unit, property = None, value = None):
+        pass
+
+def closure_marker(unit, user):
+    """_mark_changed as it was built before ChangeMarker"""
+    def changed_call(property = None, value = None, part = None):
+        if unit.specific_changed_register(property, value):
+            units.note_delta(unit, property or part)
+            user.register_changed_unit(unit, property, value)
+    return changed_call
+
+def build_screen():
+    params = ParamBlock('Params', row = 10, **{f'field{i}': i for i in range(200)})
+    topology = Topology()
+    for i in range(49):
+        topology[Edit(f'node {i}', i)][Edit(f'node {i + 1}', i + 1)] = True
+    net = Net('Net', topology = topology)
+    table = Table('Rows', headers = ['Id', 'Name'], rows = [[i, f'row {i}'] for i in range(100)])
+    blocks = [params, Block('Graph', net, table)]
+    session = Session()
+    for unit in flatten(blocks, [b.value for b in blocks]):
+        unit.set_reactivity(session)
+    toJson(blocks)
+    return blocks
+
+def session_bytes(marker):
+    units.ChangeMarker = marker
+    build_screen() #warm up caches outside of the measurement
+    tracemalloc.start()
+    screens = [build_screen() for _ in range(SESSIONS)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del screens
+    return size
+
+def main():
+    marker = units.ChangeMarker
+    closure, slotted = session_bytes(closure_marker), session_bytes(marker)
+    units.ChangeMarker = marker
+    mb = 1024 * 1024
+    report(f'reactive screens of {SESSIONS} sessions', [[
+        f'{closure / mb:.1f}', f'{slotted / mb:.1f}', f'{closure / SESSIONS / 1024:.0f}',
+        f'{slotted / SESSIONS / 1024:.0f}', f'{1 - slotted / closure:.0%}']],
+        ['closure MB', 'ChangeMarker MB', 'closure KB/session', 'ChangeMarker KB/session', 'saved'])
+
+if __name__ == '__main__':
+    main()
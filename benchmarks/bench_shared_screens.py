@@ -0,0 +1,71 @@
+# Copyright © 2024 UNISI Tech. All rights reserved.
+"""
+Sessions loading the same screen: every session executing the screen module
+against copies of one shared template (config.shared_screens), memory per
+session, sessions per GB and the time to load a session.
+
+The screen is a catalog: a 300-option Select, a 1000-row Table, a 40-field
+ParamBlock. Sessions are sent their screen once, nobody touches the table.
+
+    python benchmarks/bench_shared_screens.py
+"""
+import os, tempfile, time, tracemalloc
+import bench_utils
+from bench_utils import report
+
+from unisi import templates
+from unisi.common import toJson
+from unisi.users import User
+from unisi.utils import config
+
+SESSIONS = 200
+
+screen_source = '''
+from unisi import *
+
+name = 'Catalog'
+
+def on_country(_, value):
+    table.value = None
+
+country = Select('Country', 'Country 0', on_country, options = [f'Country {i}' for i in range(300)])
+table = Table('Products', headers = ['Id', 'Name', 'Price', 'Status'],
+    rows = [[i, f'Product {i}', i * 1.5, 'in stock'] for i in range(1000)])
+filters = ParamBlock('Filters', row = 4, **{f'filter{i}': '' for i in range(40)})
+blocks = [Block('Catalog', country, table), filters]
+'''
+
+def make_app():
+    app = tempfile.mkdtemp(prefix = 'unisi_bench_app_')
+    os.makedirs(os.path.join(app, 'screens'))
+    with open(os.path.join(app, 'screens', 'catalog.py'), 'w') as file:
+        file.write(screen_source)
+    os.chdir(app)
+    User._screen_registry_ready = False
+
+def sessions(shared):
+    config.shared_screens = shared
+    templates.clear()
+    User('warmup')
+    users = []
+    tracemalloc.start()
+    start = time.perf_counter()
+    for i in range(SESSIONS):
+        user = User(f'bench{i}')
+        toJson(user.screen)
+        users.append(user)
+    seconds = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size / SESSIONS, seconds / SESSIONS
+
+def main():
+    make_app()
+    rows = []
+    for title, shared in (('exec per session', False), ('shared template', True)):
+        per_session, seconds = sessions(shared)
+        rows.append([title, f'{per_session / 1024:.0f}', f'{2 ** 30 / per_session:.0f}', seconds * 1e3])
+    report(f'{SESSIONS} sessions of one screen', rows, ['mode', 'KB/session', 'sessions/GB', 'load ms'])
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+# Copyright © 2024 UNISI Tech. All rights reserved.
+"""
+Handler-side cost of change tracking on a reactive 100k-row table:
+ChangedProxy wrappers (config.tracking = 'proxy') against observable
+list/dict subclasses (config.tracking = 'observable').
+
+    python benchmarks/bench_tracking.py
+"""
+import bench_utils
+from bench_utils import measure, report
+
+from unisi import Table, units
+
+class Session:
+    """what set_reactivity needs of a User"""
+    def register_changed_unit(self, unit, property = None, value = None):
+        pass
+
+def make_table(track):
+    units.track = track
+    rows = [[r, f'name {r}', r * 0.5] for r in range(100_000)]
+    table = Table('Rows', headers = ['Id', 'Name', 'Score'], rows = rows)
+    table.set_reactivity(Session())
+    return table
+
+def operations(table):
+    yield 'iterate all cells', lambda: sum(row[0] for row in table.rows)
+    yield 'read 10k rows by index', lambda: [table.rows[i][1] for i in range(0, 100_000, 10)]
+    yield 'edit 10k cells', lambda: [table.rows[i].__setitem__(2, 1.0) for i in range(0, 100_000, 10)]
+    yield 'append 10k rows', lambda: [table.rows.append([i, 'new', 0.0]) for i in range(10_000)]
+    yield 'assign 100k rows', lambda: setattr(table, 'rows', [[r, 'x', 0.0] for r in range(100_000)])
+
+def main():
+    timings = {}
+    for name, track in (('proxy', units.proxy), ('observable', units.observe)):
+        table = make_table(track)
+        for title, operation in operations(table):
+            timings.setdefault(title, {})[name] = measure(operation, repeat = 3)
+    units.track = units.proxy
+    rows = [[title, t['proxy'] * 1e3, t['observable'] * 1e3, f"{t['proxy'] / t['observable']:.1f}x"]
+        for title, t in timings.items()]
+    report('100k-row reactive Table, ms', rows, ['operation', 'proxy ms', 'observable ms', 'speedup'])
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+# Copyright © 2024 UNISI Tech. All rights reserved.
+"""
+Shared helpers for the benchmark scripts in this directory.
+
+Run any of them from the repository root, e.g.
+    python benchmarks/bench_serializer.py
+
+Importing this module first installs an in-memory `config` (the same defaults
+unisi/utils.py would write to config.py), so a benchmark never creates
+config.py, log or web/ in the current directory.
+"""
+import os, sys, tempfile, time, types, statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+if 'config' not in sys.modules:
+    config = types.ModuleType('config')
+    config.port = 8000
+    config.upload_dir = tempfile.mkdtemp(prefix='unisi_bench_')
+    config.hot_reload = False
+    config.logfile = None
+    config.autotest = False
+    config.appname = 'Unisi benchmark'
+    sys.modules['config'] = config
+
+def measure(fn, repeat = 5, number = 1):
+    """median seconds per call of fn() over `repeat` rounds of `number` calls"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - start) / number)
+    return statistics.median(times)
+
+def report(title, rows, headers):
+    """print rows (lists of cells) as an aligned plain-text table"""
+    cells = [headers] + [[cell if isinstance(cell, str) else f'{cell:.4g}' for cell in row] for row in rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(headers))]
+    print(f'\n{title}')
+    for i, row in enumerate(cells):
+        print('  '.join(cell.ljust(width) for cell, width in zip(row, widths)))
+        if i == 0:
+            print('  '.join('-' * width for width in widths))
@@ -0,0 +1,96 @@
+# Copyright © 2024 UNISI Tech. All rights reserved.
+"""
+Throughput of a real server started with config.workers 1, 2, 4 and 8: 64
+sessions connected to it send 20 messages each, one at a time, as fast as the
+responses come. Every message runs a handler doing 2 ms of Python work, so
+one process is bound by its CPU core; see the CPU count in the title.
+
+The server runs in its own process (the workers fork from it), the clients
+run here.
+
+    python benchmarks/bench_workers.py
+"""
+import asyncio, json, os, socket, subprocess, sys, tempfile, time
+import bench_utils
+from bench_utils import ROOT, report
+
+import aiohttp
+
+SESSIONS = 64
+MESSAGES = 20
+
+screen_source = '''
+from unisi import *
+name = 'Work'
+
+def work(unit, value):
+    total = 0
+    deadline = time.perf_counter() + 0.002
+    while time.perf_counter() < deadline:
+        total += 1
+    unit.value = value
+
+import time
+field = Edit('Field', '', work)
+blocks = [Block('Work', field)]
+'''
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+def make_app(workers, port):
+    app = tempfile.mkdtemp(prefix = 'unisi_bench_app_')
+    os.makedirs(os.path.join(app, 'screens'))
+    with open(os.path.join(app, 'screens', 'work.py'), 'w') as file:
+        file.write(screen_source)
+    with open(os.path.join(app, 'config.py'), 'w') as file:
+        file.write(f"port = {port}\nworkers = {workers}\nhot_reload = False\nlogfile = None\n"
+            f"autotest = False\nappname = 'Unisi benchmark'\nupload_dir = 'web'\n")
+    return app
+
+async def wait_for(port, seconds = 20):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise TimeoutError(f'the server did not listen on {port}')
+
+async def session(client, url, i):
+    async with client.ws_connect(url) as ws:
+        await ws.receive()
+        for n in range(MESSAGES):
+            await ws.send_str(json.dumps({'block': 'Work', 'element': 'Field', 'event': 'changed', 'value': f'{i}-{n}'}))
+            await ws.receive()
+
+async def throughput(workers):
+    port = free_port()
+    app = make_app(workers, port)
+    env = dict(os.environ, PYTHONPATH = ROOT)
+    server = subprocess.Popen([sys.executable, '-c', 'from unisi import start; start()'], cwd = app, env = env,
+        stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL)
+    try:
+        await wait_for(port)
+        url = f'http://127.0.0.1:{port}/ws'
+        async with aiohttp.ClientSession() as client:
+            await session(client, url, -1) #warm up
+            start = time.perf_counter()
+            await asyncio.gather(*(session(client, url, i) for i in range(SESSIONS)))
+            return SESSIONS * MESSAGES / (time.perf_counter() - start)
+    finally:
+        server.terminate()
+        server.wait()
+
+async def main():
+    rates = {workers: await throughput(workers) for workers in (1, 2, 4, 8)}
+    rows = [[str(workers), f'{rate:.0f}', f'{rate / rates[1]:.2f}x'] for workers, rate in rates.items()]
+    report(f'{SESSIONS} sessions x {MESSAGES} messages of 2 ms work, {os.cpu_count()} CPU', rows,
+        ['workers', 'messages/s', 'speedup'])
+
+if __name__ == '__main__':
+    asyncio.run(main())
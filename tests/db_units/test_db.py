@@ -18,6 +18,11 @@ Organisation
   TestManyToOne             - setup_fk/set_fk/clear_fk/calc_linked_rows_fk
   TestManyToMany            - setup_junction/add_link/delete_link(s)/calc_linked_rows
   TestVersionCounter        - Dbtable._version bump semantics (see dbunits.py)
+  TestOffTheLoop            - aquery/awrite and the awaitable Dbtable reads
+  TestTransaction           - Database.transaction units of work
+  TestKeysetPaging          - read_rows by the IDs of read pages and samples
+  TestRowDecoder            - the compiled converters of _row_to_list
+  TestFullTextSearch        - the optional FTS5 index of searches
 
 Regression tests for bugs found while writing this suite are marked
 "Regression:" in their docstring, with a short description of the bug.
@@ -1135,3 +1140,447 @@ class TestVersionCounter:
         v0 = table._version
         table.clear()
         assert table._version == v0 + 1
+
+    def test_refresh_rereads_rows_changed_by_another_connection(self, tmp_path, logger):
+        from unisi.db import Database
+        path = str(tmp_path / "shared.db")
+        here, there = Database(path, message_logger=logger), Database(path, message_logger=logger)
+        try:
+            table = here.create_table("T", {"name": str, "age": int}, rows=[["Alice", 30]])
+            assert list(table.list) == [["Alice", 30, 1]]
+            there.create_table("T", {"name": str, "age": int}).append_row(["Bob", 25])
+            v0 = table._version
+            table.refresh()
+            assert table._version == v0 + 1
+            assert list(table.list) == [["Alice", 30, 1], ["Bob", 25, 2]]
+        finally:
+            here.close()
+            there.close()
+
+    def test_refresh_with_updates_drops_only_the_chunks_they_touch(self, tmp_path, logger):
+        from unisi.db import Database
+        path = str(tmp_path / "shared.db")
+        here, there = Database(path, message_logger=logger), Database(path, message_logger=logger)
+        try:
+            rows = [[f"n{i}", i] for i in range(30)]
+            table = here.create_table("T", {"name": str, "age": int}, limit=10, rows=rows)
+            for index in (0, 10, 20):
+                table.list[index]
+            remote = there.create_table("T", {"name": str, "age": int}, limit=10)
+            remote.list[15] = ["changed", 15, 16]
+            v0 = table._version
+
+            table.refresh([{"type": "action", "update": "update", "index": 15, "data": ["changed", 15, 16]}])
+
+            assert table._version == v0
+            assert sorted(table.list.delta_list) == [0, 20]
+            assert table.list[15] == ["changed", 15, 16]
+        finally:
+            here.close()
+            there.close()
+
+
+# ────────────────────────────────────────────────────────────────────────── #
+#  Queries off the event loop (aquery / awrite)                               #
+# ────────────────────────────────────────────────────────────────────────── #
+
+class TestOffTheLoop:
+    @pytest.fixture
+    def filedb(self, tmp_path, logger):
+        from unisi.db import Database
+        database = Database(str(tmp_path / "async.db"), message_logger=logger)
+        yield database
+        database.close()
+
+    @pytest.mark.asyncio
+    async def test_aquery_reads_in_a_reader_thread_with_its_own_connection(self, filedb):
+        import threading
+        filedb.create_table("T", {"name": str}, rows=[["Alice"], ["Bob"]])
+        rows = await filedb.aquery("SELECT name FROM [T] ORDER BY ID")
+        assert rows == [["Alice"], ["Bob"]]
+        names = await filedb.aquery("SELECT 1", func=lambda row: threading.current_thread().name)
+        assert names[0].startswith("unisi-db-read")
+        assert filedb._read_connections and filedb._conn not in filedb._read_connections
+
+    @pytest.mark.asyncio
+    async def test_aquery_logs_errors_and_returns_empty(self, filedb, logger):
+        assert await filedb.aquery("SELECT * FROM no_such_table") == []
+        assert any("no_such_table" in m for m in logger.errors)
+
+    @pytest.mark.asyncio
+    async def test_memory_db_is_read_by_the_writer_thread(self, db, table):
+        table.append_rows([["Alice", 30], ["Bob", 25]])
+        assert await table.aread_rows() == table.read_rows()
+        assert db._readers is None and db._writer is not None
+
+    @pytest.mark.asyncio
+    async def test_awrite_runs_in_the_writer_thread(self, filedb):
+        import threading
+        table = filedb.create_table("T", {"name": str}, rows=[["Alice"]])
+        name = await filedb.awrite(lambda: threading.current_thread().name)
+        assert name.startswith("unisi-db-write")
+        assert await filedb.awrite(filedb.update_row, "T", 1, {"name": "Alicia"})
+        assert table.read_rows() == [["Alicia", 1]]
+
+    @pytest.mark.asyncio
+    async def test_aread_rows_pages_like_read_rows(self, filedb):
+        table = filedb.create_table("T", {"name": str, "age": int}, limit=2,
+            rows=[[f"n{i}", i] for i in range(5)])
+        assert await table.aread_rows(skip=2) == table.read_rows(skip=2)
+        assert await table.aread_rows(skip=4, limit=10) == [["n4", 4, 5]]
+
+    @pytest.mark.asyncio
+    async def test_asearch_rows_matches_search_rows(self, filedb):
+        t = filedb.create_table("T", {"name": "TEXT", "age": "INTEGER"})
+        t.append_rows([["Alice", 30], ["Bob", 25], ["Carol", 41]])
+        result = await t.asearch_rows("ali")
+        assert result.cache == t.search_rows("ali").cache == [["Alice", 30, 1]]
+        assert (await t.asearch_rows("")).cache == []
+
+    def test_close_stops_the_threads_and_their_connections(self, tmp_path, logger):
+        import asyncio
+        from unisi.db import Database
+        database = Database(str(tmp_path / "closed.db"), message_logger=logger)
+        database.create_table("T", {"name": str}, rows=[["Alice"]])
+        asyncio.run(database.aquery("SELECT * FROM [T]"))
+        readers = database._readers
+        database.close()
+        assert readers._shutdown
+        with pytest.raises(Exception):
+            database._read_connections[0].execute("SELECT 1")
+
+
+# ────────────────────────────────────────────────────────────────────────── #
+#  Units of work (Database.transaction)                                       #
+# ────────────────────────────────────────────────────────────────────────── #
+
+class TestTransaction:
+    @pytest.fixture
+    def pair(self, tmp_path, logger):
+        """two Databases on one file: `there` sees only what `here` committed"""
+        from unisi.db import Database
+        path = str(tmp_path / "tx.db")
+        here, there = Database(path, message_logger=logger), Database(path, message_logger=logger)
+        yield here, there
+        here.close()
+        there.close()
+
+    def count(self, db):
+        return db.qlist("SELECT COUNT(*) FROM [T]")[0][0]
+
+    def test_statements_are_committed_once_on_exit(self, pair):
+        here, there = pair
+        table = here.create_table("T", {"name": str})
+        there.create_table("T", {"name": str})
+        with here.transaction():
+            table.append_row(["Alice"])
+            table.append_row(["Bob"])
+            assert self.count(here) == 2
+            assert self.count(there) == 0
+        assert self.count(there) == 2
+
+    def test_exception_rolls_everything_back(self, pair):
+        here, _ = pair
+        table = here.create_table("T", {"name": str}, rows=[["Alice"]])
+        with pytest.raises(RuntimeError):
+            with here.transaction():
+                table.delete_row(1)
+                table.append_row(["Bob"])
+                raise RuntimeError("stop")
+        assert self.count(here) == 1
+        assert not here._conn.in_transaction
+
+    def test_rollback_reverts_the_tables_and_their_dbupdates(self, pair):
+        from unisi.dbunits import dbupdates
+        here, _ = pair
+        table = here.create_table("T", {"name": str}, rows=[["Alice"]])
+        dbupdates[table.id].clear()
+        before = table.length, table._version, [list(row) for row in table.list]
+        with pytest.raises(RuntimeError):
+            with here.transaction():
+                table.list.extend([["Bob"], ["Carol"]])
+                table.list.update_cell(0, 0, "Alicia")
+                raise RuntimeError("stop")
+        assert (table.length, table._version, table.list[:]) == before
+        assert table.list[:] == table.read_rows()
+        assert not dbupdates[table.id]
+
+    def test_nested_rollback_keeps_the_changes_of_the_outer_one(self, pair):
+        from unisi.dbunits import dbupdates
+        here, _ = pair
+        table = here.create_table("T", {"name": str})
+        dbupdates[table.id].clear()
+        with here.transaction():
+            table.list.append(["Alice"])
+            with pytest.raises(RuntimeError):
+                with here.transaction():
+                    table.append_rows([["Bob"]])
+                    raise RuntimeError("stop")
+        assert table.length == 1 and table.list[:] == table.read_rows()
+        assert [update["update"] for update in dbupdates[table.id]] == ["add"]
+
+    def test_nested_transaction_is_a_savepoint_of_the_outer_one(self, pair):
+        here, there = pair
+        table = here.create_table("T", {"name": str})
+        there.create_table("T", {"name": str})
+        with here.transaction():
+            table.append_row(["Alice"])
+            with pytest.raises(RuntimeError):
+                with here.transaction():
+                    table.append_row(["Bob"])
+                    raise RuntimeError("stop")
+            with here.transaction():
+                table.append_row(["Carol"])
+            assert self.count(there) == 0
+        assert there.qlist("SELECT name FROM [T] ORDER BY ID") == [["Alice"], ["Carol"]]
+
+    def test_append_rows_inside_a_transaction_commits_with_it(self, pair):
+        here, there = pair
+        table = here.create_table("T", {"name": str})
+        there.create_table("T", {"name": str})
+        with here.transaction():
+            assert len(table.append_rows([["Alice"], ["Bob"]])) == 2
+            assert self.count(there) == 0
+        assert self.count(there) == 2
+
+    def test_other_threads_write_after_the_transaction(self, pair):
+        import threading
+        here, _ = pair
+        table = here.create_table("T", {"name": str})
+        writer = threading.Thread(target=table.append_row, args=(["Bob"],))
+        with here.transaction():
+            table.append_row(["Alice"])
+            writer.start()
+            writer.join(0.2)
+            assert writer.is_alive()  # waits for here.lock
+        writer.join()
+        assert here.qlist("SELECT name FROM [T] ORDER BY ID") == [["Alice"], ["Bob"]]
+
+    def test_add_links_commits_once(self, db, monkeypatch):
+        orders = db.create_table("Orders", {"item": "TEXT"})
+        users = db.create_table("Users", {"name": "TEXT"})
+        relname, _ = orders.setup_junction("Users", {})
+        orders.append_rows([["Widget"], ["Gadget"], ["Gizmo"]])
+        users.append_row(["Alice"])
+        commits = []
+        connection = db._conn
+
+        class Counting:
+            def __getattr__(self, name):
+                return getattr(connection, name)
+
+            def commit(self):
+                commits.append(1)
+                connection.commit()
+        monkeypatch.setattr(db, "_conn", Counting())
+        links = orders.add_links("Users", [1, 2, 3], 1, link_index_name=relname)
+        assert len(links) == 3 and all(links)
+        assert len(commits) == 1
+
+
+# ────────────────────────────────────────────────────────────────────────── #
+#  Keyset paging of read_rows                                                 #
+# ────────────────────────────────────────────────────────────────────────── #
+
+class TestKeysetPaging:
+    def seeded(self, make_table, size=50):
+        t = make_table(limit=10, rows=[[f"n{i}", i] for i in range(size)])
+        t.sample_every = 7
+        return t
+
+    def offset_rows(self, t, skip, limit=10):
+        return t.db.qlist(f"SELECT name, age, ID FROM [{t.id}] ORDER BY ID LIMIT ? OFFSET ?",
+            (limit, skip))
+
+    def test_next_page_seeks_after_the_last_read_id(self, make_table):
+        t = self.seeded(make_table)
+        t.read_rows(skip=20)
+        query, params = t._read_query(30, 10)
+        assert "WHERE ID > ?" in query and params == (30, 10, 0)
+        assert t.read_rows(skip=30) == self.offset_rows(t, 30)
+
+    def test_jump_starts_from_the_closest_sample(self, make_table):
+        t = self.seeded(make_table)
+        assert t.read_rows(skip=33) == self.offset_rows(t, 33)
+        assert t._samples == [7, 14, 21, 28, 35, 42, 49]
+        query, params = t._read_query(23, 10)
+        assert "WHERE ID > ?" in query and params == (21, 10, 2)
+
+    def test_small_offsets_read_no_samples(self, make_table):
+        t = self.seeded(make_table)
+        t.read_rows(skip=5)
+        assert t._samples is None
+
+    def test_appends_keep_the_keys_and_deletions_forget_them(self, make_table):
+        t = self.seeded(make_table)
+        t.read_rows(skip=20)
+        t.append_rows([["late", 0]])
+        assert t._keys and t._samples is not None
+        t.delete_row(3)
+        assert t._keys == {} and t._samples is None
+        assert t.read_rows(skip=20) == self.offset_rows(t, 20)
+
+    def test_refresh_forgets_the_keys(self, make_table):
+        t = self.seeded(make_table)
+        t.read_rows(skip=20)
+        t.refresh()
+        assert t._keys == {}
+
+    def test_pages_match_offset_paging_through_random_mutations(self, make_table):
+        import random
+        rand = random.Random(7)
+        t = self.seeded(make_table, size=120)
+        for _ in range(200):
+            action = rand.random()
+            if action < 0.1:
+                t.append_rows([["added", rand.randrange(100)]])
+            elif action < 0.2 and t.length:
+                t.delete_row(rand.choice(t.read_rows(skip=rand.randrange(t.length), limit=1))[-1])
+            skip = rand.randrange(t.length + 5)
+            assert t.read_rows(skip=skip) == self.offset_rows(t, skip)
+
+    @pytest.mark.asyncio
+    async def test_aread_rows_pages_by_keys_and_samples(self, make_table):
+        t = self.seeded(make_table)
+        assert await t.aread_rows(skip=33) == self.offset_rows(t, 33)
+        assert t._samples and 43 in t._keys
+        assert await t.aread_rows(skip=43) == self.offset_rows(t, 43)
+
+
+# ────────────────────────────────────────────────────────────────────────── #
+#  Row decoder (_row_to_list)                                                 #
+# ────────────────────────────────────────────────────────────────────────── #
+
+class TestRowDecoder:
+    def test_plain_columns_are_copied_as_is(self, db, table):
+        assert table._plain
+        assert table._row_to_list(("Alice", 30, 1, "extra")) == ["Alice", 30, 1]
+
+    def test_converters_are_compiled_per_column(self, db):
+        from unisi.db import _to_date, _to_json
+        t = db.create_table("T", {"name": str, "born": date, "tags": list})
+        assert t._converters == (None, _to_date, _to_json, None)
+        row = t._row_to_list(("Alice", "2020-01-02", '["a"]', 7))
+        assert row == ["Alice", date(2020, 1, 2), ["a"], 7]
+
+    def test_unconvertible_value_is_returned_raw(self, db):
+        t = db.create_table("T", {"born": date, "flag": bool})
+        assert t._row_to_list(("not a date", None, 1)) == ["not a date", None, 1]
+
+    def test_decoder_follows_a_new_fk_column(self, db):
+        db.create_table("Users", {"name": str})
+        t = db.create_table("Orders", {"paid": bool})
+        t.setup_fk("Users")
+        assert t._width == 3 and len(t._converters) == 3
+
+    def test_append_rows_returns_columns_in_list_order_after_setup_fk(self, db):
+        """Regression: RETURNING * yields the schema order, in which a link_id
+        added by ALTER TABLE comes after ID; rows are decoded by position."""
+        users = db.create_table("Users", {"name": str})
+        users.append_row(["Alice"])
+        t = db.create_table("Orders", {"item": str})
+        t.setup_fk("Users")
+        rows = t.append_rows([["Widget", 1], ["Gadget", None]])
+        assert rows == [["Widget", 1, 1], ["Gadget", None, 2]]
+        assert t.read_rows() == rows
+
+
+# ────────────────────────────────────────────────────────────────────────── #
+#  Full-text search index (setup_fts)                                         #
+# ────────────────────────────────────────────────────────────────────────── #
+
+class TestFullTextSearch:
+    NAMES = [["Alice", 30], ["Bob", 25], ["Carol", 41], ["alicia", 141], ['Say "hi"', 7]]
+
+    def seeded(self, db, fts=True):
+        return db.create_table("T", {"name": "TEXT", "age": "INTEGER"}, rows=self.NAMES, fts=fts)
+
+    def test_setup_creates_the_index_of_searchable_columns(self, db):
+        t = db.create_table("T", {"name": "TEXT", "meta": "JSON"}, fts=True)
+        assert t.fts == "T_fts"
+        assert list(db.get_table_fields("T_fts")) == ["name"]
+
+    @pytest.mark.parametrize("search", ["ali", "ALI", "lic", "141", 'y "h', "zzz", "Carol"])
+    def test_results_match_the_like_search(self, db, search):
+        t = self.seeded(db)
+        where, _ = t._build_search_where(search)
+        assert "MATCH" in where
+        found = t.search_rows(search).cache
+        t.fts = None
+        assert found == t.search_rows(search).cache
+
+    def test_search_rows_takes_the_first_limit_matches(self, db):
+        t = db.create_table("T", {"name": "TEXT"}, limit=2, fts=True)
+        t.append_rows([["match1"], ["other"], ["match2"], ["match3"]])
+        assert [r[0] for r in t.search_rows("match")] == ["match1", "match2"]
+
+    def test_short_search_falls_back_to_like(self, db):
+        t = self.seeded(db)
+        where, _ = t._build_search_where("al")
+        assert "LIKE" in where
+        assert [r[0] for r in t.search_rows("al")] == ["Alice", "alicia"]
+
+    def test_writes_are_indexed_by_triggers(self, db):
+        t = self.seeded(db)
+        t.append_row(["Alina", 3])
+        t.list.update_cell(1, 0, "Bobalina")
+        t.delete_row(1)
+        assert [r[0] for r in t.search_rows("lina")] == ["Bobalina", "Alina"]
+
+    def test_writes_of_another_process_are_indexed(self, tmp_path, logger):
+        from unisi.db import Database
+        path = str(tmp_path / "fts.db")
+        here, there = Database(path, message_logger=logger), Database(path, message_logger=logger)
+        try:
+            t = here.create_table("T", {"name": str}, fts=True)
+            there.get_table("T").append_row(["Alice"])
+            assert [r[0] for r in t.search_rows("lic")] == ["Alice"]
+        finally:
+            here.close()
+            there.close()
+
+    def test_get_table_indexes_existing_rows_once(self, db):
+        self.seeded(db, fts=False)
+        t = db.get_table("T", fts=True)
+        assert [r[0] for r in t.search_rows("Car")] == ["Carol"]
+        db.execute("INSERT INTO [T_fts](T_fts) VALUES ('delete-all')")
+        assert db.get_table("T", fts=True).setup_fts()
+        assert len(t.search_rows("Car")) == 0  # not rebuilt again
+
+    def test_linked_rows_are_searched_through_the_index(self, db):
+        users = db.create_table("Users", {"name": str}, rows=[["Alice"], ["Bob"]])
+        orders = db.create_table("Orders", {"item": str}, fts=True)
+        orders.setup_fk("Users")
+        assert list(db.get_table_fields("Orders_fts")) == ["item", "link_id"]
+        orders.append_rows([["Widget", 1], ["Gadget", 1], ["Widget Pro", 2]])
+        assert [r[0] for r in orders.calc_linked_rows_fk([1], "idg")] == ["Widget"]
+
+        relname, _ = orders.setup_junction("Users", {})
+        orders.add_links("Users", [1, 3], 2, link_index_name=relname)
+        where, _ = orders._build_search_where("get", table_alias="a")
+        assert where.startswith("a.[ID] IN")
+        linked = orders.calc_linked_rows(relname, [2], "Users", search="get")
+        assert [r[0] for r in linked] == ["Widget", "Widget Pro"]
+
+    def test_missing_fts5_falls_back_to_like(self, db, logger, monkeypatch):
+        import sqlite3
+        connection = db._conn
+
+        class NoFts:
+            def __getattr__(self, name):
+                return getattr(connection, name)
+
+            def execute(self, sql, *args):
+                if "VIRTUAL TABLE" in sql:
+                    raise sqlite3.OperationalError("no such module: fts5")
+                return connection.execute(sql, *args)
+        monkeypatch.setattr(db, "_conn", NoFts())
+        t = self.seeded(db)
+        assert t.fts is None
+        assert any("fts5" in m for m in logger.warnings)
+        assert [r[0] for r in t.search_rows("ali")] == ["Alice", "alicia"]
+
+    def test_delete_table_drops_the_index(self, db):
+        self.seeded(db)
+        db.delete_table("T")
+        assert db.get_table_fields("T_fts") is None
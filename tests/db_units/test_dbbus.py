@@ -0,0 +1,133 @@
+"""
+Unit tests for unisi/dbbus.py -- config.dbbus' SqliteBus shared by server
+processes using one database. Two buses on the same file stand for two
+processes; `instance` tells them apart.
+"""
+import pytest
+
+from unisi import dbbus
+from unisi.dbbus import SqliteBus, UpdateBus
+
+
+@pytest.fixture
+def buses(tmp_path, monkeypatch):
+    path = str(tmp_path / "unisi.db-updates")
+    monkeypatch.setattr(dbbus, "instance", "here")
+    here = SqliteBus(path)
+    monkeypatch.setattr(dbbus, "instance", "there")
+    there = SqliteBus(path)
+    yield here, there
+    here.close()
+    there.close()
+
+
+def publish(bus, instance, monkeypatch, updates):
+    monkeypatch.setattr(dbbus, "instance", instance)
+    bus.publish(updates)
+
+
+class TestSqliteBus:
+    def test_updates_reach_the_other_process_once(self, buses, monkeypatch):
+        here, there = buses
+        publish(here, "here", monkeypatch, {"T": [{"update": "delete", "index": 1}]})
+        publish(here, "here", monkeypatch, {"T": [{"update": "add", "index": 5, "data": ["x", 6]}]})
+        monkeypatch.setattr(dbbus, "instance", "there")
+        assert there.receive() == {"T": [{"update": "delete", "index": 1},
+            {"update": "add", "index": 5, "data": ["x", 6]}]}
+        assert there.receive() == {}
+
+    def test_own_updates_are_not_received(self, buses, monkeypatch):
+        here, _ = buses
+        publish(here, "here", monkeypatch, {"T": [{"update": "delete", "index": 1}]})
+        assert here.receive() == {}
+
+    def test_a_new_bus_starts_after_the_published_updates(self, buses, tmp_path, monkeypatch):
+        here, _ = buses
+        publish(here, "here", monkeypatch, {"T": [{"update": "delete", "index": 1}]})
+        monkeypatch.setattr(dbbus, "instance", "later")
+        later = SqliteBus(str(tmp_path / "unisi.db-updates"))
+        try:
+            assert later.receive() == {}
+        finally:
+            later.close()
+
+    def test_old_updates_are_pruned(self, buses, monkeypatch):
+        here, there = buses
+        here.keep = -1
+        monkeypatch.setattr(SqliteBus, "prune_every", 2)
+        publish(here, "here", monkeypatch, {"T": [{"update": "delete", "index": 1}]})
+        publish(here, "here", monkeypatch, {"T": [{"update": "delete", "index": 2}]})
+        assert there._conn.execute("SELECT COUNT(*) FROM updates").fetchone()[0] == 0
+
+    def test_updates_pruned_before_they_were_read_are_noticed(self, buses, monkeypatch):
+        here, there = buses
+        here.keep = -1
+        monkeypatch.setattr(SqliteBus, "prune_every", 3)
+        for index in range(3):
+            publish(here, "here", monkeypatch, {"T": [{"update": "delete", "index": index}]})
+        monkeypatch.setattr(dbbus, "instance", "there")
+        assert there.receive() is None
+        publish(here, "here", monkeypatch, {"T": [{"update": "delete", "index": 5}]})
+        monkeypatch.setattr(dbbus, "instance", "there")
+        assert there.receive() == {"T": [{"update": "delete", "index": 5}]}
+
+    def test_updates_pruned_after_they_were_read_are_no_loss(self, buses, monkeypatch):
+        here, there = buses
+        publish(here, "here", monkeypatch, {"T": [{"update": "delete", "index": 1}]})
+        monkeypatch.setattr(dbbus, "instance", "there")
+        assert there.receive() == {"T": [{"update": "delete", "index": 1}]}
+        here._conn.execute("DELETE FROM updates")
+        publish(here, "here", monkeypatch, {"T": [{"update": "delete", "index": 2}]})
+        monkeypatch.setattr(dbbus, "instance", "there")
+        assert there.receive() == {"T": [{"update": "delete", "index": 2}]}
+
+    def test_a_new_bus_after_pruned_updates_has_lost_nothing(self, buses, tmp_path, monkeypatch):
+        here, _ = buses
+        here.keep = -1
+        monkeypatch.setattr(SqliteBus, "prune_every", 1)
+        publish(here, "here", monkeypatch, {"T": [{"update": "delete", "index": 1}]})
+        monkeypatch.setattr(dbbus, "instance", "later")
+        later = SqliteBus(str(tmp_path / "unisi.db-updates"))
+        try:
+            assert later.receive() == {}
+        finally:
+            later.close()
+
+
+class TestThread:
+    @pytest.mark.asyncio
+    async def test_the_bus_is_used_off_the_event_loop(self, monkeypatch):
+        import threading
+        threads = []
+        class RecordingBus(UpdateBus):
+            def publish(self, updates):
+                threads.append(threading.get_ident())
+            def receive(self):
+                threads.append(threading.get_ident())
+                return {}
+        monkeypatch.setattr(dbbus, "bus", RecordingBus())
+        await dbbus.publish({"T": [{"update": "delete", "index": 1}]})
+        assert await dbbus.receive() == {}
+        assert len(threads) == 2 and threading.get_ident() not in threads
+
+
+class TestUpdateBus:
+    def test_an_incomplete_bus_fails_on_creation(self):
+        class PublishOnly(UpdateBus):
+            def publish(self, updates):
+                pass
+        with pytest.raises(TypeError):
+            PublishOnly()
+
+
+class TestCurrent:
+    @pytest.mark.asyncio
+    async def test_off_without_config_or_database(self, monkeypatch):
+        import config
+        from unisi.common import Unishare
+        monkeypatch.setattr(dbbus, "bus", None)
+        monkeypatch.setattr(config, "dbbus", 0, raising=False)
+        assert dbbus.current() is None and await dbbus.receive() == {}
+        monkeypatch.setattr(config, "dbbus", 0.5)
+        monkeypatch.setattr(Unishare, "db", None, raising=False)
+        assert dbbus.current() is None
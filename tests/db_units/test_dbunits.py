@@ -14,6 +14,8 @@ Organisation
   TestAppendExtend        - append()/extend(), incl. chunk-boundary regressions
   TestDirectDbtableBypass - self-healing when Dbtable is mutated directly
   TestUpdateCell          - update_cell() for node fields and relation fields
+  TestOffTheLoop          - aget_delta_chunk()/aupdate_cell()
+  TestChunkCache          - the bounded LRU delta_list and read_ahead()
   TestChunkingStress      - randomised sequences of mutations vs. a plain
                              Python list reference model
 
@@ -23,11 +25,12 @@ randomised operation sequences against a reference list and diffing --
 TestChunkingStress is a permanent, deterministic version of that same
 exercise.
 """
+import asyncio
 import random
 
 import pytest
 
-from unisi.dbunits import Dblist, at_iter, dbupdates
+from unisi.dbunits import ChunkCache, Dblist, at_iter, dbupdates
 
 
 # ────────────────────────────────────────────────────────────────────────── #
@@ -490,6 +493,32 @@ class TestDirectDbtableBypass:
 #  update_cell (graph / relation cell editing)                                #
 # ────────────────────────────────────────────────────────────────────────── #
 
+class TestInvalidate:
+    """Dblist.invalidate -- the chunks dropped for updates made by another
+    process, see Dbtable.refresh."""
+
+    def cached(self, make_table):
+        t = make_table(limit=10, rows=[[f"n{i}", i] for i in range(40)])
+        for index in (0, 10, 20, 30):
+            t.list[index]
+        return t.list
+
+    def test_updated_row_drops_its_chunk(self, make_table):
+        lst = self.cached(make_table)
+        lst.invalidate([{"update": "update", "index": 12}])
+        assert sorted(lst.delta_list) == [0, 20, 30]
+
+    def test_deleted_row_drops_the_chunks_from_its_own(self, make_table):
+        lst = self.cached(make_table)
+        lst.invalidate([{"update": "delete", "index": 25, "exclude": True}])
+        assert sorted(lst.delta_list) == [0, 10]
+
+    def test_cleared_table_drops_every_chunk(self, make_table):
+        lst = self.cached(make_table)
+        lst.invalidate([{"update": "updates", "length": 0}])
+        assert lst.delta_list == {}
+
+
 class TestUpdateCell:
     def test_updates_a_node_field_and_persists(self, db, table):
         row = table.list.append(["Alice", 30])
@@ -567,6 +596,154 @@ class TestUpdateCell:
             orders.list.update_cell(0, 1, "x")  # cell 1 == len(table_fields) == the ID
 
 
+class TestOffTheLoop:
+    """The awaitable chunk read and cell write of the Table handlers, see
+    Database.aquery/awrite."""
+
+    @pytest.mark.asyncio
+    async def test_aget_delta_chunk_reads_and_caches_a_missing_chunk(self, make_table):
+        t = make_table(limit=10, rows=[[f"n{i}", i] for i in range(25)])
+        delta, chunk = await t.list.aget_delta_chunk(13)
+        assert delta == 10 and chunk == t.read_rows(skip=10)
+        assert t.list.delta_list[10] is chunk
+        assert await t.list.aget_delta_chunk(-1) == (20, t.read_rows(skip=20))
+        assert await t.list.aget_delta_chunk(25) == (-1, None)
+
+    @pytest.mark.asyncio
+    async def test_chunk_read_while_rows_change_is_not_cached(self, make_table):
+        t = make_table(limit=10, rows=[[f"n{i}", i] for i in range(25)])
+        t.list.delta_list.drop_from(1)
+        read_rows = t.aread_rows
+
+        async def racing_read(skip=0, limit=0):
+            rows = await read_rows(skip, limit)
+            del t.list[0]  # shifts the rows of the chunk being read
+            return rows
+        t.aread_rows = racing_read
+        delta, chunk = await t.list.aget_delta_chunk(13)
+        assert len(chunk) == 10
+        assert 10 not in t.list.delta_list
+
+    @pytest.mark.asyncio
+    async def test_aget_delta_chunk_of_a_cache_mode_list(self, table):
+        lst = Dblist(table, cache=[["Alice", 30, 1], ["Bob", 25, 2]])
+        assert await lst.aget_delta_chunk(1) == (0, [["Alice", 30, 1], ["Bob", 25, 2]])
+
+    @pytest.mark.asyncio
+    async def test_aupdate_cell_writes_and_streams_like_update_cell(self, make_table):
+        t = make_table(limit=10, rows=[[f"n{i}", i] for i in range(25)])
+        update = await t.list.aupdate_cell(17, 1, 99)
+        assert update["index"] == 17 and update["data"] == ["n17", 99, 18]
+        assert t.read_rows(skip=17, limit=1) == [["n17", 99, 18]]
+        assert t.list[17] == ["n17", 99, 18]
+
+    @pytest.mark.asyncio
+    async def test_row_deleted_while_a_cell_is_written(self, make_table, db):
+        t = make_table(rows=[[f"n{i}", i] for i in range(5)])
+        dbupdates[t.id].clear()
+        awrite = db.awrite
+        writing, deleted = asyncio.Event(), asyncio.Event()
+
+        async def slow_write(fn, *args):
+            writing.set()
+            await deleted.wait()
+            return await awrite(fn, *args)
+
+        async def delete_first():
+            await writing.wait()
+            del t.list[0]  # the edited row moves from 2 to 1
+            deleted.set()
+        db.awrite = slow_write
+        update, _ = await asyncio.gather(t.list.aupdate_cell(2, 0, "EDITED"), delete_first())
+
+        rows = [row[0] for row in t.read_rows()]
+        assert rows == ["n1", "EDITED", "n3", "n4"]
+        assert [row[0] for row in t.list] == rows
+        assert update["index"] == 1 and update["data"][0] == "EDITED"
+        assert dbupdates[t.id][-1] is update
+
+    @pytest.mark.asyncio
+    async def test_row_deleted_while_its_cell_is_written(self, make_table, db):
+        t = make_table(rows=[[f"n{i}", i] for i in range(5)])
+        awrite = db.awrite
+
+        async def racing_write(fn, *args):
+            db.awrite = awrite  # an in-memory database is read by awrite too
+            del t.list[2]
+            return await awrite(fn, *args)
+        db.awrite = racing_write
+        assert await t.list.aupdate_cell(2, 0, "EDITED") is None
+        assert [row[0] for row in t.list] == ["n0", "n1", "n3", "n4"]
+
+    @pytest.mark.asyncio
+    async def test_aupdate_cell_in_cache_mode_returns_none(self, table):
+        row = table.list.append(["Alice", 30])
+        lst = Dblist(table, cache=[["Alice", 30, row[-1]]])
+        assert await lst.aupdate_cell(0, 1, 31) is None
+        assert lst[0][1] == 31 and table.read_rows()[0][1] == 31
+
+
+class TestChunkCache:
+    def test_least_recently_used_chunk_is_evicted(self):
+        cache = ChunkCache(2, {0: ["first"]})
+        cache[10] = ["a"]
+        cache[20] = ["b"]
+        cache.get(10)
+        cache[30] = ["c"]
+        assert list(cache) == [0, 10, 30]
+        assert cache.evictions == 1
+
+    def test_chunk_zero_is_never_evicted(self):
+        cache = ChunkCache(1, {0: ["first"]})
+        for key in (10, 20, 30):
+            cache[key] = [key]
+        assert list(cache) == [0, 30]
+
+    def test_size_zero_is_unbounded(self):
+        cache = ChunkCache(0)
+        for key in range(0, 1000, 10):
+            cache[key] = [key]
+        assert len(cache) == 100 and cache.evictions == 0
+
+    def test_dblist_counts_hits_and_misses(self, make_table, monkeypatch):
+        import config
+        monkeypatch.setattr(config, "chunk_cache", 2)
+        t = make_table(limit=10, rows=[[f"n{i}", i] for i in range(50)])
+        cache = t.list.delta_list
+        cache.drop_from(1)
+        cache.hits = cache.misses = cache.evictions = 0
+        for index in (15, 16, 25, 35, 15):
+            t.list[index]
+        stats = t.list.delta_list.stats
+        assert stats["hits"] == 1 and stats["misses"] == 4
+        assert stats["evictions"] == 2 and stats["chunks"] == 3
+
+    @pytest.mark.parametrize("seed", range(5))
+    def test_random_mutations_with_a_small_cache(self, db, seed, monkeypatch):
+        import config
+        monkeypatch.setattr(config, "chunk_cache", 1)
+        TestChunkingStress()._run(db, seed=seed, limit=2, n_ops=60)
+
+    @pytest.mark.asyncio
+    async def test_read_ahead_reads_the_chunk_in_the_background(self, make_table):
+        t = make_table(limit=10, rows=[[f"n{i}", i] for i in range(30)])
+        t.list.delta_list.drop_from(1)
+        t.list.read_ahead(12)
+        t.list.read_ahead(15)  # already being read
+        assert list(t.list._reading) == [10]
+        delta, chunk = await t.list.aget_delta_chunk(14)
+        assert chunk == t.read_rows(skip=10) and t.list.delta_list[10] is chunk
+        assert t.list.delta_list.read_aheads == 1
+        assert t.list._reading == {}
+
+    @pytest.mark.asyncio
+    async def test_read_ahead_skips_cached_and_missing_chunks(self, make_table):
+        t = make_table(limit=10, rows=[[f"n{i}", i] for i in range(30)])
+        t.list.read_ahead(12)   # cached by make_table's extend
+        t.list.read_ahead(30)   # past the end
+        assert t.list._reading == {} and t.list.delta_list.read_aheads == 0
+
+
 # ────────────────────────────────────────────────────────────────────────── #
 #  Randomised stress test                                                     #
 # ────────────────────────────────────────────────────────────────────────── #
@@ -191,7 +191,7 @@ class TestRemoveScreenInfo:
 
 
 # =============================================================================
-# Private "blocks" module system: _install_modules / _capture_modules /
+# Private "blocks" module system: import_block / _capture_modules /
 # _remove_module / _drop_private_module / set_clean
 # =============================================================================
 
@@ -201,10 +201,10 @@ class TestPrivateBlocksModules:
         assert "blocks.widget" in user.modules
 
     def test_sys_modules_is_clean_after_loading(self, make_user):
-        # _capture_modules() moves blocks.* out of the GLOBAL sys.modules
-        # and into this user's own `.modules` dict once compilation
-        # finishes, so a DIFFERENT user's screen doesn't accidentally see
-        # (or reuse) this one's block instances via the module cache.
+        # blocks.* imported by a screen go into this user's own `.modules`
+        # dict, never into the GLOBAL sys.modules, so a DIFFERENT user's
+        # screen doesn't accidentally see (or reuse) this one's block
+        # instances via the module cache.
         make_user("uses_block.py")
         assert not [n for n in sys.modules if n.startswith("blocks.")]
 
@@ -239,33 +239,97 @@ class TestPrivateBlocksModules:
         assert "blocks.widget" in user.modules
         assert "blocks.widget" not in sys.modules
 
-    def test_install_then_capture_round_trips_through_sys_modules(self, make_user):
-        user = make_user("uses_block.py")
-        assert "blocks.widget" not in sys.modules  # captured already
-
-        user._install_modules()
-        assert "blocks.widget" in sys.modules  # temporarily reinstalled
-        assert sys.modules["blocks.widget"] is user.modules["blocks.widget"]
-
-        user._capture_modules()
-        assert "blocks.widget" not in sys.modules  # captured back out again
-
-    def test_install_modules_evicts_a_different_users_stale_block_module(self, make_user):
+    def test_a_block_module_left_in_sys_modules_is_not_used(self, make_user, monkeypatch):
         """
-        _install_modules() removes ANY existing blocks.* entry from
-        sys.modules before installing this user's own -- otherwise a
-        leftover module object from a previous compile (this user's own
-        earlier load, or -- if something ever left one installed -- another
-        user's) would shadow the fresh one about to be exec'd.
+        blocks.* imported by a screen resolve to the user's own modules
+        (ModulesMixin.import_block), never to sys.modules -- a leftover
+        module object there, another user's or a stale one, can't shadow
+        the fresh one.
         """
         user_a = make_user("uses_block.py")
         stale_widget = user_a.modules["blocks.widget"]
-        sys.modules["blocks.widget"] = stale_widget  # simulate a leftover
+        monkeypatch.setitem(sys.modules, "blocks.widget", stale_widget)
 
         user_b = make_user("uses_block.py")
 
         assert user_b.modules["blocks.widget"] is not stale_widget
 
+    def test_blocks_package_is_per_user(self, make_user):
+        user = make_user("uses_block.py")
+        package = user.modules["blocks"]
+        assert package.widget is user.modules["blocks.widget"]
+
+    def test_import_forms_and_relative_imports(self, real_screens_dir_modules):
+        blocks = real_screens_dir_modules.parent / "blocks"
+        (blocks / "parts").mkdir(parents=True)
+        (blocks / "label.py").write_text("from unisi import Text\nlabel = Text('Label')\n")
+        (blocks / "parts" / "__init__.py").write_text("from ..label import label\n")
+        (blocks / "parts" / "panel.py").write_text(
+            "from unisi import Block\nfrom . import label as _\nfrom .. import label\n"
+            "panel = Block('Panel', label.label)\n")
+        (real_screens_dir_modules / "composed.py").write_text(
+            "import blocks.parts.panel\nfrom blocks import label\nfrom blocks.parts import panel, label as parts_label\n"
+            "name = 'Composed'\nblocks = [blocks.parts.panel.panel]\n"
+            "same = label.label is panel.panel.value[0] is parts_label\n")
+        from unisi.users import User
+        user = User("scratch-import-forms")
+
+        module = user.load_screen("composed.py")
+
+        assert module.same
+        assert {"blocks", "blocks.label", "blocks.parts", "blocks.parts.panel"} <= set(user.modules)
+        assert not [n for n in sys.modules if n.startswith("blocks")]
+
+    def test_import_of_the_process_is_not_replaced(self, make_user):
+        import builtins
+        from unisi.modules import _import
+        user = make_user("uses_block.py")
+        assert builtins.__import__ is _import
+        assert user.screen_module.__builtins__["__import__"] is not _import
+
+    def test_importlib_in_a_screen_gets_the_module_of_the_user(self, real_screens_dir_modules):
+        (real_screens_dir_modules.parent / "blocks").mkdir()
+        (real_screens_dir_modules.parent / "blocks" / "label.py").write_text(
+            "from unisi import Text\nlabel = Text('Label')\n")
+        (real_screens_dir_modules / "dynamic.py").write_text(
+            "import importlib\nname = 'Dynamic'\nlabel = importlib.import_module('blocks.label')\n"
+            "from blocks.label import label as imported\n")
+        from unisi.users import User
+        first, second = User("scratch-importlib-1"), User("scratch-importlib-2")
+
+        modules = [user.load_screen("dynamic.py") for user in (first, second)]
+
+        for user, module in zip((first, second), modules):
+            assert module.label is user.modules["blocks.label"]
+            assert module.label.user is user
+            assert module.imported is module.label.label
+            assert module.label.__spec__.origin.endswith("label.py")
+        assert modules[0].label is not modules[1].label
+        assert not [n for n in sys.modules if n.startswith("blocks")]
+
+    def test_unknown_block_module_raises_module_not_found(self, real_screens_dir_modules):
+        from unisi.users import User
+        user = User("scratch-missing-block")
+        (real_screens_dir_modules.parent / "blocks").mkdir()
+        (real_screens_dir_modules / "broken.py").write_text("from blocks.missing import nothing\n")
+
+        with pytest.raises(ModuleNotFoundError):
+            user.load_screen("broken.py")
+        assert "blocks.missing" not in user.modules
+
+    def test_screens_of_different_users_load_in_parallel(self, make_user):
+        from concurrent.futures import ThreadPoolExecutor
+        users = [make_user() for _ in range(8)]
+
+        with ThreadPoolExecutor(8) as pool:
+            modules = list(pool.map(lambda user: user.load_screen("uses_block.py"), users))
+
+        widgets = {id(module.widget_block) for module in modules}
+        assert len(widgets) == len(users)
+        for user, module in zip(users, modules):
+            assert module.widget_block is user.modules["blocks.widget"].widget_block
+        assert not [n for n in sys.modules if n.startswith("blocks.")]
+
 
 # =============================================================================
 # compile_screen (base ModulesMixin behaviour)
@@ -397,6 +461,32 @@ class TestLoadScreen:
         assert first.screen is not second.screen
 
 
+class TestScreenCode:
+    def test_second_load_reuses_the_compiled_code(self, make_user, monkeypatch):
+        import unisi.modules
+        user = make_user()
+        user.load_screen("alpha.py")
+
+        def no_compile(*args, **kwargs):
+            raise AssertionError("compiled again")
+        monkeypatch.setattr(unisi.modules, "compile", no_compile, raising=False)
+        module = user.load_screen("alpha.py")
+
+        assert module.screen.name == "Alpha"
+        assert module.__file__.endswith("alpha.py")
+
+    def test_changed_file_is_compiled_again(self, real_screens_dir_modules):
+        screen = real_screens_dir_modules / "changing.py"
+        screen.write_text("from unisi import Block, Edit\nname = 'Before'\nblocks = [Block('Root', Edit('X', '1'))]\n")
+        from unisi.users import User
+        user = User("scratch-changing-screen")
+        assert user.load_screen("changing.py").screen.name == "Before"
+
+        screen.write_text("from unisi import Block, Edit\nname = 'After edit'\nblocks = [Block('Root', Edit('X', '1'))]\n")
+
+        assert user.load_screen("changing.py").screen.name == "After edit"
+
+
 # =============================================================================
 # _finish_loaded_screen
 # =============================================================================
@@ -196,3 +196,65 @@ def test_find_element_returns_none_for_an_unknown_element(make_user):
         {"block": "Root", "element": "Does not exist", "event": "changed", "value": "x"}
     )
     assert user.find_element(msg) is None
+
+
+class TestLayoutIndex:
+    """find_path/find_element answer from a per-screen index (_layout_index)
+    rebuilt only after a block/screen layout or a unit name changed."""
+
+    def test_index_is_reused_between_lookups(self, make_user):
+        user = make_user("positional")
+        mod = user.screen_module
+        user.find_path(mod.inner)
+        index = mod.screen._layout_index
+        user.find_path(mod.flagged)
+        assert mod.screen._layout_index is index
+
+    def test_layout_change_keeps_the_index_of_other_sessions(self, make_user):
+        user, other = make_user("positional"), make_user("positional")
+        other.find_path(other.screen_module.inner)
+        index = other.screen_module.screen._layout_index
+        user.screen_module.plain_block.value = [user.screen_module.plain]
+        user.screen_module.plain_block.name = "Renamed"
+        other.find_path(other.screen_module.flagged)
+        assert other.screen_module.screen._layout_index is index
+
+    def test_other_block_properties_keep_the_index(self, make_user):
+        user = make_user("positional")
+        mod = user.screen_module
+        user.find_path(mod.inner)
+        index = mod.screen._layout_index
+        mod.plain_block.width = 300
+        user.find_path(mod.flagged)
+        assert mod.screen._layout_index is index
+
+    def test_unit_appended_to_a_block_is_found(self, make_user):
+        user = make_user("positional")
+        mod = user.screen_module
+        user.find_path(mod.inner)
+        extra = Edit("Extra", "x")
+        mod.plain_block.value.append(extra)
+        assert user.find_path(extra) == ["Extra", "Plain block", "Root"]
+
+    def test_unit_removed_from_a_block_is_no_longer_found(self, make_user):
+        user = make_user("positional")
+        mod = user.screen_module
+        assert user.find_path(mod.inner) == ["Inner", "Plain block", "Root"]
+        mod.plain_block.value = [mod.plain]
+        assert user.find_path(mod.inner) is None
+        msg = ReceivedMessage({"block": "Plain block@Root", "element": "Inner", "event": "changed"})
+        assert user.find_element(msg) is None
+
+    def test_renamed_unit_gets_its_new_path(self, make_user):
+        user = make_user("positional")
+        mod = user.screen_module
+        user.find_path(mod.inner)
+        mod.plain_block.name = "Renamed"
+        assert user.find_path(mod.inner) == ["Inner", "Renamed", "Root"]
+        msg = ReceivedMessage({"block": "Renamed@Root", "element": "Inner", "event": "changed"})
+        assert user.find_element(msg) is mod.inner
+
+    def test_find_element_for_a_nested_block_itself(self, make_user):
+        user = make_user("positional")
+        msg = ReceivedMessage({"block": "Inner nested block@Outer nested block", "element": None})
+        assert user.find_element(msg) is user.screen_module.inner_nested_block
@@ -0,0 +1,151 @@
+# Copyright © 2024 UNISI Tech. All rights reserved.
+"""
+Unit tests for unisi/serialize.py: the wire serializer behind common.toJson.
+
+It replaced `jsonpickle.encode(obj, unpicklable=False)`, so most tests here
+pin the JSON it produces for real UNISI objects against jsonpickle's own
+output (jsonpickle is still a dependency, so it's the natural oracle), then
+cover the per-class encoder registry and the value types jsonpickle either
+mangled or crashed on.
+"""
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+import jsonpickle
+import pytest
+
+from unisi import serialize
+from unisi.common import ArgObject, Message, ReceivedMessage, toJson
+from unisi.containers import Block, Screen
+from unisi.graphs import Net, Node, Edge, Topology
+from unisi.tables import Table
+from unisi.units import Unit, Edit, Select, Button, ChangedProxy
+
+# jsonpickle warns that `keys` will default to True in 5.0 -- irrelevant here
+pytestmark = pytest.mark.filterwarnings("ignore:keys will default:DeprecationWarning")
+
+
+def jsonpickle_plain(obj):
+    return json.loads(jsonpickle.encode(obj, unpicklable=False, keys=False))
+
+
+def new_plain(obj):
+    return json.loads(toJson(obj))
+
+
+@pytest.fixture
+def restore_registry():
+    registered = dict(serialize._registered)
+    yield
+    serialize._registered.clear()
+    serialize._registered.update(registered)
+    serialize._encoders.clear()
+
+
+class TestMatchesJsonpickle:
+    def test_screen_with_blocks(self):
+        screen = Screen('Main')
+        screen.blocks = [Block('b', Edit('e', 'text'), [Select('s', 'a', options=['a', 'b'])],
+            Button('go', lambda *_: None))]
+        screen.toolbar = []
+        assert new_plain(screen) == jsonpickle_plain(screen)
+
+    def test_table(self):
+        table = Table('t', headers=['a', 'b'], rows=[[1, 'x'], [2, 'y']])
+        assert new_plain(table) == jsonpickle_plain(table)
+
+    def test_net_uses_its_own_getstate(self):
+        a, b = Edit('a', 1), Edit('b', 2)
+        topology = Topology()
+        topology[a][b] = {}
+        net = Net('net', topology=topology)
+        plain = new_plain(net)
+        assert plain == jsonpickle_plain(net)
+        assert 'topology' not in plain
+        assert [n['name'] for n in plain['nodes']] == ['a', 'b']
+
+    def test_message_with_paths(self):
+        message = Message(Edit('e', 1), Edit('f', 2))
+        message.updates[0]['path'] = ['e', 'b']
+        assert new_plain(message) == jsonpickle_plain(message)
+
+    def test_reactive_unit_state_through_changed_proxy(self, fake_user):
+        unit = Select('s', 'a', options=['a', 'b'])
+        unit.set_reactivity(fake_user)
+        assert isinstance(unit.__dict__['options'], ChangedProxy)
+        assert new_plain(unit) == jsonpickle_plain(unit)
+        assert new_plain(unit)['options'] == ['a', 'b']
+
+
+class TestValues:
+    def test_handlers_are_sent_as_true(self):
+        assert new_plain(Button('b', lambda *_: None))['changed'] is True
+
+    def test_private_unit_attributes_are_skipped(self):
+        unit = Unit('u', 1)
+        unit._secret = 2
+        assert '_secret' not in new_plain(unit)
+
+    def test_tuples_and_sets_become_lists(self):
+        assert new_plain({'t': (1, 2), 's': {3}}) == {'t': [1, 2], 's': [3]}
+
+    def test_non_string_keys(self):
+        assert new_plain({1: 'a', (1, 2): 'b'}) == {'1': 'a', '(1, 2)': 'b'}
+
+    def test_dates_decimal_and_bytes(self):
+        plain = new_plain([date(2024, 1, 2), datetime(2024, 1, 2, 3, 4), Decimal('1.5'), b'ab'])
+        assert plain == ['2024-01-02', '2024-01-02T03:04:00', '1.5', 'YWI=']
+
+    def test_modules_become_their_repr(self):
+        # a screen module doing `from unisi import *` gets screen.persist = unisi.persist
+        import unisi.persist
+        assert new_plain({'m': unisi.persist}) == jsonpickle_plain({'m': unisi.persist})
+
+    def test_functions_become_null(self):
+        def handler(): ...
+        assert new_plain({'f': handler}) == {'f': None}
+
+    def test_reference_cycle_becomes_null(self):
+        node = Node('n')
+        node.self = node
+        assert new_plain(node) == {'name': 'n', 'type': '', 'self': None}
+
+    def test_shared_object_is_repeated_not_nulled(self):
+        edge = Edge(0, 1)
+        assert new_plain([edge, edge]) == [{'source': 0, 'target': 1}] * 2
+
+    def test_regression_argobject_based_messages_serialize(self):
+        """jsonpickle 4 crashed on ArgObject (its __getattr__ answers None for
+        `_jsonpickle_exclude`), i.e. on ReceivedMessage inside an Answer."""
+        message = ReceivedMessage({'block': 'b', 'element': 'e', 'event': 'complete', 'value': 'x'})
+        assert new_plain(message) == {'block': 'b', 'element': 'e', 'event': 'complete', 'value': 'x'}
+        assert new_plain(ArgObject(name='', blocks=[]))['blocks'] == []
+
+
+class TestEncoderRegistry:
+    def test_encoder_is_resolved_once_per_class(self):
+        serialize._encoders.pop(Edit, None)
+        toJson(Edit('e', 1))
+        encoder = serialize._encoders[Edit]
+        toJson(Edit('f', 2))
+        assert serialize._encoders[Edit] is encoder
+
+    def test_subclass_inherits_registered_encoder(self):
+        serialize._encoders.pop(Edit, None)
+        toJson(Edit('e', 1))
+        assert serialize._encoders[Edit] is serialize._registered[Unit]
+
+    def test_subclass_overriding_getstate_does_not_inherit_it(self):
+        class Custom(Unit):
+            def __getstate__(self):
+                return {'custom': self.name}
+        assert new_plain(Custom('c')) == {'custom': 'c'}
+
+    def test_register_encoder_takes_effect(self, restore_registry):
+        class Point:
+            def __init__(self, x, y):
+                self.x, self.y = x, y
+        assert new_plain(Point(1, 2)) == {'x': 1, 'y': 2}
+        serialize.register_encoder(Point, lambda p, active: [p.x, p.y])
+        assert new_plain(Point(1, 2)) == [1, 2]
@@ -16,8 +16,8 @@ A note on writing cell values in persistent-table tests: `table.rows[i][j]
 = value` looks like it should work (and silently "succeeds" -- no
 exception), but it only mutates a transient, disconnected snapshot object
 handed back by Dblist.__getitem__ -- it never reaches the database. Real
-cell edits go through accept_cell_value → Dblist.update_cell(), which is
-also what the framework's own `modify` handler calls. All persistent-table
+cell edits go through accept_db_cell_value → Dblist.aupdate_cell(), which
+is the framework's own `modify` handler of a persistent table. All persistent-table
 tests below set cell values via `table.modify(table, {...})` for exactly
 this reason -- using raw indexing would silently produce tests that pass
 today and quietly stop meaning anything the moment a row gets re-fetched
@@ -43,14 +43,16 @@ Regression tests for the bugs fixed alongside this suite are labelled
     FOREIGN KEY constraint failure, and deselecting one silently deleted
     nothing.
 """
+import asyncio
+
 import pandas as pd
 import pytest
 
 from unisi.common import Unishare
 from unisi.units import Unit
 from unisi.tables import (
-    Table, PandaTable, get_chunk, accept_cell_value, delete_table_row,
-    append_table_row, delete_panda_row, accept_panda_cell, append_panda_row,
+    Table, PandaTable, get_chunk, accept_cell_value, accept_db_cell_value,
+    delete_table_row, append_table_row, delete_panda_row, accept_panda_cell, append_panda_row,
 )
 
 
@@ -364,10 +366,10 @@ class TestAppendPandaRow:
 # ──────────────────────────────────────────────────────────────────────── #
 
 def set_cell(table, delta, cell, value):
-    """Write a cell through the real modify path (Dblist.update_cell), the
+    """Write a cell through the real modify path (Dblist.aupdate_cell), the
     only way a write actually reaches a persistent table's database -- see
     the module docstring for why `table.rows[i][j] = value` doesn't."""
-    table.modify(table, {'delta': delta, 'cell': cell, 'value': value, 'id': None})
+    asyncio.run(table.modify(table, {'delta': delta, 'cell': cell, 'value': value, 'id': None}))
 
 
 class TestTablePersistentBasic:
@@ -375,6 +377,7 @@ class TestTablePersistentBasic:
         t = Table('People', id='People', fields={'name': str, 'age': int})
         assert hasattr(t, 'id')
         assert t.get is get_chunk
+        assert t.modify is accept_db_cell_value
         assert t.filter is False       # no link -> filter defaults off
         assert t.ids is False
         assert t.search == ''
@@ -423,19 +426,30 @@ class TestTablePersistentBasic:
         t.value = [0, 1]
 
         search_handler = fake_user.handlers[(t, 'search')]
-        search_handler(t, 'Ali')
+        asyncio.run(search_handler(t, 'Ali'))
 
         assert [row[0] for row in t.rows] == ['Alice']
         assert t.value == []  # clean_selection() ran
 
+    def test_search_uses_the_full_text_index_of_an_fts_table(self, memdb, fake_user):
+        t = Table('People', id='People', fields={'name': str}, fts=True)
+        assert t.rows.dbtable.fts == 'People_fts'
+        t.append(t, ''); set_cell(t, 0, 0, 'Alice')
+        t.append(t, ''); set_cell(t, 1, 0, 'Bob')
+
+        search_handler = fake_user.handlers[(t, 'search')]
+        asyncio.run(search_handler(t, 'lic'))
+
+        assert [row[0] for row in t.rows] == ['Alice']
+
     def test_clearing_search_restores_full_list(self, memdb, fake_user):
         t = Table('People', id='People', fields={'name': str})
         t.append(t, ''); set_cell(t, 0, 0, 'Alice')
         t.append(t, ''); set_cell(t, 1, 0, 'Bob')
 
         search_handler = fake_user.handlers[(t, 'search')]
-        search_handler(t, 'Ali')
-        search_handler(t, '')
+        asyncio.run(search_handler(t, 'Ali'))
+        asyncio.run(search_handler(t, ''))
 
         assert sorted(row[0] for row in t.rows) == ['Alice', 'Bob']
 
@@ -443,10 +457,24 @@ class TestTablePersistentBasic:
         t = Table('People', id='People', fields={'name': str})
         t.append(t, ''); set_cell(t, 0, 0, 'Alice')
         t.append(t, ''); set_cell(t, 1, 0, 'Bob')
-        chunk = t.get(t, 0)
+        chunk = asyncio.run(t.get(t, 0))
         assert chunk['update'] == 'updates'
         assert 'index' in chunk and 'data' in chunk
 
+    def test_get_chunk_reads_the_next_chunk_ahead(self, memdb):
+        t = Table('People', id='People', fields={'name': str}, limit=2)
+        t.rows.extend([[f'n{i}'] for i in range(6)])
+        t.rows.delta_list.drop_from(1)
+
+        async def scroll():
+            chunk = await t.get(t, 2)
+            await asyncio.gather(*t.rows._reading.values())
+            return chunk
+        chunk = asyncio.run(scroll())
+        assert chunk['index'] == 2
+        assert sorted(t.rows.delta_list) == [0, 2, 4]
+        assert t.rows.delta_list.read_aheads == 1
+
     def test_is_base_table_list_true_for_the_unfiltered_full_list(self, memdb):
         t = Table('People', id='People', fields={'name': str})
         assert t.is_base_table_list is True
@@ -652,7 +680,7 @@ class TestTableLinkedManyToOne:
         set_cell(orders, 1, 0, 'Gadget')
 
         search_handler = fake_user.handlers[(orders, 'search')]
-        search_handler(orders, 'Widg')
+        asyncio.run(search_handler(orders, 'Widg'))
 
         assert [row[0] for row in orders.rows] == ['Widget']
 
@@ -665,7 +693,7 @@ class TestTableLinkedManyToOne:
         filter_handler = fake_user.handlers[(orders, 'filter')]
         filter_handler(orders, False)
         search_handler = fake_user.handlers[(orders, 'search')]
-        search_handler(orders, 'Widg')
+        asyncio.run(search_handler(orders, 'Widg'))
 
         assert [row[0] for row in orders.rows] == ['Widget']
 
@@ -10,6 +10,7 @@ TestChangedProxy*      -- the reactivity proxy in isolation (no Unit needed
                            beyond a throwaway one to own `_mark_changed`).
 TestUnit*               -- Unit's own machinery: construction, reactivity,
                            mutate/accept/delattr, equality, emit(), etc.
+TestObservableTracking  -- the config.tracking = 'observable' containers.
 TestSmartComplete        -- the smart_complete() autocomplete factory.
 Test<Subclass>           -- one class per Unit subclass, covering defaults,
                            explicit overrides, and any subclass-specific
@@ -36,8 +37,9 @@ they're easy to find later:
 """
 import pytest
 
+from unisi import units
 from unisi.units import (
-    ChangedProxy, Unit, smart_complete,
+    ChangedProxy, ChangeMarker, ObservableList, ObservableDict, Unit, smart_complete, take_delta,
     Edit, Text, Range, ContentScaler, Button, CameraButton, UploadButton,
     Image, Video, Sound, Chart, Switch, Select, Tree, TextArea, HTML,
 )
@@ -408,6 +410,21 @@ class TestUnitReactivity:
         u._private = 'internal'
         assert fake_user.calls == []
 
+    def test_mark_changed_is_a_slot_outside_the_state(self, fake_user):
+        u = Edit('e', 1)
+        plain = u.__getstate__()
+        u.set_reactivity(fake_user)
+        assert isinstance(u._mark_changed, ChangeMarker)
+        assert '_mark_changed' not in u.__dict__
+        assert u.__getstate__() == plain
+
+    def test_mutate_keeps_the_marker(self, fake_user):
+        u = Edit('e', 1)
+        u.set_reactivity(fake_user)
+        marker = u._mark_changed
+        u.mutate(Edit('f', 2))
+        assert u._mark_changed is marker and u.__getstate__() == Edit('f', 2).__getstate__()
+
     def test_specific_changed_register_default_contract(self):
         u = Unit('widget')
         assert u.specific_changed_register(None, None) is True
@@ -520,6 +537,142 @@ class TestUnitGetstate:
         assert state['color'] == 'red'
 
 
+class TestUnitDeltaTracking:
+    """Properties changed since a unit's last update are recorded (note_delta)
+    so an update can carry only them; anything not attributable to a property
+    forces a full resend."""
+
+    def test_assigned_properties_are_recorded(self, fake_user):
+        u = Select('s', 'a', options=['a', 'b'])
+        u.set_reactivity(fake_user)
+        u.value = 'b'
+        u.label = 'Pick'
+        assert take_delta(u) == ['label', 'value']
+
+    def test_container_mutation_records_its_property(self, fake_user):
+        u = Select('s', 'a', options=['a', 'b'])
+        u.set_reactivity(fake_user)
+        u.options.append('c')
+        assert take_delta(u) == ['options']
+
+    def test_nested_container_mutation_records_the_root_property(self, fake_user):
+        u = Unit('u', value={'rows': [[1, 2]]})
+        u.set_reactivity(fake_user)
+        u.value['rows'][0].append(3)
+        assert take_delta(u) == ['value']
+
+    def test_delta_is_taken_once(self, fake_user):
+        u = Edit('e', 1)
+        u.set_reactivity(fake_user)
+        u.value = 2
+        assert take_delta(u) == ['value']
+        assert take_delta(u) is None
+
+    def test_mutate_forces_a_full_resend(self, fake_user):
+        u = Edit('e', 1)
+        u.set_reactivity(fake_user)
+        u.mutate(Edit('f', 2))
+        assert take_delta(u) is None
+
+    def test_proxy_of_unknown_property_forces_a_full_resend(self, fake_user):
+        u = Unit('u')
+        u.set_reactivity(fake_user)
+        ChangedProxy([1], u).append(2)
+        assert take_delta(u) is None
+
+    def test_blocks_are_always_resent_whole(self, fake_user):
+        from unisi.containers import Block
+        block = Block('b', Edit('e', 1))
+        block.set_reactivity(fake_user)
+        block.icon = 'api'
+        assert take_delta(block) is None
+
+    def test_non_reactive_units_record_nothing(self):
+        u = Edit('e', 1)
+        u.value = 2
+        assert take_delta(u) is None
+
+
+class TestObservableTracking:
+    """config.tracking = 'observable': unit containers are list/dict subclasses
+    marking the unit changed on mutation instead of ChangedProxy wrappers."""
+
+    @pytest.fixture(autouse=True)
+    def observable(self, monkeypatch):
+        monkeypatch.setattr(units, 'track', units.observe)
+
+    def test_reactive_containers_are_observable(self, fake_user):
+        u = Select('s', 'a', options=['a', 'b'])
+        u.value = {'k': [1]}
+        u.set_reactivity(fake_user)
+        assert type(u.options) is ObservableList and type(u.value) is ObservableDict
+        assert type(u.value['k']) is ObservableList
+
+    def test_reads_do_not_mark_changed(self, fake_user):
+        u = Unit('u', value=[[1, 2], [3, 4]])
+        u.set_reactivity(fake_user)
+        assert sum(x for row in u.value for x in row) == 10
+        assert u.value[1][0] == 3 and len(u.value) == 2
+        assert fake_user.calls == []
+
+    def test_mutations_mark_the_property(self, fake_user):
+        u = Select('s', 'a', options=['a', 'b'])
+        u.set_reactivity(fake_user)
+        u.options.append('c')
+        u.options[0] = 'z'
+        u.options.sort()
+        assert fake_user.changed_names() == [None] * 3
+        assert u.options == ['b', 'c', 'z']
+        assert take_delta(u) == ['options']
+
+    def test_nested_and_later_added_containers_are_tracked(self, fake_user):
+        u = Unit('u', value={'rows': [[1, 2]]})
+        u.set_reactivity(fake_user)
+        u.value['rows'].append([5])
+        u.value['rows'][-1].append(6)
+        del u.value['rows'][0][0]
+        assert len(fake_user.calls) == 3
+        assert u.value == {'rows': [[2], [5, 6]]}
+        assert take_delta(u) == ['value']
+
+    def test_dict_mutations_mark_changed(self, fake_user):
+        u = Unit('u', value={'a': 1})
+        u.set_reactivity(fake_user)
+        u.value['b'] = 2
+        u.value.update(c=3)
+        u.value.pop('a')
+        u.value.setdefault('d', 4)
+        assert len(fake_user.calls) == 4 and u.value == {'b': 2, 'c': 3, 'd': 4}
+
+    def test_assigned_value_is_copied(self, fake_user):
+        u = Unit('u', value=[])
+        u.set_reactivity(fake_user)
+        rows = [1]
+        u.value = rows
+        rows.append(2) #not the stored list
+        assert u.value == [1]
+
+    def test_copies_are_plain(self, fake_user):
+        import copy, pickle
+        u = Unit('u', value={'rows': [[1]]})
+        u.set_reactivity(fake_user)
+        for clone in (copy.copy(u.value), copy.deepcopy(u.value), pickle.loads(pickle.dumps(u.value))):
+            assert type(clone) is dict and clone == {'rows': [[1]]}
+        assert type(copy.deepcopy(u.value)['rows']) is list
+
+    def test_getstate_matches_proxy_mode(self, fake_user):
+        u = Select('s', 'a', options=['a', 'b'])
+        plain = u.__getstate__()
+        u.set_reactivity(fake_user)
+        assert u.__getstate__() == plain
+
+    def test_tuples_and_units_are_kept(self, fake_user):
+        e = Edit('e', 1)
+        u = Unit('u', value=[e, (1, 2)])
+        u.set_reactivity(fake_user)
+        assert u.value[0] is e and type(u.value[1]) is tuple
+
+
 class TestUnitAddChangedHandler:
     @pytest.mark.asyncio
     async def test_composes_with_default_set_value_handler(self):
@@ -0,0 +1,91 @@
+"""
+Unit tests for unisi/compression.py -- config.compress's size threshold for
+permessage-deflate, over a real aiohttp websocket on localhost: small
+messages go out as plain frames, large ones compressed, and the bytes saved
+are counted from the compressed frames actually written.
+"""
+import json
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from unisi import compression
+from unisi.compression import Compression
+
+
+def big_screen():
+    return json.dumps({"type": "screen", "blocks": [{"name": f"block {i}", "value": "x" * 50} for i in range(200)]})
+
+
+SMALL = json.dumps({"type": "update", "updates": [{"path": ["a", "B"], "data": {"value": 1}}]})
+
+
+async def exchange(threshold, client_compress=15):
+    """send SMALL and big_screen() through Compression, return (received texts, its stats)"""
+    stats = {}
+
+    async def handler(request):
+        ws = web.WebSocketResponse(compress=True)
+        await ws.prepare(request)
+        sender = Compression(ws, threshold)
+        await sender.send_str(SMALL)
+        await sender.send_str(big_screen())
+        stats.update(sender.stats, saved=sender.saved)
+        await ws.close()
+        return ws
+
+    app = web.Application()
+    app.add_routes([web.get("/ws", handler)])
+    received = []
+    async with TestServer(app) as server, aiohttp.ClientSession() as session:
+        async with session.ws_connect(server.make_url("/ws"), compress=client_compress) as ws:
+            async for msg in ws:
+                received.append(msg.data)
+    return received, stats
+
+
+@pytest.mark.asyncio
+async def test_only_messages_over_the_threshold_are_compressed():
+    received, stats = await exchange(threshold=1024)
+    assert received == [SMALL, big_screen()]
+    assert stats["messages"] == 2 and stats["compressed"] == 1
+    assert stats["raw_bytes"] == len(big_screen())
+    assert 0 < stats["wire_bytes"] < stats["raw_bytes"] // 5
+    assert stats["saved"] == stats["raw_bytes"] - stats["wire_bytes"]
+
+
+@pytest.mark.asyncio
+async def test_threshold_zero_compresses_every_message():
+    received, stats = await exchange(threshold=0)
+    assert received == [SMALL, big_screen()]
+    assert stats["compressed"] == 2
+
+
+@pytest.mark.asyncio
+async def test_client_without_deflate_gets_plain_frames():
+    received, stats = await exchange(threshold=1024, client_compress=0)
+    assert received == [SMALL, big_screen()]
+    assert "compressed" not in stats and stats["saved"] == 0
+
+
+@pytest.mark.asyncio
+async def test_totals_add_up_over_connections():
+    before = compression.bytes_saved()
+    _, stats = await exchange(threshold=1024)
+    assert compression.bytes_saved() - before == stats["saved"]
+
+
+@pytest.mark.asyncio
+async def test_writer_without_the_private_hooks_leaves_compression_to_aiohttp():
+    sent = []
+    class FakeWs:
+        compress = 15
+        _writer = object() #another aiohttp version's writer
+        async def send_str(self, text, **kwargs):
+            sent.append((text, kwargs))
+    sender = Compression(FakeWs(), 1024)
+    await sender.send_str(big_screen())
+    assert sent == [(big_screen(), {})]
+    assert sender.stats["messages"] == 1 and sender.saved == 0
@@ -0,0 +1,133 @@
+"""
+Unit tests for config.hibernate -- User.hibernate()/wake(), the snapshot
+saved by Persist.save_hibernated and the idle pass of the sweeper.
+"""
+import asyncio
+import time
+
+import pytest
+
+from unisi.pipeline import Pipeline
+from unisi.persist import _SKIP_JSON, _plain_value
+from unisi.units import Edit
+from unisi.users import hibernate_idle
+
+
+class TestHibernate:
+    def test_frees_the_screens_and_closes_the_database(self, make_user):
+        user = make_user("Home")
+        assert user.hibernate() is True
+        assert user.hibernated is True
+        assert user.screens == [] and user.screen_module is None
+        assert user.modules == {} and user.handlers == {}
+        assert user.db is None
+
+    def test_hibernated_user_is_not_hibernated_again(self, make_user):
+        user = make_user("Home")
+        user.hibernate()
+        assert user.hibernate() is False
+
+    def test_users_sharing_screens_are_skipped(self, make_user):
+        from unisi.users import User
+        parent = make_user("Home")
+        User("child-of-" + parent.session, share=parent)
+        assert parent.hibernate() is False
+        assert parent.screens
+
+    def test_testing_session_is_skipped(self, make_user):
+        from unisi.utils import testdir
+        assert make_user(session=testdir).hibernate() is False
+
+
+class TestWake:
+    @pytest.mark.asyncio
+    async def test_message_wakes_with_the_saved_values(self, make_user, deliver):
+        user = make_user("Home")
+        await deliver(user, "Root", "Plain", "changed", "edited")
+        old_module = user.screen_module
+        user.hibernate()
+
+        await deliver(user, "Root", "Attributed", "changed", "2")
+        module = user.screen_module
+        assert user.hibernated is False
+        assert module is not old_module and module.name == "Home"
+        assert module.plain_edit.value == "edited"
+        assert module.attributed.value == "2"
+
+    @pytest.mark.asyncio
+    async def test_woken_session_sends_the_whole_screen(self, make_user, deliver):
+        user = make_user("Home")
+        user.hibernate()
+        _, sent = await deliver(user, "Root", "Plain", "changed", "edited")
+        assert sent is user.screen
+
+    @pytest.mark.asyncio
+    async def test_message_without_a_snapshot_loads_the_screen(self, make_user, deliver):
+        user = make_user("Home")
+        user.hibernate()
+        user._persist_db().restore_hibernated(user, []) #taken by a reconnection
+        await deliver(user, "Root", "Plain", "changed", "edited")
+        assert user.hibernated is False
+        assert user.screen_module.name == "Home"
+        assert user.screen_module.plain_edit.value == "edited"
+
+    def test_reconnection_restores_the_current_screen(self, make_user):
+        import config
+        user = make_user("Home")
+        user.set_screen("Other")
+        user.screen_module.field.value = "typed"
+        user.hibernate()
+
+        config.hibernate = 60
+        again = make_user(session=user.session)
+        assert again.screen_module.name == "Other"
+        assert again.screen_module.field.value == "typed"
+        assert again.db.hibernated_screens() is None
+
+    def test_without_a_snapshot_the_screen_is_loaded(self, make_user):
+        user = make_user("Home")
+        assert user.wake() is False
+        assert user.screen_module.name == "Home"
+
+
+class TestIdlePass:
+    def test_only_idle_sessions_are_hibernated(self, make_user):
+        from unisi.common import Unishare
+        idle, active, busy = make_user("Home"), make_user("Home"), make_user("Home")
+        idle.last_activity = time.monotonic() - 100
+        busy.last_activity = None
+        for user in (idle, active, busy):
+            Unishare.sessions[user.session] = user
+        assert hibernate_idle(50) == [idle]
+        assert not active.hibernated and not busy.hibernated
+
+    @pytest.mark.asyncio
+    async def test_fast_lane_traffic_keeps_a_session_awake(self, make_user, wire_send):
+        from unisi.common import Unishare
+        user = make_user("Home")
+        wire_send(user)
+        user.last_activity = time.monotonic() - 100
+        Unishare.sessions[user.session] = user
+        pipeline = Pipeline(user, None, 4)
+        await pipeline.put({"block": "Root", "element": "Completable", "event": "complete", "value": "1"})
+        for _ in range(5):
+            await asyncio.sleep(0)
+        assert user.send.sent
+        assert hibernate_idle(50) == [] and not user.hibernated
+        await pipeline.close()
+
+
+class TestPlainValue:
+    def test_plain_data_is_kept(self):
+        value = {"a": [1, 2.5, "x", None, True]}
+        assert _plain_value(value, lambda unit: None) == value
+
+    def test_other_objects_are_skipped(self):
+        assert _plain_value([1, object()], lambda unit: None) is _SKIP_JSON
+        assert _plain_value({1: "x"}, lambda unit: None) is _SKIP_JSON
+        assert _plain_value({"id": 1}, lambda unit: None) is _SKIP_JSON
+
+    def test_units_become_references(self):
+        edit = Edit("a", "")
+        assert _plain_value([edit], lambda unit: ("ns", "Root/a")) == [{"id": "Root/a"}]
+        assert _plain_value(edit, lambda unit: None) is _SKIP_JSON
@@ -0,0 +1,160 @@
+"""
+Unit tests for unisi/outbox.py -- config.outbox's per-connection outbound
+queue: in-order writes, merging of waiting update/progress messages, the
+high-water mark and the counters.
+
+The socket is a stand-in `write` coroutine that can be held, like a client
+that stopped reading.
+"""
+import asyncio
+import json
+
+import pytest
+
+from unisi.common import Message, TypeMessage
+from unisi.outbox import Outbox, merge_updates
+from unisi.units import Edit
+
+
+class SlowClient:
+    def __init__(self):
+        self.frames = []
+        self.reading = asyncio.Event()
+        self.reading.set()
+
+    async def write(self, text):
+        await self.reading.wait()
+        self.frames.append(json.loads(text))
+
+
+def update(*units, type="update"):
+    message = Message(*units, type=type)
+    for unit in units:
+        message.updates[units.index(unit)]["path"] = [unit.name, "Block"]
+    return message
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+@pytest.fixture
+def client():
+    return SlowClient()
+
+
+class TestOrder:
+    @pytest.mark.asyncio
+    async def test_messages_are_written_in_order(self, client):
+        outbox = Outbox(client.write, 10)
+        await outbox.put(update(Edit("a", 1)))
+        await outbox.put('{"type": "info"}')
+        await outbox.put(TypeMessage("warning", "w"))
+        await settle()
+        assert [frame["type"] for frame in client.frames] == ["update", "info", "warning"]
+        assert outbox.stats["sent"] == 3 and outbox.depth == 0
+        outbox.close()
+
+    @pytest.mark.asyncio
+    async def test_queued_message_keeps_the_state_it_was_sent_with(self, client):
+        client.reading.clear()
+        outbox = Outbox(client.write, 10)
+        edit = Edit("a", 1)
+        await outbox.put(update(edit))
+        edit.value = 2
+        client.reading.set()
+        await settle()
+        assert client.frames[0]["updates"][0]["data"]["value"] == 1
+        outbox.close()
+
+
+class TestMerging:
+    @pytest.mark.asyncio
+    async def test_consecutive_updates_merge_last_write_wins(self, client):
+        client.reading.clear()
+        outbox = Outbox(client.write, 10)
+        await outbox.put('"first"') #held by the writer
+        await settle()
+        a, b = Edit("a", 1), Edit("b", 1)
+        await outbox.put(update(a, b))
+        a.value = 2
+        await outbox.put(update(a))
+        assert outbox.depth == 1 and outbox.stats["coalesced"] == 1
+
+        client.reading.set()
+        await outbox.put('"last"')
+        await settle()
+        merged = client.frames[1]["updates"]
+        assert [(u["data"]["name"], u["data"]["value"]) for u in merged] == [("a", 2), ("b", 1)]
+        outbox.close()
+
+    @pytest.mark.asyncio
+    async def test_superseded_progress_is_dropped(self, client):
+        client.reading.clear()
+        outbox = Outbox(client.write, 10)
+        await outbox.put('"first"')
+        await settle()
+        for percent in range(5):
+            await outbox.put(TypeMessage("progress", f"{percent}%"))
+        assert outbox.depth == 1 and outbox.stats["dropped"] == 4
+        client.reading.set()
+        await settle()
+        assert client.frames[-1]["value"] == "4%"
+        outbox.close()
+
+    @pytest.mark.asyncio
+    async def test_text_and_other_types_are_never_merged(self, client):
+        client.reading.clear()
+        outbox = Outbox(client.write, 10)
+        await outbox.put('"first"')
+        await settle()
+        await outbox.put(update(Edit("a", 1)))
+        await outbox.put('{"type": "update", "updates": []}')
+        await outbox.put(update(Edit("a", 2)))
+        await outbox.put(TypeMessage("progress", "1"))
+        assert outbox.depth == 4
+        outbox.close()
+
+    def test_merge_updates_applies_a_later_delta_to_the_earlier_update(self):
+        earlier = [{"data": {"name": "a", "type": "string", "value": 1}, "path": ["a", "B"]}]
+        later = [{"data": {"name": "a", "value": 2}, "path": ["a", "B"], "delta": True}]
+        assert merge_updates(earlier, later) == [
+            {"data": {"name": "a", "type": "string", "value": 2}, "path": ["a", "B"]}]
+
+    def test_merge_updates_keeps_unrelated_updates(self):
+        earlier = [{"data": 1, "path": ["a", "B"]}, {"data": 2, "path": ["b", "B"]}]
+        later = [{"data": 3, "path": ["b", "B"]}, {"data": 4, "path": ["c", "B"]}]
+        assert [u["data"] for u in merge_updates(earlier, later)] == [1, 3, 4]
+
+
+class TestBackpressure:
+    @pytest.mark.asyncio
+    async def test_put_waits_at_the_high_water_mark(self, client):
+        client.reading.clear()
+        outbox = Outbox(client.write, 2)
+        await outbox.put('"held"')
+        await settle()
+        await outbox.put('"one"')
+        await outbox.put('"two"')
+        third = asyncio.create_task(outbox.put('"three"'))
+        await settle()
+        assert not third.done() and outbox.stats["max_depth"] == 2
+
+        client.reading.set()
+        await settle()
+        assert third.done()
+        assert client.frames == ["held", "one", "two", "three"]
+        outbox.close()
+
+    @pytest.mark.asyncio
+    async def test_a_failed_write_closes_the_outbox(self):
+        async def broken(text):
+            raise ConnectionResetError("gone")
+
+        outbox = Outbox(broken, 2)
+        await outbox.put("a")
+        await settle()
+        assert outbox.closed and outbox.stats["failed"] == 1
+        await outbox.put("b") #ignored, nobody to send it to
+        assert outbox.depth == 0
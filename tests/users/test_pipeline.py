@@ -0,0 +1,166 @@
+"""
+Unit tests for unisi/pipeline.py -- config.pipeline's per-session processing:
+the ordered lane keeps mutating messages in arrival order, the fast lane
+answers `complete`/`get` while the ordered lane is busy, and put() blocks
+once `size` messages are queued or running.
+
+The ordered lane's `process` is a stand-in here (server.process_message is
+the real one), so a "slow handler" is just a coroutine waiting on an Event.
+"""
+import asyncio
+import json
+
+import pytest
+
+from unisi.pipeline import Pipeline
+
+
+def raw(element, event, value=None, block="Root"):
+    return {"block": block, "element": element, "event": event, "value": value}
+
+
+class SlowProcess:
+    """Ordered-lane stand-in recording what it was given, blocked until released."""
+    def __init__(self):
+        self.started = []
+        self.finished = []
+        self.release = asyncio.Event()
+
+    async def __call__(self, user, raw_message):
+        self.started.append(raw_message)
+        await self.release.wait()
+        self.finished.append(raw_message)
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+@pytest.fixture
+def home_user(make_user, wire_send):
+    user = make_user("Home")
+    wire_send(user)
+    return user
+
+
+class TestLanes:
+    @pytest.mark.asyncio
+    async def test_complete_is_answered_while_a_changed_handler_runs(self, home_user):
+        process = SlowProcess()
+        pipeline = Pipeline(home_user, process, 8)
+        await pipeline.put(raw("Save", "changed"))
+        await pipeline.put(raw("Completable", "complete", "1"))
+        await settle()
+
+        assert process.started == [raw("Save", "changed")] and not process.finished
+        answer = json.loads(home_user.send.sent[-1])
+        assert answer["type"] == "complete" and answer["value"] == "completion-result"
+        process.release.set()
+        await settle()
+        assert process.finished == [raw("Save", "changed")]
+        await pipeline.close()
+
+    @pytest.mark.asyncio
+    async def test_mutating_messages_keep_their_order(self, home_user):
+        process = SlowProcess()
+        pipeline = Pipeline(home_user, process, 8)
+        messages = [raw("Plain", "changed", str(i)) for i in range(4)]
+        for message in messages:
+            await pipeline.put(message)
+        process.release.set()
+        await settle()
+        assert process.finished == messages
+        assert pipeline.pending == 0
+        await pipeline.close()
+
+    @pytest.mark.asyncio
+    async def test_batches_and_screen_messages_take_the_ordered_lane(self, home_user):
+        pipeline = Pipeline(home_user, SlowProcess(), 8)
+        assert pipeline.fast_lane([raw("Completable", "complete")]) is None
+        assert pipeline.fast_lane({"block": "root", "element": None, "event": "complete", "value": "Other"}) is None
+        assert pipeline.fast_lane(raw("Completable", "complete") | {"screen": "Other"}) is None
+        assert pipeline.fast_lane(raw("Plain", "changed")) is None
+        elem, _ = pipeline.fast_lane(raw("Completable", "complete"))
+        assert elem is home_user.screen_module.completable
+        await pipeline.close()
+
+    @pytest.mark.asyncio
+    async def test_a_registered_handler_takes_the_ordered_lane(self, home_user):
+        # a @handle handler's result is not wrapped into an Answer
+        completable = home_user.screen_module.completable
+        home_user.handlers = {(completable, "complete"): lambda *_: ["x"]}
+        pipeline = Pipeline(home_user, SlowProcess(), 8)
+        assert pipeline.fast_lane(raw("Completable", "complete")) is None
+        await pipeline.close()
+
+    @pytest.mark.asyncio
+    async def test_fast_lane_leaves_pending_changes_to_the_handler_in_flight(self, home_user):
+        plain = home_user.screen_module.plain_edit
+        home_user.changed_units.add(plain)
+        pipeline = Pipeline(home_user, SlowProcess(), 8)
+        await pipeline.put(raw("Completable", "complete", "1"))
+        await settle()
+        assert plain in home_user.changed_units
+        await pipeline.close()
+
+
+class TestBackpressure:
+    @pytest.mark.asyncio
+    async def test_put_waits_once_size_messages_are_pending(self, home_user):
+        process = SlowProcess()
+        pipeline = Pipeline(home_user, process, 2)
+        await pipeline.put(raw("Plain", "changed", "1"))
+        await pipeline.put(raw("Plain", "changed", "2"))
+        third = asyncio.create_task(pipeline.put(raw("Plain", "changed", "3")))
+        await settle()
+        assert not third.done() and pipeline.pending == 2
+
+        process.release.set()
+        await settle()
+        assert third.done()
+        assert [m["value"] for m in process.finished] == ["1", "2", "3"]
+        await pipeline.close()
+
+
+class TestFailures:
+    @pytest.mark.asyncio
+    async def test_a_failing_fast_lane_answer_is_an_error(self, home_user):
+        async def failing(elem, value):
+            raise RuntimeError("complete")
+        home_user.screen_module.completable.complete = failing
+        pipeline = Pipeline(home_user, SlowProcess(), 4)
+        await pipeline.put(raw("Completable", "complete", "1"))
+        await settle()
+        assert json.loads(home_user.send.sent[-1])["type"] == "error"
+        assert pipeline.pending == 0
+        await pipeline.close()
+
+    @pytest.mark.asyncio
+    async def test_a_failing_message_does_not_stop_the_ordered_lane(self, home_user, monkeypatch):
+        logged = []
+        monkeypatch.setattr(home_user, "log", lambda message, type="error": logged.append(message))
+        done = []
+
+        async def process(user, raw_message):
+            if raw_message["value"] == "bad":
+                raise ValueError("bad message")
+            done.append(raw_message["value"])
+
+        pipeline = Pipeline(home_user, process, 4)
+        await pipeline.put(raw("Plain", "changed", "bad"))
+        await pipeline.put(raw("Plain", "changed", "good"))
+        await settle()
+        assert done == ["good"]
+        assert "bad message" in logged[0]
+        await pipeline.close()
+
+    @pytest.mark.asyncio
+    async def test_close_cancels_what_is_still_running(self, home_user):
+        process = SlowProcess()
+        pipeline = Pipeline(home_user, process, 4)
+        await pipeline.put(raw("Plain", "changed"))
+        await settle()
+        await pipeline.close()
+        assert pipeline.worker.cancelled()
+        assert not process.finished
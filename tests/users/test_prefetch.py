@@ -0,0 +1,165 @@
+"""
+Unit tests for unisi/prefetch.py -- config.prefetch's background screen
+compilation: the prediction order, screens taken by ensure_screen, the
+per-session memory budget and the navigation statistics.
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from unisi.prefetch import Prefetcher, footprint
+from unisi.units import Edit
+
+
+@pytest.fixture(autouse=True)
+def statistics():
+    Prefetcher.transitions.clear()
+    Prefetcher.sizes.clear()
+    yield Prefetcher.transitions
+    Prefetcher.transitions.clear()
+    Prefetcher.sizes.clear()
+
+
+async def prefetch(prefetcher):
+    prefetcher.schedule()
+    if prefetcher.task:
+        await prefetcher.task
+
+
+class TestPrediction:
+    def test_registry_order_without_statistics(self, make_user):
+        user = make_user("Home")
+        assert Prefetcher(user, 10**7).predict() == ["other.py"]
+
+    def test_loaded_screens_are_not_predicted(self, make_user):
+        user = make_user("Home")
+        user.ensure_screen("Other")
+        assert Prefetcher(user, 10**7).predict() == []
+
+    def test_navigation_is_counted_from_screen_to_screen(self, make_user, statistics):
+        user = make_user("Home")
+        prefetcher = Prefetcher(user, 10**7)
+        user.set_screen("Other")
+        prefetcher.schedule()
+        assert statistics["home.py"]["other.py"] == 1
+
+
+class TestPrefetching:
+    @pytest.mark.asyncio
+    async def test_predicted_screen_is_compiled_and_taken(self, make_user):
+        user = make_user("Home")
+        prefetcher = Prefetcher(user, 10**7)
+        await prefetch(prefetcher)
+        module = user.prefetched["other.py"]
+        assert prefetcher.stats["prefetched"] == 1
+
+        assert user.ensure_screen("Other") is module
+        assert module in user.screens and not user.prefetched
+        prefetcher.schedule()
+        assert prefetcher.used == 0 and prefetcher.stats["taken"] == 1
+
+    @pytest.mark.asyncio
+    async def test_screen_over_the_budget_is_dropped(self, make_user):
+        user = make_user("Home")
+        prefetcher = Prefetcher(user, 100)
+        await prefetch(prefetcher)
+        assert user.prefetched == {}
+        assert prefetcher.stats["skipped"] == 1 and "other.py" in prefetcher.skipped
+        assert Prefetcher.sizes["other.py"] > 100
+
+    @pytest.mark.asyncio
+    async def test_close_drops_prefetched_screens(self, make_user):
+        user = make_user("Home")
+        prefetcher = Prefetcher(user, 10**7)
+        await prefetch(prefetcher)
+        prefetcher.close()
+        assert user.prefetched == {}
+
+
+class TestScreenLock:
+    @pytest.mark.asyncio
+    async def test_session_does_not_wait_for_the_screen_being_prefetched(self, make_user, monkeypatch):
+        from unisi.modules import staging
+        user = make_user("Home")
+        compile_screen, started, release, order = type(user).compile_screen, threading.Event(), threading.Event(), []
+        def slow_compile(self, file):
+            if staging.get():
+                started.set()
+                release.wait(5)
+                order.append("prefetched")
+            return compile_screen(self, file)
+        monkeypatch.setattr(type(user), "compile_screen", slow_compile)
+        prefetcher = Prefetcher(user, 10**7)
+        prefetcher.schedule()
+        await asyncio.get_running_loop().run_in_executor(None, started.wait)
+
+        assert user.screen_lock.acquire(blocking=False) #a persist save does not wait either
+        user.screen_lock.release()
+        module = user.ensure_screen("Other")
+        order.append("session")
+        release.set()
+        await prefetcher.task
+
+        assert order == ["session", "prefetched"]
+        assert user.screens.count(module) == 1 and user.prefetched == {}
+
+    def test_reflections_share_the_lock(self, make_user):
+        from unisi.users import User
+        parent = make_user("Home")
+        assert User("child-of-" + parent.session, share=parent).screen_lock is parent.screen_lock
+
+
+class TestStage:
+    def test_blocks_modules_and_handlers_are_merged(self, make_user):
+        from types import ModuleType
+        from unisi.modules import Stage
+        user = make_user("Home")
+        stage = Stage(user)
+        block, handler = ModuleType("blocks.extra"), object()
+        stage.modules["blocks.extra"] = block
+        stage.handlers["unit", "changed"] = handler
+        module = ModuleType("other")
+        assert user.take_stage("other.py", module, stage) is module
+        assert user.modules["blocks.extra"] is block
+        assert user.handlers["unit", "changed"] is handler
+
+    def test_blocks_modules_imported_meanwhile_drop_the_screen(self, make_user):
+        from types import ModuleType
+        from unisi.modules import Stage
+        user = make_user("Home")
+        stage = Stage(user)
+        stage.modules["blocks.extra"] = ModuleType("blocks.extra")
+        stage.handlers["unit", "changed"] = object()
+        user.modules["blocks.extra"] = ModuleType("blocks.extra")
+        assert user.take_stage("other.py", ModuleType("other"), stage) is None
+        assert ("unit", "changed") not in user.handlers
+
+    @pytest.mark.asyncio
+    async def test_staged_compile_leaves_the_session_as_it_is(self, make_user):
+        from unisi.modules import Stage
+        user = make_user("Home")
+        modules, handlers = dict(user.modules), dict(user.handlers)
+        stage = Stage(user)
+        module = await asyncio.get_running_loop().run_in_executor(None, user.stage_screen, "other.py", stage)
+        assert module.name == "Other"
+        assert user.modules == modules and user.handlers == handlers
+
+
+class TestFootprint:
+    def test_grows_with_unit_content(self):
+        small, big = Edit("a", "x"), Edit("a", "x" * 10_000)
+        assert footprint(big) - footprint(small) > 9_000
+
+    def test_shared_objects_are_counted_once(self):
+        options = [f"option {i}" for i in range(100)]
+        one = footprint([Edit("a", "", options=options)])
+        two = footprint([Edit("a", "", options=options), Edit("b", "", options=options)])
+        assert two - one < footprint(options)
+
+    def test_reactive_containers_are_counted(self, make_user):
+        edit = Edit("a", "", options=["x" * 10_000])
+        before = footprint(edit)
+        edit.set_reactivity(make_user())
+        assert footprint(edit) >= before
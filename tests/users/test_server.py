@@ -0,0 +1,113 @@
+"""
+Unit tests for server.make_user -- a connecting session is created and
+registered in the event loop, only the compilation of its first screen runs in
+a thread of the default executor.
+"""
+import json
+import threading
+
+import pytest
+from aiohttp.test_utils import make_mocked_request
+
+from unisi.common import Unishare
+
+
+def request(query=""):
+    return make_mocked_request("GET", f"/ws{query}")
+
+
+class TestMakeUser:
+    @pytest.mark.asyncio
+    async def test_only_the_screen_is_compiled_in_a_thread(self, monkeypatch):
+        from unisi import server
+        from unisi.users import User
+        loop_thread = threading.get_ident()
+        threads = {}
+        load_screen, show_first_screen = User.load_screen, User.show_first_screen
+        def recording_load(user, file):
+            threads["compile"] = threading.get_ident()
+            return load_screen(user, file)
+        def recording_show(user, module):
+            threads["show"] = threading.get_ident()
+            assert user.session not in Unishare.sessions
+            return show_first_screen(user, module)
+        monkeypatch.setattr(User, "load_screen", recording_load)
+        monkeypatch.setattr(User, "show_first_screen", recording_show)
+        count = User.count
+
+        user, ok = await server.make_user(request())
+
+        assert ok and user.screen_module.name == "Home"
+        assert threads["compile"] != loop_thread
+        assert threads["show"] == loop_thread
+        assert Unishare.sessions[user.session] is user
+        assert User.count == count + 1
+
+    @pytest.mark.asyncio
+    async def test_shared_session_joins_in_the_event_loop(self, make_user, monkeypatch):
+        import config
+        from unisi import server
+        config.share = True
+        parent = make_user("Home")
+        Unishare.sessions[parent.session] = parent
+        monkeypatch.setattr(type(parent), "load_screen", lambda *_: pytest.fail("compiled again"))
+
+        user, ok = await server.make_user(request(f"?session={parent.session}"))
+
+        assert ok and user.screens is parent.screens
+        assert user.reflections == [parent, user]
+
+
+class Unsendable:
+    def __getstate__(self):
+        raise TypeError("not for the wire")
+
+
+async def exchange(monkeypatch, results, outbox=0, pipeline=0):
+    """send one message per result the handlers return (an exception is raised)
+    through websocket_handler, return the texts received"""
+    import aiohttp
+    import config
+    from aiohttp import web
+    from aiohttp.test_utils import TestServer
+    from unisi import server
+    from unisi.users import User
+    monkeypatch.setattr(config, "outbox", outbox, raising=False)
+    monkeypatch.setattr(config, "pipeline", pipeline, raising=False)
+    returned = iter(results)
+    async def message_result(self, message):
+        result = next(returned)
+        if isinstance(result, Exception):
+            raise result
+        return result
+    monkeypatch.setattr(User, "message_result", message_result)
+    app = web.Application()
+    app.add_routes([web.get("/ws", server.websocket_handler)])
+    received = []
+    async with TestServer(app) as test_server, aiohttp.ClientSession() as session:
+        async with session.ws_connect(test_server.make_url("/ws")) as ws:
+            await ws.receive(timeout=5) #the screen
+            for _ in results:
+                await ws.send_str('{"block": "Root", "element": "Plain", "event": "changed", "value": "x"}')
+                received.append((await ws.receive(timeout=5)).data)
+    return received
+
+
+class TestSend:
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("outbox", [0, 8])
+    async def test_unsendable_result_is_an_error_and_the_session_goes_on(self, monkeypatch, outbox):
+        from unisi.common import Warning
+        received = await exchange(monkeypatch, [Unsendable(), Warning("next")], outbox)
+        assert json.loads(received[0])["type"] == "error"
+        assert json.loads(received[1])["type"] == "warning"
+
+
+class TestFailingMessage:
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("pipeline", [0, 8])
+    async def test_is_an_error_and_the_session_goes_on(self, monkeypatch, pipeline):
+        from unisi.common import Warning
+        received = await exchange(monkeypatch, [RuntimeError("handler"), Warning("next")], pipeline=pipeline)
+        assert json.loads(received[0])["type"] == "error"
+        assert json.loads(received[1])["type"] == "warning"
@@ -0,0 +1,129 @@
+"""
+Unit tests for unisi/templates.py -- config.shared_screens: a screen module
+executed once into a template, sessions getting copy-on-write copies of its
+units and functions rebound to their own copy.
+"""
+import json
+
+import pytest
+
+from unisi import templates
+from unisi.common import toJson
+from unisi.units import Unit, unit_vars
+
+
+@pytest.fixture
+def shared():
+    import config
+
+    templates.clear()
+    config.shared_screens = True
+    yield
+    templates.clear()
+
+
+def home(user):
+    return user.screen_module
+
+
+def screen_json(user):
+    return json.loads(toJson(user.screen))
+
+
+class TestSessionCopies:
+    def test_sessions_get_distinct_modules_and_units(self, shared, make_user):
+        a, b = make_user("Home"), make_user("Home")
+        assert home(a) is not home(b)
+        assert home(a).save_button is not home(b).save_button
+        assert home(a).root.value[0] is home(a).save_button
+
+    def test_screen_is_the_same_as_executed_per_session(self, shared, make_user):
+        import config
+
+        copy = screen_json(make_user("Home"))
+        config.shared_screens = False
+        executed = screen_json(make_user("Home"))
+        copy.pop("menu", None), executed.pop("menu", None)
+        assert copy == executed
+
+    def test_template_is_executed_once(self, shared, make_user):
+        make_user("Home")
+        template = templates.screens["home.py"]
+        make_user("Home")
+        assert templates.screens["home.py"] is template
+
+    def test_clear_rebuilds_the_template(self, shared, make_user):
+        make_user("Home")
+        template = templates.screens["home.py"]
+        templates.clear()
+        make_user("Home")
+        assert templates.screens["home.py"] is not template
+
+    def test_untouched_properties_stay_in_the_template(self, shared, make_user):
+        user = make_user("Home")
+        toJson(user.screen)
+        edit = home(user).plain_edit
+        assert "value" not in edit.__dict__
+        assert edit.value == "default"
+        assert unit_vars(edit)["value"] == "default"
+
+    def test_graph_copy_is_encoded_like_the_executed_one(self, shared, make_user, real_screens_dir):
+        import config
+
+        (real_screens_dir / "graphs.py").write_text(
+            "from unisi import *\nname = 'Graphs'\nnet = Net('Net')\nblocks = [Block('Root', net)]\n")
+        copy = home(make_user("Graphs")).net
+        assert "_template" in copy.__dict__
+        config.shared_screens = False
+        executed = home(make_user("Graphs")).net
+        assert json.loads(toJson(copy)) == json.loads(toJson(executed))
+        assert json.loads(toJson(copy))["name"] == "Net"
+
+    def test_plain_module_state_is_per_session(self, shared, make_user):
+        a, b = make_user("Home"), make_user("Home")
+        assert home(a).save_clicks is not home(b).save_clicks
+        assert home(a).attributed.custom_attr == "old"
+
+
+class TestCopyOnWrite:
+    def test_assignment_does_not_leak(self, shared, make_user):
+        a, b = make_user("Home"), make_user("Home")
+        home(a).plain_edit.value = "changed"
+        assert home(b).plain_edit.value == "default"
+        template = templates.screens["home.py"].module
+        assert template.plain_edit.value == "default"
+
+    def test_in_place_mutation_does_not_leak(self, shared, make_user):
+        a, b = make_user("Home"), make_user("Home")
+        home(a).root.value.append([])
+        assert len(home(b).root.value) == len(home(a).root.value) - 1
+
+    def test_deleted_property_is_not_read_from_the_template(self, shared, make_user):
+        user = make_user("Home")
+        edit = home(user).attributed
+        del edit.custom_attr
+        assert not hasattr(edit, "custom_attr")
+        assert "_template" not in edit.__dict__
+
+    def test_mutate_detaches_from_the_template(self, shared, make_user):
+        user = make_user("Home")
+        edit = home(user).plain_edit
+        edit.mutate(Unit(name="Plain", type="string", value="mutated"))
+        assert edit.value == "mutated"
+        assert "_template" not in edit.__dict__
+
+
+class TestHandlers:
+    @pytest.mark.asyncio
+    async def test_handler_runs_against_its_session_copy(self, shared, make_user, deliver):
+        a, b = make_user("Home"), make_user("Home")
+        result, _ = await deliver(a, "Root", "Save", "changed", "clicked")
+        assert result == "handled"
+        assert home(a).save_clicks == ["clicked"]
+        assert home(b).save_clicks == []
+
+    def test_blocks_modules_belong_to_the_session(self, shared, make_user):
+        a, b = make_user("Home"), make_user("Home")
+        assert set(templates.blocks) <= set(a.modules)
+        for name in templates.blocks:
+            assert a.modules[name] is not b.modules[name]
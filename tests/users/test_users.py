@@ -17,10 +17,11 @@ than mocking users.py's own dependencies -- same rationale as
 tests/persist_voice_reloder/conftest.py.
 """
 import asyncio
+import json
 
 import pytest
 
-from unisi.common import Message, ReceivedMessage, Unishare
+from unisi.common import Message, ReceivedMessage, Unishare, toJson
 from unisi.containers import Dialog
 from unisi.units import Edit
 from unisi.utils import testdir
@@ -41,6 +42,7 @@ class FakeReflectionUser:
     """
     def __init__(self, screen_module=None):
         self.screen_module = screen_module
+        self.hibernated = False
         self.sent = []
 
     async def send(self, message):
@@ -1006,6 +1008,95 @@ class TestCompileScreen:
         assert module.screen._mark_changed is not None
 
 
+# =============================================================================
+# encode_screen (block reuse markers)
+# =============================================================================
+
+class TestEncodeScreen:
+    def blocks_of(self, user):
+        return json.loads(user.encode_screen(user.screen))["blocks"]
+
+    def test_first_send_carries_every_block(self, make_user):
+        user = make_user("Home")
+        user.sent_blocks = {}
+        blocks = self.blocks_of(user)
+        assert blocks[0]["name"] == "Root" and blocks[0]["value"]
+
+    def test_unchanged_block_is_sent_as_a_reuse_marker(self, make_user):
+        user = make_user("Home")
+        user.sent_blocks = {}
+        self.blocks_of(user)
+        assert self.blocks_of(user) == [{"type": "reuse", "name": "Root"}]
+
+    def test_changed_block_is_sent_again(self, make_user):
+        user = make_user("Home")
+        user.sent_blocks = {}
+        self.blocks_of(user)
+        user.screen_module.plain_edit.value = "edited"
+        blocks = self.blocks_of(user)
+        assert blocks[0]["name"] == "Root" and blocks[0]["type"] == "block"
+        assert self.blocks_of(user) == [{"type": "reuse", "name": "Root"}]
+
+    def test_blocks_are_remembered_per_screen(self, make_user):
+        # both screens have a block named "Root"
+        user = make_user("Home")
+        user.sent_blocks = {}
+        self.blocks_of(user)
+        user.set_screen("Other")
+        assert self.blocks_of(user)[0]["value"]
+        user.set_screen("Home")
+        assert self.blocks_of(user) == [{"type": "reuse", "name": "Root"}]
+
+    def test_rest_of_the_screen_matches_tojson(self, make_user):
+        user = make_user("Home")
+        user.sent_blocks = {}
+        assert json.loads(user.encode_screen(user.screen)) == json.loads(toJson(user.screen))
+
+
+class TestDeltaUpdates:
+    def changed_plain(self, user, value="edited"):
+        user.last_message = received("Root", "Save", "changed")
+        user.screen_module.plain_edit.value = value
+        return json.loads(toJson(user.prepare_result(None)))["updates"]
+
+    def test_update_carries_only_changed_properties(self, make_user):
+        user = make_user("Home")
+        user.delta_updates = True
+        assert self.changed_plain(user) == [
+            {"data": {"name": "Plain", "value": "edited"}, "path": ["Plain", "Root"], "delta": True}]
+
+    def test_client_without_delta_support_gets_whole_units(self, make_user):
+        user = make_user("Home")
+        [update] = self.changed_plain(user)
+        assert "delta" not in update and update["data"]["type"] == "string"
+
+    def test_resending_the_same_message_sends_whole_units(self, make_user):
+        # e.g. reflect() broadcasting the response to mirrored sessions
+        user = make_user("Home")
+        user.delta_updates = True
+        user.last_message = received("Root", "Save", "changed")
+        user.screen_module.plain_edit.value = "edited"
+        message = user.prepare_result(None)
+        user.prepare_result(message)
+        assert "delta" not in json.loads(toJson(message))["updates"][0]
+
+    def test_active_set_silently_reaches_the_next_update(self, make_user):
+        user = make_user("Home")
+        user.delta_updates = True
+        edit = user.screen_module.plain_edit
+        user.last_message = received("Root", "Plain", "changed", "typed")
+        user._set_persist_active(edit, False)
+        assert edit not in user.changed_units
+        [update] = self.changed_plain(user)
+        assert update["data"] == {"name": "Plain", "value": "edited", "active": False}
+
+    def test_unit_returned_without_changes_is_sent_whole(self, make_user):
+        user = make_user("Home")
+        user.delta_updates = True
+        message = user.prepare_result(user.screen_module.plain_edit)
+        assert "delta" not in json.loads(toJson(message))["updates"][0]
+
+
 # =============================================================================
 # calc_dbsharing / sync_dbupdates
 # =============================================================================
@@ -1048,9 +1139,39 @@ class TestSyncDbupdates:
         dbupdates[4242].append({"value": "new", "exclude": False})
         await user.sync_dbupdates()
 
-        assert send.sent == [{"value": "new", "exclude": False, "element": "Shared", "block": "Root"}]
+        assert [json.loads(m) for m in send.sent] == [
+            {"value": "new", "exclude": False, "element": "Shared", "block": "Root"}]
         assert dict(dbupdates) == {}
 
+    @pytest.mark.asyncio
+    async def test_each_payload_is_encoded_once_for_all_recipients(self, make_user, wire_send, monkeypatch):
+        import unisi.users as users_module
+        from unisi.dbunits import dbshare, dbupdates
+        dbshare.clear()
+        dbupdates.clear()
+        user = make_user("home")
+        user.calc_dbsharing()
+        wire_send(user)
+        others = [FakeReflectionUser() for _ in range(3)]
+        for other in others:
+            other.screen = user.screen
+        Unishare.sessions[user.session] = user
+        for i, other in enumerate(others):
+            Unishare.sessions[f"other-{i}"] = other
+        encoded = []
+        def counting_to_json(obj):
+            encoded.append(obj)
+            return json.dumps(obj)
+        monkeypatch.setattr(users_module, "toJson", counting_to_json)
+
+        dbupdates[4242].append({"value": "new", "exclude": True})
+        await user.sync_dbupdates()
+
+        assert len(encoded) == 1
+        assert all(other.sent == others[0].sent for other in others)
+        assert json.loads(others[0].sent[0])["element"] == "Shared"
+        assert user.send.sent == []
+
     @pytest.mark.asyncio
     async def test_exclude_true_skips_the_originating_user(self, make_user, wire_send):
         from unisi.dbunits import dbshare, dbupdates
@@ -1066,6 +1187,119 @@ class TestSyncDbupdates:
 
         assert send.sent == []
 
+    @pytest.mark.asyncio
+    async def test_sends_in_flight_are_bounded(self, monkeypatch):
+        import asyncio
+        import unisi.users as users_module
+        monkeypatch.setattr(users_module, "fan_out_limit", 2)
+        flight = [0, 0]  # now, most
+        class SlowUser:
+            async def send(self, message):
+                flight[0] += 1
+                flight[1] = max(flight)
+                await asyncio.sleep(0.001)
+                flight[0] -= 1
+
+        recipients = [SlowUser() for _ in range(7)]
+        await users_module.fan_out([({"value": 1}, recipients), ("text", recipients)])
+
+        assert flight == [0, 2]
+
+    @pytest.mark.asyncio
+    async def test_updates_go_through_the_bus_of_config_dbbus(self, make_user, wire_send, monkeypatch):
+        from unisi import dbbus
+        from unisi.dbunits import dbshare, dbupdates
+        class FakeBus:
+            published = []
+            def publish(self, updates):
+                self.published.append({id: list(id_updates) for id, id_updates in updates.items()})
+            def receive(self):
+                return {4242: [{"value": "remote"}]}
+        monkeypatch.setattr(dbbus, "bus", FakeBus())
+        dbshare.clear()
+        dbupdates.clear()
+        user = make_user("home")
+        user.calc_dbsharing()
+        send = wire_send(user)
+        Unishare.sessions[user.session] = user
+
+        dbupdates[4242].append({"value": "new", "exclude": True})
+        await user.sync_dbupdates()
+
+        assert FakeBus.published == [{4242: [{"value": "new", "exclude": True}]}]
+        assert [json.loads(m) for m in send.sent] == [
+            {"value": "remote", "element": "Shared", "block": "Root"}]
+
+    @pytest.mark.asyncio
+    async def test_lost_updates_read_every_table_again(self, monkeypatch):
+        import unisi.users as users_module
+        from unisi import dbbus
+        refreshed = []
+        async def refresh_dbtables():
+            refreshed.append(True)
+        async def deliver_dbupdates(updates):
+            raise AssertionError("nothing to deliver")
+        class GapBus:
+            def publish(self, updates):
+                pass
+            def receive(self):
+                return None
+        monkeypatch.setattr(dbbus, "bus", GapBus())
+        monkeypatch.setattr(users_module, "refresh_dbtables", refresh_dbtables)
+        monkeypatch.setattr(users_module, "deliver_dbupdates", deliver_dbupdates)
+
+        await users_module.receive_dbupdates()
+
+        assert refreshed == [True]
+
+
+class TestSessionsIndex:
+    def test_registered_session_is_indexed_by_its_screen(self, make_user):
+        user = make_user("home")
+        Unishare.sessions[user.session] = user
+        assert user in Unishare.sessions.showing["Home"]
+
+    def test_screen_change_moves_the_session(self, make_user):
+        user = make_user("home")
+        Unishare.sessions[user.session] = user
+        user.set_screen("Other")
+        assert user not in Unishare.sessions.showing.get("Home", ())
+        assert user in Unishare.sessions.showing["Other"]
+
+    def test_unregistered_user_is_not_indexed(self, make_user):
+        user = make_user("home")
+        user.set_screen("Other")
+        assert user not in Unishare.sessions.showing.get("Other", ())
+
+    @pytest.mark.asyncio
+    async def test_deleted_session_leaves_the_index(self, make_user):
+        user = make_user("home")
+        Unishare.sessions[user.session] = user
+        await user.delete()
+        assert user not in Unishare.sessions.showing.get("Home", ())
+
+    def test_hibernated_session_leaves_its_screen_until_woken(self, make_user):
+        user = make_user("home")
+        Unishare.sessions[user.session] = user
+        user.hibernate()
+        assert user not in Unishare.sessions.showing.get("Home", ())
+        user.wake()
+        assert user in Unishare.sessions.showing["Home"]
+
+    def test_deliveries_reach_only_the_sessions_of_the_screen(self, make_user):
+        from unisi.dbunits import dbshare
+        from unisi.users import dbupdate_deliveries
+        dbshare.clear()
+        home, other = make_user("home"), make_user("home")
+        home.calc_dbsharing()
+        other.set_screen("Other")
+        for user in (home, other):
+            Unishare.sessions[user.session] = user
+
+        deliveries = dbupdate_deliveries({4242: [{"value": "new"}]})
+
+        assert deliveries == [({"value": "new", "element": "Shared", "block": "Root"}, [home])]
+
 
 # =============================================================================
 # User.init_user()
@@ -0,0 +1,226 @@
+"""
+Unit tests for unisi/workers.py -- config.workers' bus between the worker
+processes, the routing of connections to the worker of their session and the
+relay of dbupdates. The processes themselves are not forked here: the bus and
+the worker sockets run in the test's own event loop.
+"""
+import asyncio
+import json
+import socket
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer, make_mocked_request
+
+from unisi import workers
+from unisi.common import Unishare
+from unisi.dbunits import dbshare, dbupdates
+
+
+@pytest.fixture
+def bus_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(workers, "directory", str(tmp_path))
+    monkeypatch.setattr(workers, "owners", {})
+    monkeypatch.setattr(workers, "bus", None)
+    yield tmp_path
+
+
+async def start_bus():
+    hub = socket.socket(socket.AF_UNIX)
+    hub.bind(workers.socket_path("bus"))
+    hub.listen()
+    task = asyncio.create_task(workers.run_bus(hub))
+    await asyncio.sleep(0)
+    return task
+
+
+async def connect(received):
+    reader, writer = await asyncio.open_unix_connection(workers.socket_path("bus"))
+    bus = workers.Bus(reader, writer)
+    async def record(message):
+        received.append(message)
+    bus.handlers = dict(session=record, dbupdates=record)
+    return bus, asyncio.create_task(bus.listen())
+
+
+class TestBus:
+    @pytest.mark.asyncio
+    async def test_published_line_reaches_the_other_workers_only(self, bus_dir, monkeypatch):
+        hub = await start_bus()
+        first, second, third = [], [], []
+        connections = [await connect(received) for received in (first, second, third)]
+        await asyncio.sleep(0.05)
+        monkeypatch.setattr(workers, "number", 0)
+        connections[0][0].publish("session", session="s1", live=True)
+        await asyncio.sleep(0.05)
+        assert first == []
+        assert second == third == [{"session": "s1", "live": True, "kind": "session", "worker": 0}]
+        for _, listener in connections:
+            listener.cancel()
+        hub.cancel()
+
+    @pytest.mark.asyncio
+    async def test_listener_goes_on_after_a_failing_message(self, bus_dir, monkeypatch):
+        hub = await start_bus()
+        received = []
+        sender, sender_listener = await connect([])
+        bus, listener = await connect(received)
+        async def failing(message):
+            raise RuntimeError("handler")
+        bus.handlers["dbupdates"] = failing
+        await asyncio.sleep(0.05)
+        sender.publish("dbupdates", updates={"orders": [{"update": "delete", "index": 1}]})
+        sender.writer.write(b"not json\n")
+        sender.publish("session", session="s1", live=True)
+        await asyncio.sleep(0.05)
+        assert [message["session"] for message in received] == ["s1"]
+        assert not listener.done()
+        for task in (sender_listener, listener, hub):
+            task.cancel()
+
+    @pytest.mark.asyncio
+    async def test_line_over_the_limit_is_skipped(self, bus_dir, monkeypatch):
+        monkeypatch.setattr(workers, "LINE_LIMIT", 1024)
+        hub = await start_bus()
+        received = []
+        sender, sender_listener = await connect([])
+        _, listener = await connect(received)
+        await asyncio.sleep(0.05)
+        sender.writer.write(b'{"kind": "session", "session": "' + b"x" * 5000 + b'"}\n')
+        sender.publish("session", session="s1", live=True)
+        await asyncio.sleep(0.05)
+        assert [message["session"] for message in received] == ["s1"]
+        for task in (sender_listener, listener, hub):
+            task.cancel()
+
+    def test_dbupdates_over_the_limit_are_split(self, bus_dir, monkeypatch):
+        monkeypatch.setattr(workers, "LINE_LIMIT", 400)
+        lines = []
+        class Writer:
+            def write(self, line):
+                lines.append(line)
+        bus = workers.Bus(None, Writer())
+        updates = {"orders": [{"update": "update", "index": i, "data": ["x" * 20]} for i in range(20)]}
+        bus.publish("dbupdates", updates=updates)
+        assert len(lines) > 1 and all(len(line) <= 400 for line in lines)
+        assert [update for line in lines for update in json.loads(line)["updates"]["orders"]] == updates["orders"]
+
+    def test_single_update_over_the_limit_is_dropped(self, bus_dir, monkeypatch):
+        monkeypatch.setattr(workers, "LINE_LIMIT", 100)
+        lines = []
+        class Writer:
+            def write(self, line):
+                lines.append(line)
+        workers.Bus(None, Writer()).publish("dbupdates", updates={"orders": [{"data": "x" * 200}]})
+        assert lines == []
+
+    @pytest.mark.asyncio
+    async def test_session_owners_follow_the_announcements(self, bus_dir):
+        await workers.on_session({"session": "s1", "worker": 2, "live": True})
+        assert workers.owners == {"s1": 2}
+        await workers.on_session({"session": "s1", "worker": 3, "live": False})
+        assert workers.owners == {"s1": 2} #it lives in worker 2 now
+        await workers.on_session({"session": "s1", "worker": 2, "live": False})
+        assert workers.owners == {}
+
+
+class TestOwner:
+    def request(self, query="", **headers):
+        return make_mocked_request("GET", f"/ws{query}", headers=headers)
+
+    def test_single_process_server_serves_everything(self, bus_dir):
+        workers.owners["s1"] = 1
+        assert workers.owner(self.request("?session=s1")) is None
+
+    def test_session_of_another_worker_is_relayed_to_it(self, bus_dir, monkeypatch):
+        monkeypatch.setattr(workers, "bus", object())
+        workers.owners["s1"] = 1
+        assert workers.owner(self.request("?session=s1")) == 1
+        assert workers.owner(self.request("?session=s2")) is None
+        assert workers.owner(self.request()) is None
+
+    def test_relayed_connection_is_served_here(self, bus_dir, monkeypatch):
+        monkeypatch.setattr(workers, "bus", object())
+        workers.owners["s1"] = 1
+        assert workers.owner(self.request("?session=s1", **{workers.RELAYED: "1"})) is None
+
+    def test_mirror_connections_go_to_the_first_worker(self, bus_dir, monkeypatch):
+        import config
+        monkeypatch.setattr(workers, "bus", object())
+        config.mirror = True
+        monkeypatch.setattr(workers, "number", 2)
+        assert workers.owner(self.request()) == 0
+        monkeypatch.setattr(workers, "number", 0)
+        assert workers.owner(self.request()) is None
+
+
+class TestRelay:
+    @pytest.mark.asyncio
+    async def test_messages_pass_both_ways(self, bus_dir):
+        seen = []
+        async def echo(request):
+            seen.append((request.query.get("session"), request.headers.get(workers.RELAYED)))
+            ws = web.WebSocketResponse()
+            await ws.prepare(request)
+            async for msg in ws:
+                await ws.send_str(msg.data.upper())
+            return ws
+        worker_app = web.Application()
+        worker_app.add_routes([web.get("/ws", echo)])
+        runner = web.AppRunner(worker_app)
+        await runner.setup()
+        await web.UnixSite(runner, workers.socket_path(1)).start()
+
+        async def relay(request):
+            return await workers.relay(request, 1)
+        front = web.Application()
+        front.add_routes([web.get("/ws", relay)])
+        async with TestServer(front) as server, aiohttp.ClientSession() as client:
+            async with client.ws_connect(server.make_url("/ws?session=s1")) as ws:
+                await ws.send_str("hello")
+                assert (await ws.receive()).data == "HELLO"
+        await runner.cleanup()
+        assert seen == [("s1", "1")]
+
+
+class TestDbupdates:
+    def test_pending_updates_are_published_as_lists(self, bus_dir, monkeypatch):
+        published = []
+        class FakeBus:
+            def publish(self, kind, **data):
+                published.append((kind, data))
+        monkeypatch.setattr(workers, "bus", FakeBus())
+        dbupdates["orders"].append({"update": "delete", "index": 1})
+        try:
+            workers.publish_dbupdates()
+        finally:
+            dbupdates.clear()
+        assert published == [("dbupdates", {"updates": {"orders": [{"update": "delete", "index": 1}]}})]
+        assert json.dumps(published[0][1])
+
+    @pytest.mark.asyncio
+    async def test_updates_of_another_worker_reach_the_sessions_showing_the_data(self, make_user, wire_send):
+        user, elsewhere = make_user("Home"), make_user("Other")
+        sent, elsewhere_sent = wire_send(user).sent, wire_send(elsewhere).sent
+        Unishare.sessions[user.session] = user
+        Unishare.sessions[elsewhere.session] = elsewhere
+        dbshare["orders"]["Home"].append({"element": "Plain", "block": "Root"})
+        try:
+            await workers.on_dbupdates({"updates": {"orders": [{"update": "delete", "index": 1, "exclude": True}]}})
+        finally:
+            dbshare.pop("orders")
+        assert [json.loads(text) for text in sent] == [
+            {"update": "delete", "index": 1, "exclude": True, "element": "Plain", "block": "Root"}]
+        assert elsewhere_sent == []
+
+    @pytest.mark.asyncio
+    async def test_received_updates_refresh_the_table_of_this_worker(self, monkeypatch):
+        refreshed = []
+        class FakeTable:
+            def refresh(self, updates=None):
+                refreshed.append((self, updates))
+        table = FakeTable()
+        monkeypatch.setattr(Unishare, "db", type("FakeDb", (), {"tables": {"orders": table}})(), raising=False)
+        await workers.on_dbupdates({"updates": {"orders": [{"update": "delete", "index": 1}], "unknown": []}})
+        assert refreshed == [(table, [{"update": "delete", "index": 1}])]
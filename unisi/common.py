@@ -1,5 +1,6 @@
 # Copyright © 2024 UNISI Tech. All rights reserved.
-import jsonpickle, inspect, asyncio
+import inspect, asyncio
+from .serialize import to_json
 
 UpdateScreen = True
 Redesign = 2
@@ -63,7 +64,8 @@ class ReceivedMessage(ArgObject):
         return self.block == 'voice' and self.element is None
 
 def toJson(obj):
-    return jsonpickle.encode(obj,unpicklable = False)
+    """serialize a screen, Message or Unit for the wire, see serialize.py"""
+    return to_json(obj)
 
 def set_defaults(self, param_defaults : dict):
     for param, value in param_defaults.items():
@@ -110,7 +112,61 @@ def get_default_args(func):
             defaults[name] = param.default
     return defaults
 
-Unishare = ArgObject(context_user = lambda: None, sessions = {})
+class Sessions(dict):
+    """session id -> user, Unishare.sessions. `showing` indexes the sessions
+    by the name of their current screen, so the dbupdates of a screen reach
+    its sessions without a scan of all of them (see dbupdate_deliveries);
+    a user calls shown() when its current screen changes."""
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.showing = {} #screen name -> set of users
+        self._names = {} #user -> screen name it is indexed under
+        self.update(*args, **kwargs)
+
+    def _add(self, user):
+        name = user.screen.name
+        self._names[user] = name
+        self.showing.setdefault(name, set()).add(user)
+
+    def _discard(self, user):
+        name = self._names.pop(user, None)
+        if name is not None:
+            users = self.showing[name]
+            users.discard(user)
+            if not users:
+                del self.showing[name]
+
+    def shown(self, user):
+        """reindex user after its current screen changed"""
+        if user in self._names:
+            self._discard(user)
+            self._add(user)
+
+    def __setitem__(self, session, user):
+        if (old := self.get(session)) is not None:
+            self._discard(old)
+        super().__setitem__(session, user)
+        self._add(user)
+
+    def __delitem__(self, session):
+        self._discard(self[session])
+        super().__delitem__(session)
+
+    def pop(self, session, *default):
+        if session in self:
+            self._discard(self[session])
+        return super().pop(session, *default)
+
+    def update(self, *args, **kwargs):
+        for session, user in dict(*args, **kwargs).items():
+            self[session] = user
+
+    def clear(self):
+        super().clear()
+        self.showing.clear()
+        self._names.clear()
+
+Unishare = ArgObject(context_user = lambda: None, sessions = Sessions())
 
 class Message:
     def __init__(self, *units, user = None, type = 'update'):        
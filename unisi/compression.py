@@ -0,0 +1,61 @@
+# Copyright © 2024 UNISI Tech. All rights reserved.
+"""
+Size-aware permessage-deflate for the /ws route, see config.compress.
+
+aiohttp negotiates permessage-deflate with the browser and then compresses
+every frame, a 60 byte delta as well as a 500 KB screen. With an int
+config.compress only text of at least that many bytes is compressed; smaller
+messages go out as plain frames, which the extension allows (RSV1 unset).
+
+aiohttp has no public switch for the per-frame choice, so the negotiated
+writer is told not to compress by default and large messages ask for it with
+send_str(text, compress = wbits). The compressed payload sizes are read off
+the writer to count the bytes saved. Both rely on private attributes of
+aiohttp's WebSocketWriter; with an aiohttp which does not have them aiohttp
+compresses every frame itself and nothing is counted.
+"""
+from collections import Counter
+
+# summed over all connections: messages, compressed, raw_bytes, wire_bytes
+totals = Counter()
+
+def bytes_saved() -> int:
+    """bytes not sent thanks to compression, over all connections"""
+    return totals['raw_bytes'] - totals['wire_bytes']
+
+class Compression:
+    def __init__(self, ws, threshold: int):
+        """ws is a prepared WebSocketResponse, threshold 0 compresses every message"""
+        self.ws = ws
+        self.threshold = threshold
+        self.stats = Counter()
+        self.wbits = ws.compress or 0 #0 if the client did not accept permessage-deflate
+        writer = getattr(ws, '_writer', None)
+        self.counting = bool(self.wbits) and hasattr(writer, 'compress') and \
+            callable(getattr(writer, '_write_websocket_frame', None))
+        if self.counting:
+            if threshold:
+                writer.compress = 0
+            write_frame = writer._write_websocket_frame
+            def counting_write_frame(message, opcode, rsv):
+                if rsv & 0x40: #RSV1: a compressed frame
+                    self.count('wire_bytes', len(message))
+                write_frame(message, opcode, rsv)
+            writer._write_websocket_frame = counting_write_frame
+
+    def count(self, name, n = 1):
+        self.stats[name] += n
+        totals[name] += n
+
+    @property
+    def saved(self) -> int:
+        return self.stats['raw_bytes'] - self.stats['wire_bytes']
+
+    async def send_str(self, text: str):
+        self.count('messages')
+        if self.counting and len(text) >= self.threshold:
+            self.count('compressed')
+            self.count('raw_bytes', len(text.encode()))
+            if self.threshold:
+                return await self.ws.send_str(text, compress = self.wbits)
+        await self.ws.send_str(text)
@@ -87,7 +87,7 @@ class Block(Unit):
     
     @scroll_list.setter   
     def scroll_list(self, lst):
-        self.value = ChangedProxy([self.value[0] if self.value else [], lst], self)
+        self.value = [self.value[0] if self.value else [], lst]
         self.scroll = True
         if hasattr(self,'scaler'):
             sval = self.scaler.value
@@ -164,8 +164,8 @@ class ParamBlock(Block):
                     
             self._name2elem[param] = el
             if cnt % self._row == 0:
-                block = []
-                self.value.append(block)
+                self.value.append([])
+                block = self.value[-1] #the stored row, an observable copy with config.tracking = 'observable'
             cnt += 1
             block.append(el)
 
@@ -48,17 +48,21 @@ calc_linked_rows / delete_links accept arbitrary iterables of IDs; callers
 with very large sets (> ~1000 on older SQLite) should batch externally.
 """
 
+import asyncio
 import difflib
 import json
 import os
 import shutil
 import sqlite3
+import threading
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import date, datetime
 from decimal import Decimal
 from typing import Any
 
-from .dbunits import Dblist
+from .dbunits import Dblist, dbupdates
 
 
 # ── type system ───────────────────────────────────────────────────────────────
@@ -138,6 +142,33 @@ def _adapt_value(value: Any) -> Any:
     return value
 
 
+def _to_json(value):
+    return json.loads(value) if isinstance(value, (str, bytes)) else value
+
+def _to_bool(value):
+    return value if isinstance(value, bool) else bool(int(value))
+
+def _to_decimal(value):
+    return value if isinstance(value, Decimal) else Decimal(value)
+
+def _to_uuid(value):
+    return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+
+def _to_date(value):
+    if isinstance(value, datetime): return value.date()
+    if isinstance(value, date):     return value
+    return date.fromisoformat(value)
+
+def _to_timestamp(value):
+    return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+
+# declared type -> converter of a raw value; other types are returned as is
+_VALUE_CONVERTERS = {
+    "JSON": _to_json, "BOOLEAN": _to_bool, "DECIMAL": _to_decimal,
+    "UUID": _to_uuid, "DATE": _to_date, "TIMESTAMP": _to_timestamp,
+}
+
+
 def _convert_value(value: Any, declared_type: str) -> Any:
     """
     Convert a raw sqlite3 value back to the appropriate Python type.
@@ -151,26 +182,13 @@ def _convert_value(value: Any, declared_type: str) -> Any:
     """
     if value is None:
         return None
-    t = declared_type.upper()
+    convert = _VALUE_CONVERTERS.get(declared_type.upper())
+    if convert is None:
+        return value
     try:
-        if t == "JSON":
-            return json.loads(value) if isinstance(value, (str, bytes)) else value
-        if t == "BOOLEAN":
-            return value if isinstance(value, bool) else bool(int(value))
-        if t == "DECIMAL":
-            return value if isinstance(value, Decimal) else Decimal(value)
-        if t == "UUID":
-            return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
-        if t == "DATE":
-            if isinstance(value, datetime): return value.date()
-            if isinstance(value, date):     return value
-            return date.fromisoformat(value)
-        if t == "TIMESTAMP":
-            if isinstance(value, datetime): return value
-            return datetime.fromisoformat(value)
+        return convert(value)
     except (ValueError, TypeError, AttributeError):
         return value
-    return value
 
 
 def _equal_field_dicts(d1: dict, d2: dict) -> bool:
@@ -310,7 +328,14 @@ class Database:
     Features: WAL journal mode, native SQL-injection protection via
     parameterised queries, ON DELETE CASCADE for junction tables, and
     Smart Schema Evolution with interactive migration prompts.
+
+    The awaitable aquery/awrite keep queries off the event loop: reads run
+    in a pool of `readers` threads with a connection each (WAL lets them
+    read while a write is in progress), writes in one writer thread on the
+    main connection, which execute() serializes with the event loop by
+    self.lock.
     """
+    readers = 4
 
     def __init__(self, dbpath: str, message_logger=print) -> None:
         self.tables: dict[str, "Dbtable"] = {}
@@ -318,10 +343,22 @@ class Database:
         self.message_logger = message_logger
 
         os.makedirs(os.path.dirname(os.path.abspath(dbpath)), exist_ok=True)
+        self.connect()
 
+        import inspect
+        sig = inspect.signature(self.get_table)
+        self.table_params = {
+            k: v.default
+            for k, v in sig.parameters.items()
+            if v.default is not inspect.Parameter.empty
+        }
+
+    def connect(self) -> None:
+        """Open the connection; also called by a forked server worker, which
+        must not share the connection of its parent process."""
         # PARSE_DECLTYPES activates the registered converters above.
         self._conn = sqlite3.connect(
-            dbpath,
+            self.dbpath,
             detect_types=sqlite3.PARSE_DECLTYPES,
             check_same_thread=False,
         )
@@ -329,14 +366,13 @@ class Database:
         self._conn.execute("PRAGMA journal_mode=WAL")
         self._conn.execute("PRAGMA foreign_keys=ON")
         self._conn.commit()
-
-        import inspect
-        sig = inspect.signature(self.get_table)
-        self.table_params = {
-            k: v.default
-            for k, v in sig.parameters.items()
-            if v.default is not inspect.Parameter.empty
-        }
+        # the threads of aquery/awrite are created on first use, so a forked
+        # worker starts its own
+        self.lock = threading.RLock()
+        self._depth = 0   # of nested transaction()
+        self._local = threading.local()
+        self._read_connections: list[sqlite3.Connection] = []
+        self._readers = self._writer = None
 
     # ── low-level execution ──────────────────────────────────────────────── #
 
@@ -344,9 +380,11 @@ class Database:
         self, query: str, params=(), ignore_exception: bool = False
     ) -> sqlite3.Cursor | None:
         try:
-            cur = self._conn.cursor()
-            cur.execute(query, params)
-            self._conn.commit()
+            with self.lock:
+                cur = self._conn.cursor()
+                cur.execute(query, params)
+                if not self._depth:
+                    self._conn.commit()
             return cur
         except sqlite3.Error as e:
             if not ignore_exception:
@@ -357,21 +395,137 @@ class Database:
         self, query: str, params_seq, ignore_exception: bool = False
     ) -> sqlite3.Cursor | None:
         try:
-            cur = self._conn.cursor()
-            cur.executemany(query, params_seq)
-            self._conn.commit()
+            with self.lock:
+                cur = self._conn.cursor()
+                cur.executemany(query, params_seq)
+                if not self._depth:
+                    self._conn.commit()
             return cur
         except sqlite3.Error as e:
             if not ignore_exception:
                 self.message_logger(f"SQL Error (executemany): {e}\nQuery: {query}")
             return None
 
+    @contextmanager
+    def transaction(self):
+        """
+        Unit of work: the statements executed inside are committed once on
+        exit, or rolled back when it exits by an exception::
+
+            with db.transaction():
+                for id in ids:
+                    table.delete_row(id)
+
+        A nested transaction is a savepoint of the outer one, the outer one
+        commits.  Other threads wait for the end of the transaction to write.
+        A rollback also reverts the row counts of the tables, drops their
+        cached chunks and the dbupdates made inside, see _restore.
+        """
+        with self.lock:
+            snapshot = self._snapshot()
+            savepoint = f"unisi{self._depth}" if self._depth else None
+            if savepoint:
+                self._conn.execute(f"SAVEPOINT {savepoint}")
+            elif not self._conn.in_transaction:
+                self._conn.execute("BEGIN")
+            self._depth += 1
+            try:
+                yield self
+            except BaseException:
+                if savepoint:
+                    self._conn.execute(f"ROLLBACK TO {savepoint}")
+                    self._conn.execute(f"RELEASE {savepoint}")
+                else:
+                    self._conn.rollback()
+                self._restore(snapshot)
+                raise
+            else:
+                if savepoint:
+                    self._conn.execute(f"RELEASE {savepoint}")
+                else:
+                    self._conn.commit()
+            finally:
+                self._depth -= 1
+
+    def _snapshot(self) -> dict:
+        """table id -> (length, _version, last dbupdate) of the tables"""
+        return {
+            id: (table.length, table._version,
+                 updates[-1] if (updates := dbupdates.get(id)) else None)
+            for id, table in self.tables.items()
+        }
+
+    def _restore(self, snapshot: dict) -> None:
+        """Revert the tables changed since _snapshot: the row count, the
+        version, the chunks of its list and the dbupdates made since then."""
+        for id, (length, version, last_update) in snapshot.items():
+            table = self.tables.get(id)
+            updates = dbupdates.get(id)
+            made = bool(updates) and updates[-1] is not last_update
+            if table is None or (table._version == version and not made):
+                continue
+            # the last update of the snapshot is gone when the deque
+            # overflowed: then every update in it was made since
+            while updates and updates[-1] is not last_update:
+                updates.pop()
+            table.length, table._version = length, version
+            table._forget_keys()
+            table.list.delta_list.clear()
+            table.list._synced_version = version
+
+    # ── off the event loop ───────────────────────────────────────────────── #
+
+    def _read_connection(self) -> sqlite3.Connection:
+        """The connection of the current reader thread."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.dbpath,
+                detect_types=sqlite3.PARSE_DECLTYPES,
+                check_same_thread=False,
+            )
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+            self._read_connections.append(conn)
+        return conn
+
+    def _read(self, query: str, params, func) -> list:
+        try:
+            rows = self._read_connection().execute(query, params).fetchall()
+        except sqlite3.Error as e:
+            self.message_logger(f"SQL Error: {e}\nQuery: {query}")
+            return []
+        return [func(r) if func else list(r) for r in rows]
+
+    async def aquery(self, query: str, params=(), func=None) -> list:
+        """qlist in a reader thread; an in-memory database has only the main
+        connection, it is read in the writer thread."""
+        if self.dbpath == ":memory:":
+            return await self.awrite(self.qlist, query, params, func) or []
+        if self._readers is None:
+            self._readers = ThreadPoolExecutor(
+                self.readers, thread_name_prefix="unisi-db-read")
+        return await asyncio.get_running_loop().run_in_executor(
+            self._readers, self._read, query, params, func)
+
+    async def awrite(self, fn, *args):
+        """fn(*args) in the writer thread, fn writes by execute()."""
+        if self._writer is None:
+            self._writer = ThreadPoolExecutor(1, thread_name_prefix="unisi-db-write")
+        return await asyncio.get_running_loop().run_in_executor(
+            self._writer, fn, *args)
+
     @staticmethod
     def delete(dir_path: str) -> None:
         if os.path.exists(dir_path):
             shutil.rmtree(dir_path) if os.path.isdir(dir_path) else os.remove(dir_path)
 
     def close(self):
+        for pool in (self._readers, self._writer):
+            if pool:
+                pool.shutdown()
+        for conn in self._read_connections:
+            conn.close()
         self._conn.close()
 
     # ── schema ───────────────────────────────────────────────────────────── #
@@ -398,6 +552,10 @@ class Database:
         }
 
     def delete_table(self, table_name: str) -> bool:
+        table = self.tables.get(table_name)
+        if table is not None and table.fts:
+            self.execute(f"DROP TABLE IF EXISTS [{table.fts}]")
+            table.fts = None
         return self.execute(f"DROP TABLE IF EXISTS [{table_name}]") is not None
 
     # ── table factory ────────────────────────────────────────────────────── #
@@ -499,6 +657,7 @@ class Database:
         headers: list = None,
         rows: list = None,
         fields: dict = None,
+        fts: bool = False,
     ) -> "Dbtable | None":
         if not id:
             return None
@@ -540,11 +699,15 @@ class Database:
         if existing_fields is not None:
             if fields is not None and not _equal_field_dicts(existing_fields, fields):
                 # Schema mismatch — invoke Smart Schema Evolution.
-                return self._migrate_table(id, existing_fields, fields, limit, rows)
+                table = self._migrate_table(id, existing_fields, fields, limit, rows)
             else:
-                return self.tables.get(id) or Dbtable(id, self, limit, existing_fields)
-
-        return self.create_table(id, fields, limit, rows)
+                table = self.tables.get(id) or Dbtable(id, self, limit, existing_fields)
+        else:
+            table = self.create_table(id, fields, limit, rows)
+        if fts and table is not None:
+            # also checks an index left behind by a migration
+            table.setup_fts()
+        return table
 
     def get_table_params(self, params: dict) -> dict:
         return {k: v for k, v in params.items() if k in self.table_params}
@@ -554,7 +717,7 @@ class Database:
         gui_table.rows = table.list
 
     def create_table(
-        self, id: str, fields: dict, limit: int = 100, rows=None
+        self, id: str, fields: dict, limit: int = 100, rows=None, fts: bool = False
     ) -> "Dbtable":
         # get_table() and setup_junction() both normalise their `fields`
         # argument before use; create_table() is equally public (and the
@@ -572,7 +735,7 @@ class Database:
             f"CREATE TABLE IF NOT EXISTS [{id}] "
             f"({cols}, ID INTEGER PRIMARY KEY AUTOINCREMENT)"
         )
-        table = Dbtable(id, self, limit, fields)
+        table = Dbtable(id, self, limit, fields, fts=fts)
         if rows:
             table.list.extend(rows)
         return table
@@ -631,6 +794,7 @@ class Dbtable:
         db: Database,
         limit: int = 100,
         table_fields: dict = None,
+        fts: bool = False,
     ) -> None:
         self.db = db
         db.tables[id] = self
@@ -639,13 +803,18 @@ class Dbtable:
         self.table_fields: dict = table_fields or db.get_table_fields(id) or {}
         self.node_columns: list[str] = list(self.table_fields.keys())
         self._all_columns: list[str] = self.node_columns + ["ID"]
+        self._compile_decoder()
         # Bumped by every method that changes row count directly (append_row,
         # append_rows, delete_row, delete_rows, clear). self.list (a Dblist)
         # compares this against its own last-synced value to detect when its
         # chunk cache was left behind by a mutation that didn't go through
         # the Dblist API -- see Dblist.get_delta_chunk.
         self._version = 0
+        self._forget_keys()
         self.init_list()
+        self.fts: str | None = None   # the full-text index, see setup_fts
+        if fts:
+            self.setup_fts()
 
     def _bump_version(self) -> None:
         self._version += 1
@@ -660,13 +829,29 @@ class Dbtable:
         """Alias-qualified column list for JOINs to avoid ambiguous 'ID'."""
         return ", ".join(f"{alias}.[{c}]" for c in self._all_columns)
 
+    def _compile_decoder(self) -> None:
+        """Converters of the columns of _all_columns for _row_to_list, None
+        for the types returned as is; rebuilt when the columns change."""
+        self._converters = tuple(
+            _VALUE_CONVERTERS.get(self.table_fields.get(key, "").upper())
+            for key in self._all_columns
+        )
+        self._width = len(self._converters)
+        self._plain = not any(self._converters)
+
     def _row_to_list(self, row) -> list:
-        """Convert a sqlite3.Row to a typed Python list, applying converters."""
+        """Convert a row with the columns of _all_columns first (a
+        sqlite3.Row, tuple or list) to a typed Python list."""
+        if self._plain:
+            return list(row[:self._width])
         result = []
-        for i, key in enumerate(self._all_columns):
-            val = row[i] if not isinstance(row, sqlite3.Row) else row[key]
-            dtype = self.table_fields.get(key, "")
-            result.append(_convert_value(val, dtype))
+        for convert, value in zip(self._converters, row):
+            if convert is not None and value is not None:
+                try:
+                    value = convert(value)
+                except (ValueError, TypeError, AttributeError):
+                    pass
+            result.append(value)
         return result
 
     # ── list initialisation ──────────────────────────────────────────────── #
@@ -681,16 +866,81 @@ class Dbtable:
             self.length = length
         self.list = Dblist(self, rows)
 
+    def refresh(self, updates=None) -> None:
+        """Reread the row count after the table was changed by another
+        process. self.list drops the chunks touched by *updates* (its update
+        dicts made by the other process), all of them on its next read
+        without them."""
+        cnt = self.db.qlist(f"SELECT COUNT(*) FROM [{self.id}]")
+        self.length = cnt[0][0] if cnt else 0
+        self._forget_keys()
+        if updates is None:
+            self._bump_version()
+        else:
+            self.list.invalidate(updates)
+
     # ── read ─────────────────────────────────────────────────────────────── #
 
+    # Pages are read by keyset, ``WHERE ID > ?``, instead of an OFFSET
+    # SQLite has to step through: self._keys maps the offsets where read
+    # pages ended to the ID of the row before them (the next chunk of a
+    # scroll starts there), self._samples holds the ID before every
+    # `sample_every`-th offset for jumps, the rest of the way is a short
+    # OFFSET. IDs only grow, so appends keep both; deletions forget them.
+    sample_every = 1000
+
+    def _forget_keys(self) -> None:
+        self._keys: dict[int, int] = {}
+        self._samples: list[int] | None = None
+        self._keys_version = getattr(self, "_keys_version", 0) + 1
+
+    def _sample_query(self) -> tuple[str, tuple]:
+        return (
+            f"SELECT ID FROM (SELECT ID, ROW_NUMBER() OVER (ORDER BY ID) AS n "
+            f"FROM [{self.id}]) WHERE n % ? = 0",
+            (self.sample_every,),
+        )
+
+    def _needs_samples(self, skip: int) -> bool:
+        return self._samples is None and skip >= self.sample_every and skip not in self._keys
+
+    def _read_query(self, skip: int, limit: int) -> tuple[str, tuple]:
+        select = f"SELECT {self._select_cols()} FROM [{self.id}] "
+        after = self._keys.get(skip) if skip else None
+        if after is not None:
+            skip = 0
+        elif self._samples and skip >= self.sample_every:
+            i = min(skip // self.sample_every, len(self._samples))
+            after, skip = self._samples[i - 1], skip - i * self.sample_every
+        if after is None:
+            return select + "ORDER BY ID LIMIT ? OFFSET ?", (limit, skip)
+        return select + "WHERE ID > ? ORDER BY ID LIMIT ? OFFSET ?", (after, limit, skip)
+
+    def _keep_key(self, skip: int, rows: list) -> None:
+        if rows:
+            self._keys[skip + len(rows)] = rows[-1][-1]
+
     def read_rows(self, skip: int = 0, limit: int = 0) -> list[list]:
         lim = limit if limit else self.limit
-        cur = self.db.execute(
-            f"SELECT {self._select_cols()} FROM [{self.id}] "
-            f"ORDER BY ID LIMIT ? OFFSET ?",
-            (lim, skip),
-        )
-        return [self._row_to_list(r) for r in cur.fetchall()] if cur else []
+        if self._needs_samples(skip):
+            self._samples = [row[0] for row in self.db.qlist(*self._sample_query()) or []]
+        cur = self.db.execute(*self._read_query(skip, lim))
+        rows = [self._row_to_list(r) for r in cur.fetchall()] if cur else []
+        self._keep_key(skip, rows)
+        return rows
+
+    async def aread_rows(self, skip: int = 0, limit: int = 0) -> list[list]:
+        """read_rows off the event loop, see Database.aquery."""
+        lim = limit if limit else self.limit
+        version = self._keys_version
+        if self._needs_samples(skip):
+            samples = await self.db.aquery(*self._sample_query())
+            if version == self._keys_version:
+                self._samples = [row[0] for row in samples]
+        rows = await self.db.aquery(*self._read_query(skip, lim), self._row_to_list)
+        if version == self._keys_version:
+            self._keep_key(skip, rows)
+        return rows
 
     # ── search ───────────────────────────────────────────────────────────── #
 
@@ -713,6 +963,10 @@ class Dbtable:
         Non-searchable types (BLOB, JSON) are skipped to avoid false
         positives and SQLite LIKE errors on binary data.
 
+        With a full-text index (setup_fts) a search of 3 characters and more
+        is an ``[ID] IN (SELECT rowid ... MATCH ?)`` lookup instead; shorter
+        ones, which trigrams cannot match, fall back to LIKE.
+
         Args:
             search:      The search string supplied by the client.
             table_alias: Optional table alias prefix (e.g. ``"a."``).
@@ -724,8 +978,14 @@ class Dbtable:
         if not search:
             return "", []
 
-        pattern = f"%{search}%"
         prefix = f"{table_alias}." if table_alias else ""
+        if phrase := self._fts_phrase(search):
+            return (
+                f"{prefix}[ID] IN (SELECT rowid FROM [{self.fts}] "
+                f"WHERE [{self.fts}] MATCH ?)",
+                [phrase],
+            )
+        pattern = f"%{search}%"
 
         conditions = []
         params: list = []
@@ -740,6 +1000,79 @@ class Dbtable:
 
         return "(" + " OR ".join(conditions) + ")", params
 
+    def _fts_phrase(self, search: str) -> str | None:
+        """The MATCH argument of *search* when the full-text index can
+        serve it: a quoted phrase, which trigram tokens match as a
+        substring."""
+        if self.fts and len(search) >= 3:
+            return '"' + search.replace('"', '""') + '"'
+        return None
+
+    def setup_fts(self) -> bool:
+        """
+        Index the searchable columns in the FTS5 table [{id}_fts] and search
+        it for strings of 3 characters and more instead of LIKE over every
+        row (see _build_search_where).
+
+        The trigram tokenizer matches case-insensitive substrings like the
+        LIKE search. The index is an external-content table kept in sync by
+        triggers, so the writes of other processes are indexed too. It is
+        rebuilt when the searchable columns or the triggers change.
+
+        Returns False, and searches keep using LIKE, when this SQLite has no
+        FTS5 or no trigram tokenizer (before 3.34).
+        """
+        name = f"{self.id}_fts"
+        cols = [
+            c for c in self.node_columns
+            if self.table_fields.get(c, "TEXT").upper() in self._SEARCHABLE_TYPES
+        ]
+        if not cols:
+            self.fts = None
+            return False
+        conn = self.db._conn
+        triggers = {f"{name}_{event}" for event in ("ai", "ad", "au")}
+        with self.db.lock:
+            indexed = self.db.get_table_fields(name)
+            current = {row[0] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type='trigger' AND tbl_name=?",
+                (self.id,),
+            )}
+            if indexed is not None and list(indexed) == cols and triggers <= current:
+                self.fts = name
+                return True
+            col_list = ", ".join(f"[{c}]" for c in cols)
+            new_values = ", ".join(f"new.[{c}]" for c in cols)
+            old_values = ", ".join(f"old.[{c}]" for c in cols)
+            delete_old = (f"INSERT INTO [{name}]([{name}], rowid, {col_list}) "
+                          f"VALUES ('delete', old.ID, {old_values});")
+            insert_new = (f"INSERT INTO [{name}](rowid, {col_list}) "
+                          f"VALUES (new.ID, {new_values});")
+            try:
+                with self.db.transaction():
+                    conn.execute(f"DROP TABLE IF EXISTS [{name}]")
+                    conn.execute(
+                        f"CREATE VIRTUAL TABLE [{name}] USING fts5({col_list}, "
+                        f"content='{self.id}', content_rowid='ID', tokenize='trigram')"
+                    )
+                    for trigger in triggers:
+                        conn.execute(f"DROP TRIGGER IF EXISTS [{trigger}]")
+                    conn.execute(f"CREATE TRIGGER [{name}_ai] AFTER INSERT ON [{self.id}] "
+                                 f"BEGIN {insert_new} END")
+                    conn.execute(f"CREATE TRIGGER [{name}_ad] AFTER DELETE ON [{self.id}] "
+                                 f"BEGIN {delete_old} END")
+                    conn.execute(f"CREATE TRIGGER [{name}_au] AFTER UPDATE ON [{self.id}] "
+                                 f"BEGIN {delete_old} {insert_new} END")
+                    conn.execute(f"INSERT INTO [{name}]([{name}]) VALUES ('rebuild')")
+            except sqlite3.Error as e:
+                self.db.message_logger(
+                    f"Full-text index of '{self.id}' is not available, "
+                    f"searching with LIKE: {e}", "warning")
+                self.fts = None
+                return False
+        self.fts = name
+        return True
+
     def search_rows(self, search: str) -> "Dblist":
         """
         Return a *Dblist* (cache mode) of every row whose searchable columns
@@ -754,18 +1087,41 @@ class Dbtable:
         Returns an empty Dblist when *search* is blank (fallback to the
         caller to reload the normal list).
         """
-        where, params = self._build_search_where(search)
-        if not where:
+        query = self._search_query(search)
+        if query is None:
             return Dblist(self, cache=[])
+        cur = self.db.execute(*query)
+        rows = [self._row_to_list(r) for r in cur.fetchall()] if cur else []
+        return Dblist(self, cache=rows)
 
-        cur = self.db.execute(
+    async def asearch_rows(self, search: str) -> "Dblist":
+        """search_rows off the event loop, see Database.aquery."""
+        query = self._search_query(search)
+        if query is None:
+            return Dblist(self, cache=[])
+        return Dblist(self, cache=await self.db.aquery(*query, self._row_to_list))
+
+    def _search_query(self, search: str) -> tuple[str, list] | None:
+        """(query, params) of search_rows, None for a blank search."""
+        if phrase := self._fts_phrase(search):
+            # the index yields its matches in rowid order: the first `limit`
+            # of them are enough
+            return (
+                f"SELECT {self._select_cols()} FROM [{self.id}] "
+                f"WHERE ID IN (SELECT rowid FROM [{self.fts}] "
+                f"WHERE [{self.fts}] MATCH ? ORDER BY rowid LIMIT ?) "
+                f"ORDER BY ID",
+                [phrase, self.limit],
+            )
+        where, params = self._build_search_where(search)
+        if not where:
+            return None
+        return (
             f"SELECT {self._select_cols()} FROM [{self.id}] "
             f"WHERE {where} "
             f"ORDER BY ID LIMIT ?",
             params + [self.limit],
         )
-        rows = [self._row_to_list(r) for r in cur.fetchall()] if cur else []
-        return Dblist(self, cache=rows)
 
     # ── write ────────────────────────────────────────────────────────────── #
 
@@ -819,14 +1175,14 @@ class Dbtable:
         """
         Bulk-insert rows atomically and return each stored row with its ID.
 
-        Uses RETURNING * via ``execute()`` in a single explicit transaction.
+        Uses RETURNING <columns> via ``execute()`` in a single explicit transaction.
         This is race-condition-free: each row carries its own ID back from the
         DB immediately, with no gap for a concurrent writer.
 
         Note: Python's sqlite3 C binding does not support RETURNING with
         ``executemany()``, so we loop over ``execute()`` calls instead.
-        The explicit ``BEGIN`` / ``COMMIT`` keeps the whole batch atomic and
-        avoids the per-row auto-commit overhead.
+        ``db.transaction()`` keeps the whole batch atomic and avoids the
+        per-row auto-commit overhead.
         """
         if not rows:
             return []
@@ -857,26 +1213,20 @@ class Dbtable:
             placeholders = ", ".join("?" for _ in cols)
             sql = (
                 f"INSERT INTO [{self.id}] ({col_str}) "
-                f"VALUES ({placeholders}) RETURNING *"
+                f"VALUES ({placeholders}) RETURNING {self._select_cols()}"
             )
         else:
             # Every row in the batch is an empty dict -- e.g. bulk-adding
             # several blank rows. "INSERT INTO t () VALUES ()" is invalid
             # SQLite syntax, so use the dedicated all-defaults form instead
             # (see append_row()'s identical guard for the single-row case).
-            sql = f"INSERT INTO [{self.id}] DEFAULT VALUES RETURNING *"
+            sql = f"INSERT INTO [{self.id}] DEFAULT VALUES RETURNING {self._select_cols()}"
 
         inserted: list[list] = []
         try:
-            # Use the connection as a context manager rather than explicit
-            # BEGIN / COMMIT.  Explicit BEGIN raises
-            # "cannot start a transaction within a transaction" if Python's
-            # sqlite3 module has already opened an implicit transaction (which
-            # happens whenever a DML statement ran without an intervening
-            # commit).  The context manager detects this correctly: it joins
-            # an existing transaction if one is open, or starts a new one, and
-            # always issues COMMIT on clean exit or ROLLBACK on any exception.
-            with self.db._conn:
+            # A savepoint when called inside an outer db.transaction(): a
+            # failed batch is rolled back alone, the outer one commits.
+            with self.db.transaction():
                 for d in dicts:
                     params = tuple(_adapt_value(d.get(c)) for c in cols) if cols else ()
                     cur = self.db._conn.execute(sql, params)
@@ -908,6 +1258,7 @@ class Dbtable:
         )
         if result is not None and result.rowcount:
             self.length -= 1
+            self._forget_keys()
             self._bump_version()
         return result is not None
 
@@ -920,6 +1271,7 @@ class Dbtable:
         if result is not None:
             self.length -= result.rowcount
             if result.rowcount:
+                self._forget_keys()
                 self._bump_version()
         return result is not None
 
@@ -933,6 +1285,7 @@ class Dbtable:
         result = self.db.execute(f"DELETE FROM [{self.id}]")
         if result is not None:
             self.length = 0
+            self._forget_keys()
             self._bump_version()
         return result is not None
 
@@ -976,6 +1329,9 @@ class Dbtable:
             self.table_fields[self.LINK_ID] = "INTEGER"
             self.node_columns.append(self.LINK_ID)
             self._all_columns = self.node_columns + ["ID"]
+            self._compile_decoder()
+            if self.fts:
+                self.setup_fts()
 
     def setup_junction(
         self,
@@ -1085,12 +1441,13 @@ class Dbtable:
         tnode_id: int,
         link_index_name: str = None,
     ) -> list:
-        return [
-            self.add_link(
-                sid, link_table, tnode_id, link_index_name=link_index_name
-            )
-            for sid in snode_ids
-        ]
+        with self.db.transaction():
+            return [
+                self.add_link(
+                    sid, link_table, tnode_id, link_index_name=link_index_name
+                )
+                for sid in snode_ids
+            ]
 
     def delete_link(
         self, link_table_id: str, link_id: int, index_name: str = None
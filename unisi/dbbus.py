@@ -0,0 +1,116 @@
+# Copyright © 2024 UNISI Tech. All rights reserved.
+"""
+Opt-in update bus between server processes using the same db_path, see
+config.dbbus.
+
+dbupdates only reach the sessions of the process which made them. With a bus
+every process publishes its dbupdates after a message is processed and reads
+the ones published by the others (User.sync_dbupdates, and every
+`config.dbbus` seconds by a background task), then delivers them to its own
+sessions showing the data. The Dbtable of the updated data recounts its rows
+and its Dblist drops the cached chunks the updates touch (Dbtable.refresh).
+
+The bus is pluggable: `bus` is any implementation of UpdateBus. By
+default it is a SqliteBus in a file next to the database. Its methods are
+called in a thread of the bus, so a bus waiting for a lock held by another
+process does not stop the event loop.
+"""
+import asyncio, json, sqlite3, time, uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from .common import Unishare, toJson
+import config
+
+# of this server, shared by its forked workers: they get the updates of each
+# other over their own bus, see workers.py
+instance = uuid.uuid4().hex
+
+bus = None
+executor = None #the thread of the bus, created on first use: a forked worker starts its own
+
+class UpdateBus(ABC):
+    """the interface of an update bus"""
+    @abstractmethod
+    def publish(self, updates: dict):
+        """send updates (db id -> list of Dblist update dicts) to the other processes"""
+
+    @abstractmethod
+    def receive(self) -> dict | None:
+        """updates published by the other processes since the last call, merged by db id,
+        None if some of them were lost: every table has to be read again"""
+
+    def close(self):
+        pass
+
+class SqliteBus(UpdateBus):
+    """Updates are rows of a SQLite file shared by the processes, every
+    process reads the rows after the last one it has read. Rows older than
+    `keep` seconds are deleted, a process which has not read them in time
+    gets None from receive()."""
+    prune_every = 100 #publications
+
+    def __init__(self, path: str, keep: float = 60):
+        self.keep = keep
+        self.published = 0
+        self._conn = sqlite3.connect(path, isolation_level = None, check_same_thread = False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS updates (ID INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "instance TEXT, time REAL, payload TEXT)")
+        self.last = self._last_id()
+
+    def _last_id(self) -> int:
+        """the ID of the last row published, also when it is deleted"""
+        return self._conn.execute("SELECT COALESCE((SELECT seq FROM sqlite_sequence "
+            "WHERE name = 'updates'), 0)").fetchone()[0]
+
+    def publish(self, updates: dict):
+        now = time.time()
+        self._conn.execute("INSERT INTO updates (instance, time, payload) VALUES (?, ?, ?)",
+            (instance, now, toJson({id: list(id_updates) for id, id_updates in updates.items()})))
+        self.published += 1
+        if self.published % self.prune_every == 0:
+            self._conn.execute("DELETE FROM updates WHERE time < ?", (now - self.keep,))
+
+    def receive(self) -> dict | None:
+        self._conn.execute("BEGIN") #the rows and the last ID of one moment
+        try:
+            rows = self._conn.execute("SELECT ID, instance, payload FROM updates "
+                "WHERE ID > ? ORDER BY ID", (self.last,)).fetchall()
+            last = self._last_id()
+        finally:
+            self._conn.execute("COMMIT")
+        if (rows[0][0] if rows else last + 1) > self.last + 1: #rows were deleted before they were read
+            self.last = last
+            return None
+        merged = {}
+        for id, source, payload in rows:
+            self.last = id
+            if source != instance:
+                for db_id, id_updates in json.loads(payload).items():
+                    merged.setdefault(db_id, []).extend(id_updates)
+        return merged
+
+    def close(self):
+        self._conn.close()
+
+def current():
+    """the bus of this process, None if config.dbbus is off"""
+    global bus
+    if bus is None and config.dbbus and Unishare.db:
+        bus = SqliteBus(f'{Unishare.db.dbpath}-updates')
+    return bus
+
+async def run(fn, *args):
+    """fn(*args) in the thread of the bus"""
+    global executor
+    if executor is None:
+        executor = ThreadPoolExecutor(1, thread_name_prefix = 'unisi-dbbus')
+    return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+async def publish(updates):
+    if updates and (active := current()):
+        await run(active.publish, {id: list(id_updates) for id, id_updates in updates.items()})
+
+async def receive() -> dict | None:
+    active = current()
+    return await run(active.receive) if active else {}
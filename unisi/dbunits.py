@@ -1,5 +1,7 @@
 # Copyright © 2024 UNISI Tech. All rights reserved.
-from collections import defaultdict, deque
+import asyncio
+from collections import OrderedDict, defaultdict, deque
+import config
 
 # storage id -> screen name -> [elem name, block name]
 dbshare = defaultdict(lambda: defaultdict(list))
@@ -29,6 +31,44 @@ def at_iter(iterable, times):
     raise IndexError(f"Iterator has no element at index {times}")
 
 
+class ChunkCache(OrderedDict):
+    """
+    delta_list of a Dblist: chunk start offset -> rows, holding at most
+    `size` chunks besides chunk 0 (sent with the table, never evicted); the
+    least recently used one is evicted first. `size` 0 is unbounded.
+
+    hits/misses count the chunk lookups of get_delta_chunk/aget_delta_chunk,
+    read_aheads the chunks read by Dblist.read_ahead.
+    """
+
+    def __init__(self, size: int, chunks=()):
+        self.size = size
+        self.hits = self.misses = self.evictions = self.read_aheads = 0
+        super().__init__(chunks)
+
+    def get(self, key, default=None):
+        if key in self:
+            self.move_to_end(key)
+        return super().get(key, default)
+
+    def __setitem__(self, key, chunk):
+        super().__setitem__(key, chunk)
+        self.move_to_end(key)
+        if self.size:
+            while len(self) - (0 in self) > self.size:
+                del self[next(k for k in self if k)]
+                self.evictions += 1
+
+    def drop_from(self, delta_start: int) -> None:
+        for key in [k for k in self if k >= delta_start]:
+            del self[key]
+
+    @property
+    def stats(self) -> dict:
+        return dict(chunks=len(self), hits=self.hits, misses=self.misses,
+            evictions=self.evictions, read_aheads=self.read_aheads)
+
+
 class Dblist:
     """
     Lazy paginated proxy-list backed by a Dbtable.
@@ -70,7 +110,9 @@ class Dblist:
         elif init_list is None:
             raise AttributeError("init_list or cache has to be assigned!")
 
-        self.delta_list = {0: init_list}
+        self.delta_list = ChunkCache(config.chunk_cache, {0: init_list})
+        # chunk start -> task of read_ahead()
+        self._reading: dict[int, asyncio.Future] = {}
         # Snapshot of dbtable._version as of the last time we know our
         # delta_list correctly reflects the DB (either just now, at
         # construction, or after one of our own mutator methods below ran).
@@ -84,7 +126,9 @@ class Dblist:
     # ------------------------------------------------------------------ #
 
     def get_delta_0(self):
-        return self.delta_list[0] if self.cache is None else self.cache[: self.limit]
+        if self.cache is not None:
+            return self.cache[: self.limit]
+        return self.delta_list.get(0) or self.get_delta_chunk(0)[1] or []
 
     def __getstate__(self):
         return dict(length=len(self), limit=self.limit, data=self.get_delta_0())
@@ -130,15 +174,13 @@ class Dblist:
         before ever calling get_delta_chunk themselves.
         """
         if self.cache is None and self.dbtable._version != self._synced_version:
-            self.delta_list = {}
+            self.delta_list.clear()
             self._synced_version = self.dbtable._version
 
-    def get_delta_chunk(self, index: int) -> tuple[int, list]:
-        """Return (chunk_start_offset, chunk_list) for the row at *index*.
-
-        Negative indices are normalised before the chunk calculation so that
-        ``-1 // limit`` does not produce a negative chunk key.
-        """
+    def _cached_chunk(self, index: int) -> tuple[int, list | None]:
+        """(chunk_start_offset, chunk_list) for the row at *index* without
+        reading: (-1, None) out of range, the chunk is None when it has to be
+        read."""
         if index < 0:
             index = len(self) + index
         if index < 0 or index >= len(self):
@@ -156,13 +198,73 @@ class Dblist:
             # Cache miss, or a cached-but-too-short chunk that can't
             # actually satisfy this index (defensive fallback for the same
             # kind of staleness _sync_cache() guards against above).
+            self.delta_list.misses += 1
+            return delta_start, None
+        self.delta_list.hits += 1
+        return delta_start, lst
+
+    def get_delta_chunk(self, index: int) -> tuple[int, list]:
+        """Return (chunk_start_offset, chunk_list) for the row at *index*.
+
+        Negative indices are normalised before the chunk calculation so that
+        ``-1 // limit`` does not produce a negative chunk key.
+        """
+        delta_start, lst = self._cached_chunk(index)
+        if lst is None and delta_start >= 0:
             lst = self.dbtable.read_rows(skip=delta_start)
             self.delta_list[delta_start] = lst
         return delta_start, lst
 
+    async def aget_delta_chunk(self, index: int) -> tuple[int, list]:
+        """get_delta_chunk reading a missing chunk off the event loop, see
+        Dbtable.aread_rows."""
+        delta_start, lst = self._cached_chunk(index)
+        if lst is None and delta_start >= 0:
+            reading = self._reading.get(delta_start)
+            lst = await (asyncio.shield(reading) if reading else self._read_chunk(delta_start))
+        return delta_start, lst
+
+    async def _read_chunk(self, delta_start: int) -> list:
+        version = self.dbtable._version, self._synced_version
+        lst = await self.dbtable.aread_rows(skip=delta_start)
+        # rows added or deleted while reading shift the chunks: the read
+        # one is served but not cached
+        if version == (self.dbtable._version, self._synced_version):
+            self.delta_list[delta_start] = lst
+        return lst
+
+    def read_ahead(self, index: int) -> None:
+        """Start reading the chunk of *index* off the event loop unless it
+        is cached or being read; aget_delta_chunk waits for it."""
+        if self.cache is not None or not 0 <= index < len(self):
+            return
+        delta_start = (index // self.limit) * self.limit
+        self._sync_cache()
+        if delta_start in self.delta_list or delta_start in self._reading:
+            return
+        self.delta_list.read_aheads += 1
+        task = asyncio.ensure_future(self._read_chunk(delta_start))
+        self._reading[delta_start] = task
+        task.add_done_callback(lambda _: self._reading.pop(delta_start, None))
+
     def clean_cache_from(self, delta_start: int):
         """Evict all cached chunks whose start offset is >= *delta_start*."""
-        self.delta_list = {k: v for k, v in self.delta_list.items() if k < delta_start}
+        self.delta_list.drop_from(delta_start)
+
+    def invalidate(self, updates) -> None:
+        """Evict the cached chunks changed by *updates* (update dicts made by
+        another process, see Dbtable.refresh): the chunk of an updated row,
+        every chunk from the first changed one when rows were added or
+        deleted."""
+        if self.cache is not None:
+            return
+        limit = self.limit
+        for update in updates:
+            delta_start = ((update.get("index") or 0) // limit) * limit
+            if update.get("update") == "update":
+                self.delta_list.pop(delta_start, None)
+            else:
+                self.clean_cache_from(delta_start)
 
     # ------------------------------------------------------------------ #
     #  Element access                                                      #
@@ -228,8 +330,9 @@ class Dblist:
         """
         if isinstance(index, slice):
             # Reverse order keeps smaller indices stable during iteration.
-            for i in sorted(range(*index.indices(len(self))), reverse=True):
-                del self[i]
+            with self.dbtable.db.transaction():
+                for i in sorted(range(*index.indices(len(self))), reverse=True):
+                    del self[i]
             return
 
         if index < 0:
@@ -280,23 +383,58 @@ class Dblist:
         Update a single cell in the DB and the local cache.
         Returns the update dict, or None for cache-mode lists.
         """
+        table_id, row_id, field, in_node = self._cell_target(delta, cell, id)
+        self.dbtable.db.update_row(table_id, row_id, {field: value}, in_node)
+        return self._cell_updated(delta, cell, value)
+
+    async def aupdate_cell(self, delta: int, cell: int, value, id=None) -> dict | None:
+        """update_cell writing the cell in the writer thread, see
+        Database.awrite."""
+        if self.cache is None:
+            await self.aget_delta_chunk(delta)  # the row ID is in its chunk
+        db = self.dbtable.db
+        table_id, row_id, field, in_node = self._cell_target(delta, cell, id)
+        version = self.dbtable._version
+        key = self[delta][-1] if self.cache is None else None
+        await db.awrite(db.update_row, table_id, row_id, {field: value}, in_node)
+        if self.cache is None and version != self.dbtable._version:
+            # rows were added or deleted while writing: the row is found
+            # again by its ID, it is gone if it was deleted
+            delta = await self._aindex_of(key)
+            if delta is None:
+                return None
+        return self._cell_updated(delta, cell, value, key)
+
+    async def _aindex_of(self, key) -> int | None:
+        """The current index of the row with ID *key*, None if it is gone."""
+        rows = await self.dbtable.db.aquery(
+            f"SELECT COUNT(*), (SELECT COUNT(*) FROM [{self.dbtable.id}] WHERE ID = ?) "
+            f"FROM [{self.dbtable.id}] WHERE ID < ?", (key, key))
+        index, found = rows[0] if rows else (0, 0)
+        return index if found else None
+
+    def _cell_target(self, delta: int, cell: int, id=None) -> tuple:
+        """(table_id, row_id, field, in_node) of a cell for update_row."""
         in_node, field = self.index2node_relation(cell)
         if in_node:
-            table_id = self.dbtable.id
-            row_id = self[delta][len(self.dbtable.table_fields)]
-        else:
-            table_id = self.dbtable.list.link[2]
-            row_id = id
-
-        self.dbtable.db.update_row(table_id, row_id, {field: value}, in_node)
+            return self.dbtable.id, self[delta][len(self.dbtable.table_fields)], field, in_node
+        return self.dbtable.list.link[2], id, field, in_node
 
+    def _cell_updated(self, delta: int, cell: int, value, key=None) -> dict | None:
+        """Put a written cell value into the local cache. With the row ID
+        *key* a cached chunk holding another row at *delta* is dropped and
+        read again."""
         if self.cache is not None:
             self.cache[delta][cell] = value
             return None  # no streaming update in cache-mode
 
         delta_start, chunk = self.get_delta_chunk(delta)
         if chunk is not None:
-            chunk[delta - delta_start][cell] = value
+            row = chunk[delta - delta_start]
+            if key is None or row[-1] == key:
+                row[cell] = value
+            else:
+                del self.delta_list[delta_start]
         update = dict(type="action", update="update", index=delta, data=self[delta])
         dbupdates[self.dbtable.id].append(update)
         return update
@@ -422,7 +560,8 @@ class Dblist:
     def clear(self, detach=False):
         self.dbtable.clear(detach)
         self._synced_version = self.dbtable._version
-        self.delta_list = {0: []}
+        self.delta_list.clear()
+        self.delta_list[0] = []
         dbupdates[self.dbtable.id].append(
             dict(type="action", update="updates", length=0)
         )
\ No newline at end of file
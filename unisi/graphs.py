@@ -131,7 +131,7 @@ class Net(Graph):
         _value = getattr(self, 'selected', None)
         if _value is None:
             _value = {'nodes': [], 'edges': []}
-        state = {name: getattr(self, name) for name in self.__dict__
+        state = {name: value for name, value in unit_vars(self).items()
                  if name[0] != '_' and name not in ('topology', 'value')}
         state.update(nodes=self._nodes, edges=self._edges, value=_value)
         return state
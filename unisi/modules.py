@@ -1,12 +1,18 @@
 # Copyright © 2024 UNISI Tech. All rights reserved.
+import builtins
+import contextvars
 import copy
 import importlib
+import importlib.abc
+import os
 import sys
 import threading
 from dataclasses import dataclass
+from types import ModuleType
 
+from . import templates
 from .containers import Screen
-from .utils import blocks_dir, divpath, py_files, screens_dir
+from .utils import blocks_dir, config, divpath, py_files, screens_dir
 
 
 @dataclass
@@ -26,8 +32,135 @@ def screen_info_from_module(module):
     )
 
 
+# screen file path -> ((mtime, size), code object), see screen_code
+compiled = {}
+
+
+def screen_code(path):
+    """the compiled code of a screen or blocks file, compiled again only when the file changes"""
+    stat = os.stat(path)
+    key = stat.st_mtime_ns, stat.st_size
+    cached = compiled.get(path)
+    if cached and cached[0] == key:
+        return cached[1]
+    with open(path, 'rb') as file:
+        code = compile(file.read(), path, 'exec', dont_inherit=True)
+    compiled[path] = key, code
+    return code
+
+
+blocks_prefix = f'{blocks_dir}.'
+_import = builtins.__import__
+
+
+def import_hook(name, globals=None, locals=None, fromlist=(), level=0):
+    """__import__ of the modules of a user (a screen or blocks module, its
+    global `user`): blocks modules are that user's own modules, see
+    ModulesMixin.import_block. sys.modules is not involved."""
+    if not level and name != blocks_dir and not name.startswith(blocks_prefix):
+        return _import(name, globals, locals, fromlist, level)
+    user = globals.get('user') if globals else None
+    if isinstance(user, ModulesMixin):
+        target = name
+        if level:
+            package = globals.get('__package__') or ''
+            if package == blocks_dir or package.startswith(blocks_prefix):
+                target = importlib.util.resolve_name('.' * level + name, package)
+        if (level == 0 or target != name) and (target == blocks_dir or target.startswith(blocks_prefix)):
+            module = user.import_block(target)
+            if not fromlist:
+                return user.import_block(blocks_dir)
+            if hasattr(module, '__path__'):
+                names = getattr(module, '__all__', ()) if '*' in fromlist else fromlist
+                for attr in names:
+                    if not hasattr(module, attr):
+                        try:
+                            user.import_block(f'{target}.{attr}')
+                        except ModuleNotFoundError as error:
+                            if error.name != f'{target}.{attr}':
+                                raise
+            return module
+    return _import(name, globals, locals, fromlist, level)
+
+
+# the builtins of the modules of users, only their import statements go
+# through import_hook
+user_builtins = dict(builtins.__dict__, __import__=import_hook)
+
+# the user whose screen or blocks module is being executed in this thread
+loading = contextvars.ContextVar('loading', default=None)
+
+# the Stage of the screen compiled in this thread by ModulesMixin.stage_screen
+staging = contextvars.ContextVar('staging', default=None)
+
+
+class Stage:
+    """The blocks modules and handlers of a user while a screen of the user
+    is compiled in a thread by stage_screen: the ones of the session are not
+    changed there, ModulesMixin.take_stage merges them on the event loop."""
+    def __init__(self, user):
+        self.user = user
+        self.base = dict(user.modules)
+        self.modules = dict(self.base)
+        self.handlers = {}
+
+
+class BlocksFinder(importlib.abc.MetaPathFinder, importlib.abc.Loader):
+    """importlib.import_module('blocks.x') called while a module of a user is
+    executed gets that user's module too. The import system puts it into
+    sys.modules, the user takes it out when the module is executed, see
+    ModulesMixin.execute."""
+
+    def find_spec(self, name, path=None, target=None):
+        user = loading.get()
+        if user is None or (name != blocks_dir and not name.startswith(blocks_prefix)):
+            return None
+        module = user.import_block(name)
+        spec = importlib.util.spec_from_loader(name, self, origin=getattr(module, '__file__', None),
+            is_package=hasattr(module, '__path__'))
+        spec.module, spec.own = module, getattr(module, '__spec__', None)
+        return spec
+
+    def create_module(self, spec):
+        return spec.module
+
+    def exec_module(self, module):
+        module.__spec__ = module.__spec__.own #executed by import_block
+
+
+sys.meta_path.insert(0, BlocksFinder())
+
+
 class ModulesMixin:
-    module_lock = threading.RLock()
+    registry_lock = threading.Lock()
+
+    @property
+    def modules(self):
+        """blocks module name -> the module of this user"""
+        stage = staging.get()
+        return stage.modules if stage and stage.user is self else self._modules
+
+    @modules.setter
+    def modules(self, modules):
+        stage = staging.get()
+        if stage and stage.user is self:
+            stage.modules = modules
+        else:
+            self._modules = modules
+
+    @property
+    def handlers(self):
+        """(unit, event) -> the handler registered with @handle"""
+        stage = staging.get()
+        return stage.handlers if stage and stage.user is self else self._handlers
+
+    @handlers.setter
+    def handlers(self, handlers):
+        stage = staging.get()
+        if stage and stage.user is self:
+            stage.handlers = handlers
+        else:
+            self._handlers = handlers
 
     @classmethod
     def build_screen_registry(cls):
@@ -45,17 +178,19 @@ class ModulesMixin:
                 return info
 
     def _upsert_screen_info(self, info):
-        registry = [old for old in self.screen_registry if old.file != info.file]
-        registry.append(info)
-        registry.sort(key=lambda item: item.order)
-        self.__class__.screen_registry = registry
-        self.__class__._screen_registry_ready = True
+        with self.registry_lock: #screens of different sessions are loaded in parallel
+            registry = [old for old in self.screen_registry if old.file != info.file]
+            registry.append(info)
+            registry.sort(key=lambda item: item.order)
+            self.__class__.screen_registry = registry
+            self.__class__._screen_registry_ready = True
 
     def _remove_screen_info(self, file):
-        self.__class__.screen_registry = [
-            info for info in self.screen_registry if info.file != file
-        ]
-        self.__class__._screen_registry_ready = True
+        with self.registry_lock:
+            self.__class__.screen_registry = [
+                info for info in self.screen_registry if info.file != file
+            ]
+            self.__class__._screen_registry_ready = True
 
     def _remove_module(self, name):
         module = sys.modules.get(name)
@@ -68,16 +203,56 @@ class ModulesMixin:
                 pass
         sys.modules.pop(name, None)
 
-    def _install_modules(self):
-        for name in list(sys.modules):
-            if name.startswith(f'{blocks_dir}.'):
-                self._remove_module(name)
-        sys.modules.update(self.modules)
-        for name, module in self.modules.items():
-            parent_name, _, child_name = name.rpartition('.')
-            if parent_name:
-                parent = sys.modules.get(parent_name) or importlib.import_module(parent_name)
-                setattr(parent, child_name, module)
+    def import_block(self, name):
+        """the blocks module `name` of this user, executed on its first import"""
+        if staging.get(): #the modules of the Stage are only used by this thread
+            return self.modules.get(name) or self._import_block(name)
+        with self.screen_lock: #build_template swaps self.modules while a screen is compiled in a thread
+            return self.modules.get(name) or self._import_block(name)
+
+    def _import_block(self, name):
+        parent_name, _, child_name = name.rpartition('.')
+        parent = self.import_block(parent_name) if parent_name else None
+        path = name.replace('.', divpath)
+        if os.path.isdir(path):
+            file = f'{path}{divpath}__init__.py'
+            if os.path.isfile(file):
+                spec = importlib.util.spec_from_file_location(name, file, submodule_search_locations=[path])
+                module = importlib.util.module_from_spec(spec)
+            else: #a namespace package
+                file = None
+                module = ModuleType(name)
+                module.__path__ = [path]
+                module.__package__ = name
+        elif os.path.isfile(f'{path}.py'):
+            file = f'{path}.py'
+            module = importlib.util.module_from_spec(importlib.util.spec_from_file_location(name, file))
+        else:
+            raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+        module.user = self
+        self.modules[name] = module
+        if file:
+            try:
+                self.execute(screen_code(file), module)
+            except BaseException:
+                self.modules.pop(name, None)
+                raise
+        if parent is not None:
+            setattr(parent, child_name, module)
+        return module
+
+    def execute(self, code, module):
+        """run the code of a screen or blocks module of this user"""
+        module.__builtins__ = user_builtins
+        outer = loading.get() is not self
+        token = loading.set(self)
+        try:
+            exec(code, module.__dict__)
+        finally:
+            loading.reset(token)
+            for name, own in self.modules.items() if outer else ():
+                if sys.modules.get(name) is own: #imported with importlib
+                    del sys.modules[name]
 
     def _capture_modules(self):
         for name in [name for name in sys.modules if name.startswith(f'{blocks_dir}.')]:
@@ -91,16 +266,72 @@ class ModulesMixin:
         self._remove_module(name)
 
     def set_clean(self):
-        """Capture and remove this user's block modules from sys.modules."""
+        """Capture and remove block modules imported outside of load_screen from sys.modules."""
         self._capture_modules()
 
     def load_screen(self, file):
-        with self.module_lock:
-            self._install_modules()
-            try:
-                module = self.compile_screen(file)
-            finally:
-                self._capture_modules()
+        with self.screen_lock:
+            if config.shared_screens:
+                return self.copy_screen(file)
+            return self.compile_screen(file)
+
+    def stage_screen(self, file, stage):
+        """load_screen in a thread which does not change the session: the
+        blocks modules and handlers go to stage, see take_stage. A shared
+        screen only gets its template, None is returned."""
+        token = staging.set(stage)
+        try:
+            if config.shared_screens:
+                self.screen_template(file)
+                return None
+            return self.compile_screen(file)
+        finally:
+            staging.reset(token)
+
+    def take_stage(self, file, module, stage):
+        """the module of stage_screen with the blocks modules and handlers of
+        stage merged into the session, None if the session has imported one
+        of them since: the module holds other ones"""
+        if module is None: #the template is ready, the session copy is quick
+            return self.load_screen(file)
+        modules = self.modules
+        for name, own in stage.modules.items():
+            current = modules.get(name)
+            if current is not own and (current is not None or name in stage.base):
+                return None
+        modules.update(stage.modules)
+        self.handlers.update(stage.handlers)
+        return module
+
+    def screen_template(self, file):
+        """the shared template of a screen, built again when its file changed"""
+        code = screen_code(f'{screens_dir}{divpath}{file}')
+        template = templates.screens.get(file)
+        if template is None or template.code is not code:
+            with templates.lock:
+                template = templates.screens.get(file)
+                if template is None or template.code is not code: #a new or changed screen file
+                    template = self.build_template(file)
+        return template
+
+    def copy_screen(self, file):
+        """this session's copy of the shared template of a screen, see templates.py"""
+        module = templates.session_copy(self).screen(self.screen_template(file))
+        self.assign_parent_links(module)
+        return self.setup_screen(module)
+
+    def build_template(self, file):
+        modules, handlers = self.modules, self.handlers
+        self.modules, self.handlers = dict(templates.blocks), {}
+        try:
+            module = ModulesMixin.compile_screen(self, file)
+            code = compiled[f'{screens_dir}{divpath}{file}'][1]
+            return templates.add(file, module, code, self.modules, self.handlers, self)
+        finally:
+            self.modules, self.handlers = modules, handlers
+
+    def setup_screen(self, module):
+        """make a compiled screen module ready for the session"""
         return module
 
     def compile_screen(self, file):
@@ -110,7 +341,7 @@ class ModulesMixin:
         module = importlib.util.module_from_spec(spec)
         module.user = self
 
-        spec.loader.exec_module(module)
+        self.execute(screen_code(path), module)
         screen = Screen(getattr(module, 'name', ''))
         for var, val in screen.defaults.items():
             resolved = getattr(module, var, val)
@@ -154,19 +385,25 @@ class ModulesMixin:
             self.update_menu()
             return bool(module or self.screens)
 
-        if not self.screen_registry:
+        file = self.first_screen_file(screen)
+        if file is None:
             return False
+        self.show_first_screen(self.load_screen(file))
+        return True
 
-        info = self._screen_info(screen) if screen else self.screen_registry[0]
-        if not info:
-            return False
+    def first_screen_file(self, screen=None):
+        """the file of the screen load_lazy loads first, None if there is no such screen"""
+        if self.screen_registry:
+            info = self._screen_info(screen) if screen else self.screen_registry[0]
+            if info:
+                return info.file
 
-        module = self.load_screen(info.file)
+    def show_first_screen(self, module):
+        """make the module returned by load_screen the current screen of a session without screens"""
         self.screens.append(module)
         self.screens.sort(key=lambda item: item.screen.order)
         self.screen_module = module
         self._finish_loaded_screen(module, prepare=True)
-        return True
 
     def load(self, screen=None):
         return self.load_lazy(screen)
@@ -182,8 +419,9 @@ class ModulesMixin:
         if not info:
             return None
 
-        module = self.load_screen(info.file)
-        self.screens.append(module)
-        self.screens.sort(key=lambda item: item.screen.order)
-        self._finish_loaded_screen(module)
+        with self.screen_lock:
+            module = self.prefetched.pop(info.file, None) or self.load_screen(info.file)
+            self.screens.append(module)
+            self.screens.sort(key=lambda item: item.screen.order)
+            self._finish_loaded_screen(module)
         return module
\ No newline at end of file
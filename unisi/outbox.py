@@ -0,0 +1,117 @@
+# Copyright © 2024 UNISI Tech. All rights reserved.
+"""
+Per-connection outbound queue, see config.outbox.
+
+websocket_handler's send() hands its messages to an Outbox instead of writing
+them to the socket itself; a writer task sends them in order. While the client
+is slow to read, the messages waiting in the queue are compacted:
+
+  * an `update` message following another queued `update` is merged into it,
+    the later state of a unit (the same path) replaces the earlier one;
+  * a `progress` tick following a queued one supersedes it, their updates are
+    merged the same way.
+
+Messages are converted to plain data when queued, so a merged message carries
+the unit states of the moment they were sent, and are encoded when written.
+Pre-encoded text (a broadcast or dbupdate payload shared by many sessions) is
+queued as is and never merged.
+
+Once `limit` messages are waiting, put() waits for the writer, so handlers of
+a session with a slow client are slowed down instead of the queue growing.
+"""
+import asyncio
+from collections import Counter, deque
+from .serialize import to_plain, dumps
+
+mergeable_types = ('update', 'progress')
+
+# counters summed over all connections: queued, sent, coalesced, dropped, failed
+totals = Counter()
+
+def merge_updates(earlier: list, later: list) -> list:
+    """updates of both messages, the later one wins for the same path,
+    a later delta update is applied to the earlier update"""
+    merged = {tuple(update.get('path') or ()) or id(update): update for update in earlier}
+    for update in later:
+        key = tuple(update.get('path') or ()) or id(update)
+        if update.get('delta') and key in merged:
+            previous = merged[key]
+            update = {**previous, 'data': {**previous['data'], **update['data']}}
+        merged[key] = update
+    return list(merged.values())
+
+class Outbox:
+    def __init__(self, write, limit):
+        """write(text) sends one frame to the client"""
+        self.write = write
+        self.limit = limit
+        self.entries = deque()
+        self.ready = asyncio.Event()
+        self.space = asyncio.Event()
+        self.space.set()
+        self.closed = False
+        self.stats = Counter(max_depth = 0)
+        self.writer = asyncio.create_task(self.run())
+
+    @property
+    def depth(self) -> int:
+        """messages waiting to be written"""
+        return len(self.entries)
+
+    def count(self, name, n = 1):
+        self.stats[name] += n
+        totals[name] += n
+
+    async def put(self, message):
+        """queue a message object or encoded text"""
+        if self.closed:
+            return
+        while not self.space.is_set():
+            await self.space.wait()
+        entry = message if type(message) == str else to_plain(message)
+        self.count('queued')
+        if not self.merge(entry):
+            self.entries.append(entry)
+            if len(self.entries) > self.stats['max_depth']:
+                self.stats['max_depth'] = len(self.entries)
+            if len(self.entries) >= self.limit:
+                self.space.clear()
+        self.ready.set()
+
+    def merge(self, entry) -> bool:
+        """merge entry into the last waiting message if both are update or progress"""
+        if not self.entries or type(entry) != dict or entry.get('type') not in mergeable_types:
+            return False
+        last = self.entries[-1]
+        if type(last) != dict or last.get('type') != entry['type']:
+            return False
+        if entry['type'] == 'progress':
+            self.count('dropped')
+        else:
+            self.count('coalesced')
+        updates = merge_updates(last.get('updates', []), entry.get('updates', []))
+        self.entries[-1] = {**entry, 'updates': updates}
+        return True
+
+    async def run(self):
+        while True:
+            while not self.entries:
+                self.ready.clear()
+                await self.ready.wait()
+            entry = self.entries.popleft()
+            if len(self.entries) < self.limit:
+                self.space.set()
+            try:
+                await self.write(entry if type(entry) == str else dumps(entry))
+            except Exception: #the client is gone
+                self.count('failed')
+                self.close()
+                return
+            self.count('sent')
+
+    def close(self):
+        self.closed = True
+        self.entries.clear()
+        self.space.set()
+        if self.writer is not asyncio.current_task():
+            self.writer.cancel()
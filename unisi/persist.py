@@ -5,7 +5,7 @@ import sqlite3
 import time
 
 from .common import strpath
-from .units import ChangedProxy, Unit
+from .units import ChangedProxy, Unit, note_delta
 
 SCHEMA = """
 CREATE TABLE IF NOT EXISTS state (
@@ -36,6 +36,9 @@ CREATE TABLE IF NOT EXISTS state (
 # Unit.action_list ('changed', 'complete', ...) must never be overwritten by restore.
 SKIP_RESTORE_KEYS = {'id', *Unit.action_list}
 
+# namespace prefix of the unit state saved by User.hibernate, see Persist.save_hibernated
+HIBERNATED = '~'
+
 _SKIP_JSON = object()
 _UNRESOLVED = object()  # marks a saved unit reference with no live counterpart, so it gets dropped rather than fabricated
 _NOT_FOUND = object()   # marks: no row saved for this (namespace, path, context_key)
@@ -178,7 +181,7 @@ def _persist_identity(unit, parents, shared_roots, screen_name):
 
     Blocks living under blocks/ are imported by reference, so the very same
     live object is embedded in every screen that imports it (see
-    ModulesMixin._install_modules/_capture_modules) — only the layout
+    ModulesMixin.import_block) — only the layout
     *around* it is screen-specific. So a unit found inside one of those
     objects (see _shared_root_of) is anchored to that block's own module:
     namespace becomes the module's dotted name and path runs only from the
@@ -242,6 +245,33 @@ def _json_ready(value, parents, shared_roots, screen_name):
     return str(value)
 
 
+def _plain_value(value, identity_of):
+    """value as JSON-ready data, a unit inside it as an {'id': path} reference to
+    the live unit; _SKIP_JSON if it holds anything else (a Dblist, a function, ...),
+    which the screen code rebuilds by itself"""
+    if isinstance(value, ChangedProxy):
+        value = value._obj
+    if isinstance(value, Unit):
+        identity = identity_of(value)
+        return {'id': identity[1]} if identity else _SKIP_JSON
+    if isinstance(value, list | tuple):
+        items = [_plain_value(item, identity_of) for item in value]
+        return _SKIP_JSON if any(item is _SKIP_JSON for item in items) else items
+    if isinstance(value, dict):
+        if 'id' in value: #would be taken for a unit reference by _rebuild_value
+            return _SKIP_JSON
+        data = {}
+        for key, item in value.items():
+            item = _plain_value(item, identity_of) if isinstance(key, str) else _SKIP_JSON
+            if item is _SKIP_JSON:
+                return _SKIP_JSON
+            data[key] = item
+        return data
+    if value is None or isinstance(value, int | float | bool | str):
+        return value
+    return _SKIP_JSON
+
+
 def _rebuild_value(value, unit_map):
     """Resolve saved data against the live unit tree. A unit is only ever matched
     by id and updated in place; a saved id with no live counterpart is dropped —
@@ -379,6 +409,67 @@ class Persist:
             if saved_dict:
                 _smart_apply_dict(unit, saved_dict, unit_map)
 
+    def save_hibernated(self, user, screen_modules, current):
+        """Save the plain state (see _plain_value) of every unit of screen_modules
+        under its persist identity with the HIBERNATED prefix, and which screens
+        are loaded, replacing what an earlier hibernation saved."""
+        shared_roots = user._shared_block_roots()
+        ts = time.time()
+        screens = {'files': [os.path.basename(module.__file__) for module in screen_modules],
+            'current': _screen_name(current) if current else None}
+        rows = [(HIBERNATED, '', 'screens', json.dumps(screens, ensure_ascii=False), ts)]
+        for module in screen_modules:
+            screen_name = _screen_name(module)
+            parents = module.screen._parents
+            identity_of = lambda unit: _persist_identity(unit, parents, shared_roots, screen_name)
+            for unit in user._iter_units(module):
+                identity = identity_of(unit)
+                if not identity:
+                    continue
+                state = {}
+                for name, value in unit.__getstate__().items():
+                    if name not in SKIP_RESTORE_KEYS:
+                        value = _plain_value(value, identity_of)
+                        if value is not _SKIP_JSON:
+                            state[name] = value
+                rows.append((HIBERNATED + identity[0], identity[1], '', json.dumps(state, ensure_ascii=False), ts))
+        self.conn.execute("DELETE FROM state WHERE namespace LIKE ? ESCAPE ?", (_escape_like(HIBERNATED) + '%', _LIKE_ESCAPE))
+        self.conn.executemany(
+            'INSERT OR REPLACE INTO state(namespace, path, context_key, value, ts) VALUES (?, ?, ?, ?, ?)',
+            rows,
+        )
+        self.conn.commit()
+
+    def hibernated_screens(self):
+        """{'files': [...], 'current': screen name} saved by save_hibernated, or None"""
+        found = self.lookup_keyed(HIBERNATED, '', 'screens')
+        return None if found is _NOT_FOUND else found
+
+    def restore_hibernated(self, user, screen_modules):
+        """Apply the state saved by save_hibernated to the units of the reloaded
+        screen_modules and delete it: a session wakes up from it once."""
+        pattern = (_escape_like(HIBERNATED) + '%', _LIKE_ESCAPE)
+        saved = {(namespace, path): value for namespace, path, value in self.conn.execute(
+            "SELECT namespace, path, value FROM state WHERE namespace LIKE ? ESCAPE ? AND context_key = ''", pattern)}
+        shared_roots = user._shared_block_roots()
+        for module in screen_modules:
+            screen_name = _screen_name(module)
+            parents = module.screen._parents
+            identities = {}
+            for unit in user._iter_units(module):
+                if identity := _persist_identity(unit, parents, shared_roots, screen_name):
+                    identities[unit] = identity
+            unit_map = {_path_key(path): unit for unit, (_, path) in identities.items()}
+            for unit, (namespace, path) in identities.items():
+                value = saved.get((HIBERNATED + namespace, path))
+                if value:
+                    _smart_apply_dict(unit, json.loads(value), unit_map)
+        self.conn.execute("DELETE FROM state WHERE namespace LIKE ? ESCAPE ?", pattern)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
     def lookup_keyed(self, namespace, path, context_key):
         """Look up a value saved under a (namespace, path, context_key) triple.
         Used both by keyed-persist units and by the plain get_key/set_key API
@@ -546,7 +637,7 @@ class UserPersistMixin:
         """id(unit) -> (unit, module_name) for every top-level Unit/Block value
         exported by this user's currently-cached blocks/ modules (self.modules,
         populated incrementally as screens get visited — see
-        ModulesMixin._capture_modules). Each of these is the exact same live
+        ModulesMixin.import_block). Each of these is the exact same live
         instance embedded in every screen that imports it, which makes the
         module's own (globally unique, Python-enforced) dotted name a natural,
         screen-independent anchor for its persisted state — see
@@ -560,13 +651,14 @@ class UserPersistMixin:
         cached = getattr(self, '_shared_roots_cache', None)
         if cached is not None and cached[0] == len(self.modules):
             return cached[1]
-        roots = {
-            id(value): (value, module_name)
-            for module_name, module in self.modules.items()
-            for value in vars(module).values()
-            if isinstance(value, Unit)
-        }
-        self._shared_roots_cache = (len(self.modules), roots)
+        with self.screen_lock: #a screen can be compiled in a thread
+            roots = {
+                id(value): (value, module_name)
+                for module_name, module in self.modules.items()
+                for value in vars(module).values()
+                if isinstance(value, Unit)
+            }
+            self._shared_roots_cache = (len(self.modules), roots)
         return roots
 
     def _mark_persist_units(self):
@@ -925,6 +1017,7 @@ class UserPersistMixin:
                 continue
             _smart_apply_dict(unit, found, unit_map)
             if not self._is_message_target(unit):
+                note_delta(unit, None)
                 self.register_changed_unit(unit)
             loaded.append(unit)
         return loaded
@@ -970,6 +1063,7 @@ class UserPersistMixin:
             return
         if self._is_message_target(unit):
             object.__setattr__(unit, 'active', value)
+            note_delta(unit, 'active') #so the next update of the unit carries it to a delta client
         else:
             unit.active = value
 
@@ -1086,6 +1180,7 @@ class UserPersistMixin:
                 if found is not _NOT_FOUND and isinstance(found, dict):
                     _smart_apply_dict(unit, found, unit_map)
                     if not self._is_message_target(unit):
+                        note_delta(unit, None)
                         self.register_changed_unit(unit)  # applied silently via object.__setattr__ above — mark dirty so the diff reaches the client
                     self._set_persist_active(unit, True)
                 else:
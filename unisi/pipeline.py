@@ -0,0 +1,109 @@
+# Copyright © 2024 UNISI Tech. All rights reserved.
+"""
+Opt-in per-session message pipelining, see config.pipeline.
+
+By default websocket_handler handles one client message at a time, so a slow
+`changed` handler also holds up the `complete`/`get` lookups queued behind it.
+A Pipeline splits the messages of a session into two lanes:
+
+  * the ordered lane -- everything that can mutate state, processed one by one
+    in arrival order by a single worker, exactly like the serial loop does;
+  * the fast lane -- a lone `complete` or table `get` answered by the unit's own
+    method; it runs at once, concurrently with whatever the ordered lane is doing.
+
+At most `size` messages of a session are queued or running at a time; past that
+put() waits, so the socket reader stops reading and a flooding client is held
+back by TCP instead of by an ever growing queue.
+
+A fast lane answer is sent as it is, without user.prepare_result: it would
+send and clear the changed units of the handler running in the ordered lane,
+and a `complete`/`get` answer changes no unit to persist. A message failing in
+either lane is logged and answered with an Error, as server.process_message
+does without a pipeline.
+"""
+import asyncio, time, traceback
+from .autotest import recorder
+from .common import Error, ReceivedMessage, toJson, is_callable
+
+read_only_events = ('complete', 'get')
+
+class Pipeline:
+    def __init__(self, user, process, size):
+        """process(user, raw_message) handles a message of the ordered lane"""
+        self.user = user
+        self.process = process
+        self.slots = asyncio.Semaphore(size)
+        self.queue = asyncio.Queue()
+        self.readers = set()
+        self.pending = 0 #messages queued or running
+        self.worker = asyncio.create_task(self.run())
+
+    def fast_lane(self, raw_message):
+        """(unit, message) if raw_message can be answered out of order, else None"""
+        if isinstance(raw_message, dict) and raw_message.get('event') in read_only_events:
+            message = ReceivedMessage(raw_message)
+            user = self.user
+            if user.hibernated or message.screen_type or message.voice_type or message.screen and message.screen != user.screen.name:
+                return None
+            elem = user.find_element(message)
+            #a handler registered with @handle may return anything, not only an Answer
+            if elem and (elem, message.event) not in user.handlers and \
+                    is_callable(getattr(elem, message.event, None)):
+                return elem, message
+
+    async def put(self, raw_message):
+        await self.slots.acquire()
+        self.pending += 1
+        if lane := self.fast_lane(raw_message):
+            task = asyncio.create_task(self.read(*lane))
+            self.readers.add(task)
+            task.add_done_callback(self.readers.discard)
+        else:
+            self.queue.put_nowait(raw_message)
+
+    async def run(self):
+        while True:
+            raw_message = await self.queue.get()
+            try:
+                await self.process(self.user, raw_message)
+            except Exception:
+                self.user.log(traceback.format_exc())
+            finally:
+                self.done()
+
+    async def read(self, elem, message):
+        user = self.user
+        self.active(user)
+        try:
+            answer = await user.process_element(elem, message)
+            #sent as is: prepare_result would flush changed_units of a handler in flight
+            text = toJson(answer)
+            await user.send(text)
+            if recorder.record_file:
+                recorder.accept(message, answer)
+            if user.reflections:
+                await user.broadcast(text)
+        except Exception:
+            user.log(traceback.format_exc())
+            await user.send(toJson(Error('The message can not be processed!')))
+        finally:
+            self.active(user)
+            self.done()
+
+    @staticmethod
+    def active(user):
+        """a fast lane message is activity for config.hibernate as well,
+        None is kept: the ordered lane is processing a message"""
+        if user.last_activity is not None:
+            user.last_activity = time.monotonic()
+
+    def done(self):
+        self.pending -= 1
+        self.slots.release()
+
+    async def close(self):
+        """stop processing, the connection is gone"""
+        tasks = [self.worker, *self.readers]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions = True)
@@ -0,0 +1,130 @@
+# Copyright © 2024 UNISI Tech. All rights reserved.
+"""
+Opt-in background screen prefetching, see config.prefetch.
+
+A session compiles its first screen when it connects, every other screen on
+the first visit to it, while the client waits. A Prefetcher compiles the
+screens a session is likely to visit next in the default executor, after the
+response has been sent:
+
+  * the next screens are predicted from the navigation statistics of all
+    sessions (which screen was visited after the current one, most often
+    first), then in screen_registry order;
+  * a prefetched screen waits in user.prefetched until ensure_screen takes it;
+  * the thread compiling a screen does not change the session: the blocks
+    modules it imports and the handlers it registers go to a Stage, merged
+    on the event loop (ModulesMixin.stage_screen/take_stage), so the event
+    loop never waits for it. A screen whose blocks modules the session has
+    imported meanwhile is dropped, the session compiles it on the visit;
+  * the screens waiting there take at most `budget` bytes per session,
+    measured by footprint(). A screen which does not fit waits for taken
+    screens to free the budget, one larger than the whole budget (or failing
+    to compile) is not prefetched for the session at all.
+"""
+import asyncio, sys, traceback
+from collections import Counter, defaultdict
+from types import FunctionType, MethodType, ModuleType
+from .modules import Stage
+from .units import ChangedProxy, Unit
+from .utils import divpath
+
+def screen_file(module) -> str:
+    return module.__file__.split(divpath)[-1] if module else None
+
+def footprint(obj, seen = None) -> int:
+    """bytes taken by obj and the containers and units it holds"""
+    if seen is None:
+        seen = set()
+    key = id(obj)
+    if key in seen or isinstance(obj, (type, ModuleType, FunctionType, MethodType)):
+        return 0
+    seen.add(key)
+    size = sys.getsizeof(obj)
+    if isinstance(obj, ChangedProxy):
+        size += footprint(obj._obj, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(footprint(item, seen) for item in obj)
+    elif isinstance(obj, dict):
+        size += sum(footprint(name, seen) + footprint(value, seen) for name, value in obj.items())
+    elif isinstance(obj, Unit):
+        state = obj.__dict__
+        seen.add(id(state))
+        size += sys.getsizeof(state) + sum(footprint(value, seen)
+            for name, value in state.items() if name not in ('_user', '_template'))
+    return size
+
+class Prefetcher:
+    # screen file -> Counter of the screen files visited right after it, all sessions
+    transitions = defaultdict(Counter)
+    # screen file -> footprint of its screen when it was last prefetched
+    sizes = {}
+
+    def __init__(self, user, budget):
+        self.user = user
+        self.budget = budget
+        self.used = 0
+        # screen file -> footprint of its module waiting in user.prefetched
+        self.waiting = {}
+        self.skipped = set()
+        self.current = screen_file(user.screen_module)
+        self.task = None
+        self.stats = dict(prefetched = 0, taken = 0, skipped = 0)
+
+    def predict(self) -> list:
+        """screen files to compile, the most likely next first"""
+        user = self.user
+        loaded = {screen_file(module) for module in user.screens}
+        likely = [file for file, _ in self.transitions[self.current].most_common()]
+        files = likely + [info.file for info in user.screen_registry]
+        return [file for file in dict.fromkeys(files)
+            if file not in loaded and file not in user.prefetched and file not in self.skipped]
+
+    def schedule(self):
+        """note the navigation since the last call and prefetch what is predicted,
+        called after a response is sent"""
+        file = screen_file(self.user.screen_module)
+        if file != self.current:
+            if self.current:
+                self.transitions[self.current][file] += 1
+            self.current = file
+        for file in [file for file in self.waiting if file not in self.user.prefetched]:
+            self.used -= self.waiting.pop(file)
+            self.stats['taken'] += 1
+        if (self.task is None or self.task.done()) and (files := self.predict()):
+            self.task = asyncio.create_task(self.run(files))
+
+    async def run(self, files):
+        loop = asyncio.get_running_loop()
+        user = self.user
+        for file in files:
+            if self.used + self.sizes.get(file, 0) > self.budget:
+                continue #until prefetched screens are taken
+            stage = Stage(user)
+            try:
+                module = await loop.run_in_executor(None, user.stage_screen, file, stage)
+                if user.hibernated:
+                    return
+                if file in user.prefetched or file in {screen_file(loaded) for loaded in user.screens}:
+                    continue
+                module = user.take_stage(file, module, stage)
+            except Exception:
+                user.log(traceback.format_exc())
+                self.skipped.add(file)
+                continue
+            if module is None:
+                continue
+            size = self.sizes[file] = footprint(module.screen)
+            if size > self.budget:
+                self.skipped.add(file)
+            if self.used + size > self.budget:
+                self.stats['skipped'] += 1
+            else:
+                user.prefetched[file] = module
+                self.waiting[file] = size
+                self.used += size
+                self.stats['prefetched'] += 1
+
+    def close(self):
+        if self.task:
+            self.task.cancel()
+        self.user.prefetched.clear()
@@ -42,14 +42,14 @@ class Proxy:
         addr_port = f'{addr_port}{"" if addr_port.endswith("/") else "/"}{ws_path}'
         self.host_port = f'{"https" if ssl else "http"}://{host_port}'
 
-        # Build query string: session token and/or initial screen name
-        params = []
+        # Build query string: session token and/or initial screen name;
+        # update() merges data into elements, so updates may carry only changed properties
+        params = ['delta']
         if session:
             params.append(session)
         if screen:
             params.append(f'screen={quote(screen, safe="")}')
-        if params:
-            addr_port = f'{addr_port}?{"&".join(params)}'
+        addr_port = f'{addr_port}?{"&".join(params)}'
 
         self.conn = create_connection(addr_port, timeout=timeout)
         self.screen = None
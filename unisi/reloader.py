@@ -11,6 +11,8 @@ else:
     from .users import User, Redesign, empty_app
     from .utils import blocks_dir, divpath, app_dir, screens_dir
     from .autotest import check_module
+    from . import templates
+    from .modules import compiled
     import re, collections
 
     #for removing message duplicates        
@@ -21,6 +23,11 @@ else:
     request_file = None
     request_dependency_changed = False
 
+    def drop_block(user, name):
+        """forget the blocks module of the file `name` and its compiled code"""
+        user._drop_private_module(f'{blocks_dir}.{name[:-3]}')
+        compiled.pop(f'{blocks_dir}{divpath}{name}', None) #an edit within the mtime resolution keeps the size too
+
     def free():
         global busy
         if request_file:
@@ -31,17 +38,21 @@ else:
     def reload(sname, changed_dependency = False):
         user = User.last_user
         if user:
-            file = open(f'{screens_dir}{divpath}{sname}', "r")
+            path = f'{screens_dir}{divpath}{sname}'
+            file = open(path, "r")
             content = file.read()
             if not changed_dependency and file_content[sname] == content:
                 return
             file_content[sname] = content
+            compiled.pop(path, None) #an edit within the mtime resolution keeps the size too
+            templates.clear() #shared screen templates are rebuilt from the changed files
             
             global busy, request_file, request_dependency_changed
             busy = True
             request_file = None
             request_dependency_changed = False
 
+            user.prefetched.clear() #compiled from the former files
             try:
                 module = user.load_screen(sname)
                 errors = check_module(module)                                
@@ -113,7 +124,7 @@ else:
 
                 if dir in [screens_dir, blocks_dir]:
                     if dir == blocks_dir:
-                        user._drop_private_module(f'{blocks_dir}.{name[:-3]}')
+                        drop_block(user, name)
                         #a block is a dependency of the current screen: force reload
                         #even though the screen file itself did not change
                         changed_dependency = True
@@ -183,7 +194,7 @@ else:
                             break
                     user.update_menu()
                 elif name.endswith('.py') and dir == blocks_dir:
-                    user._drop_private_module(f'{blocks_dir}.{name[:-3]}')
+                    drop_block(user, name)
                     if user.screen_module:
                         reload(user.screen_module.__file__.split(divpath)[-1], True)
 
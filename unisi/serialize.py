@@ -0,0 +1,148 @@
+# Copyright © 2024 UNISI Tech. All rights reserved.
+"""
+Wire serializer: screens, Messages and Units -> the JSON text sent to clients.
+
+Replaces ``jsonpickle.encode(obj, unpicklable=False)``, which re-inspects every
+object reflectively on every call. Here each class is resolved to an encoder
+once, on first sight, and cached in ``_encoders``:
+
+  * an encoder registered with ``register_encoder(cls, encoder)`` -- also used
+    by subclasses, as long as they don't override ``__getstate__``;
+  * otherwise a generic one honouring the class's own ``__getstate__``;
+  * otherwise the instance ``__dict__``.
+
+The output is the same JSON shape jsonpickle produced for UNISI objects:
+tuples/sets become lists, dates become ISO strings, functions and a reference
+cycle become ``null``. When ``orjson`` is installed it is used for the final text encoding.
+"""
+import base64, json
+from collections import deque
+from datetime import date, datetime, time
+from decimal import Decimal
+from enum import Enum
+from types import ModuleType
+from uuid import UUID
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+scalar_types = frozenset((str, int, float, bool, type(None)))
+
+# class -> encoder(obj, active) -> JSON-ready value; filled lazily by _resolve
+_encoders: dict = {}
+# explicitly registered encoders, consulted by _resolve along the class MRO
+_registered: dict = {}
+
+def register_encoder(cls, encoder):
+    """encoder(obj, active) has to return a JSON-ready value, calling
+    to_plain(value, active) for nested values it does not handle itself."""
+    _registered[cls] = encoder
+    _encoders.clear()
+
+def to_plain(obj, active = None):
+    """Convert obj to nested dicts/lists/scalars ready for a JSON encoder."""
+    cls = type(obj)
+    if cls in scalar_types:
+        return obj
+    encoder = _encoders.get(cls) or _resolve(cls)
+    if active is None:
+        active = set()
+    key = id(obj)
+    if key in active: #reference cycle, jsonpickle also emits null here
+        return None
+    active.add(key)
+    result = encoder(obj, active)
+    active.discard(key)
+    return result
+
+def encode_list(lst, active):
+    return [v if type(v) in scalar_types else to_plain(v, active) for v in lst]
+
+def encode_dict(dct, active):
+    result = {}
+    for k, v in dct.items():
+        if type(k) not in scalar_types:
+            k = repr(k)
+        result[k] = v if type(v) in scalar_types else to_plain(v, active)
+    return result
+
+def encode_vars(obj, active):
+    return encode_dict(obj.__dict__, active)
+
+def encode_state(obj, active):
+    return to_plain(obj.__getstate__(), active)
+
+def encode_slots(obj, active):
+    return {name: to_plain(getattr(obj, name), active) for cls in type(obj).__mro__
+        for name in getattr(cls, '__slots__', ()) if hasattr(obj, name)}
+
+def _encode_callable(obj, active):
+    return None
+
+def _encode_other(obj, active):
+    try:
+        return encode_list(obj, active)
+    except TypeError:
+        return str(obj)
+
+_builtin_encoders = {
+    list: encode_list,
+    tuple: encode_list,
+    set: encode_list,
+    frozenset: encode_list,
+    deque: encode_list,
+    dict: encode_dict,
+    datetime: lambda obj, _: obj.isoformat(),
+    date: lambda obj, _: obj.isoformat(),
+    time: lambda obj, _: obj.isoformat(),
+    Decimal: lambda obj, _: str(obj),
+    UUID: lambda obj, _: str(obj),
+    bytes: lambda obj, _: base64.b64encode(obj).decode(),
+    ModuleType: lambda obj, _: repr(obj), #as jsonpickle, not the module namespace
+}
+
+_object_getstate = getattr(object, '__getstate__', None)
+
+def _resolve(cls):
+    getstate = getattr(cls, '__getstate__', None)
+    for base in cls.__mro__:
+        if base in _registered and getattr(base, '__getstate__', None) is getstate:
+            encoder = _registered[base]
+            break
+        if base in _builtin_encoders:
+            encoder = _builtin_encoders[base]
+            break
+    else:
+        if issubclass(cls, str | int | float):
+            encoder = lambda obj, _: obj
+        elif issubclass(cls, Enum):
+            encoder = lambda obj, active: to_plain(obj.value, active)
+        elif any('__call__' in vars(base) for base in cls.__mro__):
+            encoder = _encode_callable
+        elif getstate is not None and getstate is not _object_getstate:
+            encoder = encode_state
+        elif cls.__dictoffset__:
+            encoder = encode_vars
+        elif any(getattr(base, '__slots__', None) for base in cls.__mro__):
+            encoder = encode_slots
+        else:
+            encoder = _encode_other
+    _encoders[cls] = encoder
+    return encoder
+
+if orjson:
+    _orjson_option = orjson.OPT_NON_STR_KEYS
+
+    def dumps(plain) -> str:
+        try:
+            return orjson.dumps(plain, option = _orjson_option).decode()
+        except (orjson.JSONEncodeError, TypeError): #e.g. int over 64 bits
+            return json.dumps(plain)
+else:
+    def dumps(plain) -> str:
+        return json.dumps(plain)
+
+def to_json(obj) -> str:
+    return dumps(to_plain(obj))
@@ -8,7 +8,12 @@ from .common import  *
 from .llmrag import setup_llmrag
 from .dbunits import dbupdates
 from .db import db 
-import traceback, json, random, string
+from .pipeline import Pipeline
+from .prefetch import Prefetcher
+from .outbox import Outbox
+from .compression import Compression
+from . import workers
+import asyncio, traceback, json, random, string
 from urllib.parse import parse_qs
 import config
 
@@ -39,7 +44,17 @@ User.type = User
 if db:
     Unishare.db = db
 
-def make_user(request):    
+async def new_user(session, screen):
+    """a session without a share, only its first screen is compiled in a thread:
+    screens of connecting sessions are compiled in parallel, see ModulesMixin.import_block"""
+    user = User.type(session, screen = screen, load = False)
+    if not (config.hibernate and not user.testing and user.wake(screen)):
+        if file := user.first_screen_file(screen):
+            module = await asyncio.get_running_loop().run_in_executor(None, user.load_screen, file)
+            user.show_first_screen(module)
+    return user
+
+async def make_user(request):    
     parsed_query = parse_qs(request.query_string)
     requested_screen = parsed_query.get('screen', [None])[0]
     if 'session' in parsed_query:
@@ -59,20 +74,25 @@ def make_user(request):
             with logging_lock:
                 logging.error(error)
             return None, Error(error)
+        if user.hibernated:
+            user.wake()
         user = User.type(session, user, screen=requested_screen)
         ok = user.screens
     elif config.mirror and User.count:
+        if User.last_user.hibernated:
+            User.last_user.wake()
         user = User.type(session, User.last_user, screen=requested_screen)
         ok = user.screens
     else:
-        user = User.type(session, screen=requested_screen)
+        user = await new_user(session, requested_screen)
         ok = user.screens
     User.count += 1
     Unishare.sessions[session] = user 
     return user, ok
 
 def handle(unit, event):
-    handler_map = User.last_user.handlers        
+    #the user whose screen module is being executed, screens of sessions are loaded in parallel
+    handler_map = (context_user() or User.last_user).handlers        
     def h(fn):
         key = unit, event        
         func = handler_map.get(key, None)        
@@ -140,55 +160,107 @@ async def static_serve(request: web.Request) -> web.StreamResponse:
 
     return web.HTTPNotFound()
      
+async def process_message(user, raw_message):
+    """handle a client message, a failing one is logged and answered with an
+    Error: the connection goes on, with config.pipeline or without"""
+    try:
+        await answer_message(user, raw_message)
+    except Exception:
+        user.log(traceback.format_exc())
+        await user.send(Error('The message can not be processed!'))
+    if dbupdates:
+        workers.publish_dbupdates()
+        await user.sync_dbupdates()
+
+async def answer_message(user, raw_message):
+    message = None
+    if isinstance(raw_message, list):
+        if raw_message:
+            for raw_submessage in raw_message:
+                message = ReceivedMessage(raw_submessage)                    
+                result = await user.result4message(message)
+        else:                                
+            result = Warning('Empty command batch!')
+    else:                    
+        message = ReceivedMessage(raw_message)            
+        result = await user.result4message(message)                    
+    await user.send(result)
+    if message:
+        if recorder.record_file:
+            # persist=False: result was already persisted by send(result)
+            # above; this only re-serializes the same, already-sent
+            # response for the recorder's own fixture capture.
+            recorder.accept(message, user.prepare_result(result, persist=False))
+        # persist=False: same reason -- changed_units/touched_units are
+        # already drained by send(result), so a real persist pass here
+        # would just be recomputing keyed-persist keys against nothing.
+        await user.reflect(message, result, persist=False)     
+     
+hibernation_task = None
+dbbus_task = None
+
 async def websocket_handler(request):
-    ws = web.WebSocketResponse()
+    global hibernation_task, dbbus_task
+    if config.hibernate and hibernation_task is None:
+        hibernation_task = asyncio.create_task(hibernation(config.hibernate))
+    if config.dbbus and dbbus_task is None:
+        dbbus_task = asyncio.create_task(dbbus_polling(config.dbbus))
+    if (worker := workers.owner(request)) is not None: #the session lives in another worker
+        return await workers.relay(request, worker)
+    ws = web.WebSocketResponse(compress = config.compress is not False)
     await ws.prepare(request)    
-    user, status = make_user(request)
+    user, status = await make_user(request)
     if not user:
         await ws.send_str(toJson(status))
     else:
+        send_str = Compression(ws, 0 if config.compress is True else config.compress).send_str \
+            if config.compress is not False else ws.send_str
+        outbox = Outbox(send_str, config.outbox) if config.outbox else None
+        if 'reuse' in request.query: #the client keeps blocks of screens it got
+            user.sent_blocks = {}
+        if 'delta' in request.query: #the client merges updates into the units it has
+            user.delta_updates = True
         async def send(res, persist=True):
             try:
                 if type(res) != str:
-                    res = toJson(user.prepare_result(res, persist=persist))        
-                await ws.send_str(res)
+                    res = user.prepare_result(res, persist=persist)
+                    if user.sent_blocks is not None and isinstance(res, Screen):
+                        res = user.encode_screen(res)
+                if outbox:
+                    await outbox.put(res)
+                    return
+                if type(res) != str:
+                    res = toJson(res)
+            except Exception: #a result which can not be sent, the session goes on
+                user.log(traceback.format_exc())
+                res = toJson(Error('The result can not be sent to the client!'))
+                if outbox:
+                    await outbox.put(res)
+                    return
+            try:
+                await send_str(res)
             except:
                 pass   
 
         user.send = send         
+        workers.publish('session', session = user.session, live = True)
+        pipeline = Pipeline(user, process_message, config.pipeline) if config.pipeline else None
+        prefetcher = Prefetcher(user, config.prefetch) if config.prefetch and status else None
 
         await send(True if status else empty_app) 
+        if prefetcher:
+            prefetcher.schedule()
         try:
             async for msg in ws:
                 if msg.type == WSMsgType.TEXT:
                     if msg.data == 'close':
                         await ws.close()
+                    elif pipeline:
+                        await pipeline.put(json.loads(msg.data))
                     else:
-                        raw_message = json.loads(msg.data)
-                        message = None
-                        if isinstance(raw_message, list):
-                            if raw_message:
-                                for raw_submessage in raw_message:
-                                    message = ReceivedMessage(raw_submessage)                    
-                                    result = await user.result4message(message)
-                            else:                                
-                                result = Warning('Empty command batch!')
-                        else:                    
-                            message = ReceivedMessage(raw_message)            
-                            result = await user.result4message(message)                    
-                        await send(result)
-                        if message:
-                            if recorder.record_file:
-                                # persist=False: result was already persisted by send(result)
-                                # above; this only re-serializes the same, already-sent
-                                # response for the recorder's own fixture capture.
-                                recorder.accept(message, user.prepare_result(result, persist=False))
-                            # persist=False: same reason -- changed_units/touched_units are
-                            # already drained by send(result), so a real persist pass here
-                            # would just be recomputing keyed-persist keys against nothing.
-                            await user.reflect(message, result, persist=False)     
-                        if dbupdates:
-                            await user.sync_dbupdates()                       
+                        await process_message(user, json.loads(msg.data))
+                    if prefetcher:
+                        prefetcher.schedule()
                 elif msg.type == WSMsgType.ERROR:
                     user.log('ws connection closed with exception %s' % ws.exception())
         except ConnectionResetError:
@@ -196,7 +268,14 @@ async def websocket_handler(request):
         except Exception as e:
             user.log(traceback.format_exc())
         finally:
+            if pipeline:
+                await pipeline.close()
+            if outbox:
+                outbox.close()
+            if prefetcher:
+                prefetcher.close()
             await user.delete()
+            workers.publish('session', session = user.session, live = False)
     return ws     
 
 def ensure_directory_exists(directory_path):
@@ -239,4 +318,7 @@ def start(user_type = User, http_handlers = []):
 
     app = web.Application()
     app.add_routes(server_handlers)    
-    web.run_app(app, port = config.port)
\ No newline at end of file
+    if config.workers > 1:
+        workers.serve(app, config.port, config.workers)
+    else:
+        web.run_app(app, port = config.port)
\ No newline at end of file
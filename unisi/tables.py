@@ -5,75 +5,94 @@ from .dbunits import Dblist, dbupdates
 from .llmrag import get_property
 import asyncio
 from collections import OrderedDict
+from contextlib import nullcontext
 
 relation_mark = 'Ⓡ'
 exclude_mark = '✘'
 max_len_rows4llm = 30
 
-def get_chunk(obj, start_index):
-    delta, data = obj.rows.get_delta_chunk(start_index)
+async def get_chunk(obj, start_index):
+    rows = obj.rows
+    delta, data = await rows.aget_delta_chunk(start_index)
+    if delta >= 0:
+        rows.read_ahead(delta + rows.limit)
     return {'update': 'updates', 'index': delta, 'data': data}
 
-def accept_cell_value(table, dval: dict):            
-    value = dval['value']
+def cell_value(value):
     if not isinstance(value, bool):
         try:
             value = float(value)        
         except:
             pass            
+    return value
+
+def accept_cell_value(table, dval: dict):            
+    value = cell_value(dval['value'])
     if hasattr(table,'id'):
         dval['value'] = value
         if update := table.rows.update_cell(**dval):
             update['exclude'] = True       
     else:        
         table.rows[dval['delta']][dval['cell']] = value    
+
+async def accept_db_cell_value(table, dval: dict):
+    """accept_cell_value of a persistent table, written off the event loop"""
+    dval['value'] = cell_value(dval['value'])
+    if update := await table.rows.aupdate_cell(**dval):
+        update['exclude'] = True
             
+def transaction(table):
+    """the database transaction of a row handler of a persistent table"""
+    return table.rows.dbtable.db.transaction() if getattr(table, 'id', None) else nullcontext()
+
 def delete_table_row(table, value):    
     if value is not None and value != []:
-        if hasattr(table, 'link') and table.filter:
-            link_table, rel_props, rel_name = table.rows.link
-            if not isinstance(value, list):                                
-                value = [value]
-            if rel_name is None:
-                # many-to-one: clear link_id on the row
-                for index in value:
-                    table.rows.dbtable.clear_fk(table.rows[index][-1])
-                table.__link_table_selection_changed__(link_table, link_table.value)
-            else:
-                # many-to-many: delete junction rows
-                link_ids = [table.rows[index][-1] for index in value]
-                table.rows.dbtable.delete_links(link_table.id, link_ids=link_ids, index_name=rel_name)
-                table.__link_table_selection_changed__(link_table, link_table.value)
-            return table
-        elif isinstance(value, list):                    
-            value.sort(reverse = True)
-            for v in value:            
-                del table.rows[v]
-            table.value = []
-        else:            
-            del table.rows[value]  
-            table.value = None    
+        with transaction(table):
+            if hasattr(table, 'link') and table.filter:
+                link_table, rel_props, rel_name = table.rows.link
+                if not isinstance(value, list):                                
+                    value = [value]
+                if rel_name is None:
+                    # many-to-one: clear link_id on the row
+                    for index in value:
+                        table.rows.dbtable.clear_fk(table.rows[index][-1])
+                    table.__link_table_selection_changed__(link_table, link_table.value)
+                else:
+                    # many-to-many: delete junction rows
+                    link_ids = [table.rows[index][-1] for index in value]
+                    table.rows.dbtable.delete_links(link_table.id, link_ids=link_ids, index_name=rel_name)
+                    table.__link_table_selection_changed__(link_table, link_table.value)
+                return table
+            elif isinstance(value, list):                    
+                value.sort(reverse = True)
+                for v in value:            
+                    del table.rows[v]
+                table.value = []
+            else:            
+                del table.rows[value]  
+                table.value = None    
 
 def append_table_row(table, search_str = ''):
     ''' append has to return new row, value is the search string value in the table'''    
     new_row = [None] * len(table.headers)           
     if getattr(table,'id', None):          
-        new_row = table.rows.append(new_row)        
-        if hasattr(table, 'link') and table.filter:
-            link_table, _, rel_name = table.rows.link
-            for linked_idx in link_table.selected_list:
-                master_id = link_table.rows[linked_idx][-1]
-                if rel_name is None:
-                    # many-to-one: stamp link_id on the new row
-                    table.rows.dbtable.set_fk(new_row[-1], master_id)
-                    new_row[table.rows.dbtable.node_columns.index(table.rows.dbtable.LINK_ID)] = master_id
-                else:
-                    # many-to-many: insert junction row
-                    relation = table.rows.dbtable.add_link(
-                        new_row[-1], link_table.id, master_id, link_index_name=rel_name)
-                    if relation:
-                        new_row.extend(relation)
-                break      
+        with transaction(table):
+            new_row = table.rows.append(new_row)        
+            if hasattr(table, 'link') and table.filter:
+                link_table, _, rel_name = table.rows.link
+                for linked_idx in link_table.selected_list:
+                    master_id = link_table.rows[linked_idx][-1]
+                    if rel_name is None:
+                        # many-to-one: stamp link_id on the new row
+                        table.rows.dbtable.set_fk(new_row[-1], master_id)
+                        new_row[table.rows.dbtable.node_columns.index(table.rows.dbtable.LINK_ID)] = master_id
+                    else:
+                        # many-to-many: insert junction row
+                        relation = table.rows.dbtable.add_link(
+                            new_row[-1], link_table.id, master_id, link_index_name=rel_name)
+                        if relation:
+                            new_row.extend(relation)
+                    break      
     else:           
         table.rows.append(new_row)
     return new_row
@@ -186,14 +205,14 @@ class Table(Unit):
                                 return Warning('The linked table is not in edit mode', self)
                     return self.accept(new_value)    
             @Unishare.handle(self,'search')
-            def search_changed(table, value):
+            async def search_changed(table, value):
                 table.search = value
                 if has_link:
                     link_table_selection_changed(link_table, link_table.value, True)
                 else:
                     dbtable = table.rows.dbtable
                     if value:
-                        table.rows = dbtable.search_rows(value)
+                        table.rows = await dbtable.asearch_rows(value)
                     else:
                         dbtable.init_list()
                         table.rows = dbtable.list
@@ -205,7 +224,8 @@ class Table(Unit):
             raise ValueError("Only persistent tables can have 'ids' option!")
 
         if getattr(self,'edit', True): 
-            set_defaults(self,{'delete': delete_table_row, 'append': append_table_row, 'modify': accept_cell_value})   
+            set_defaults(self,{'delete': delete_table_row, 'append': append_table_row, 
+                'modify': accept_db_cell_value if hasattr(self, 'id') else accept_cell_value})   
 
     @property
     def compact_view(self) -> str:
@@ -0,0 +1,250 @@
+# Copyright © 2024 UNISI Tech. All rights reserved.
+"""
+Shared screen templates, see config.shared_screens.
+
+Normally every session executes the screen modules itself and gets its own
+tree of units. With shared screens a screen module is executed once, into a
+template, and every session loading it gets a copy-on-write copy:
+
+  * the module namespace is copied: functions defined in the screen (and in
+    the blocks modules it uses) are rebound to the session copy, lists, dicts
+    and sets are copied, units are replaced by empty session units;
+  * a session unit takes a property over from its template unit on first
+    access. Properties never accessed stay shared, a screen sent to a client
+    reads them from the template;
+  * other objects (a Dblist, a database) are shared by all sessions, unless
+    they refer to units or screen functions, then they are copied too.
+
+A screen module body runs once, for the first session loading the screen, so
+it must not depend on the session: `user` there is that first user, handlers
+get their own session's `user`. Classes defined in a screen module keep the
+template globals. Hot reload clears the templates.
+"""
+import copy
+import threading
+from functools import partial
+from itertools import islice
+from types import BuiltinFunctionType, CellType, FunctionType, MethodType, ModuleType
+from . import units
+from .units import Unit, atomics
+
+immutable_types = frozenset((str, int, float, complex, bool, bytes, type(None), range, BuiltinFunctionType))
+
+# held while a template is built, the first session loading a screen builds it
+lock = threading.Lock()
+# screen file -> ScreenTemplate
+screens = {}
+# blocks module name -> template module, shared by the screen templates
+blocks = {}
+# bumped by clear(), session copies of an older generation are dropped
+generation = 0
+
+# id(namespace dict) -> template module
+_namespaces = {}
+# id(user) of the users the templates were executed with
+_builders = {}
+# id(template object) -> it refers to units, screen functions or a builder user
+_refers = {}
+
+class ScreenTemplate:
+    def __init__(self, module, code, handlers: dict):
+        self.module = module
+        self.code = code
+        self.handlers = handlers
+
+def add(file, module, code, modules: dict, handlers: dict, builder) -> ScreenTemplate:
+    """register the template of screen file executed from code, modules are the
+    blocks modules loaded for it, handlers those registered by Unishare.handle"""
+    _builders[id(builder)] = builder
+    blocks.update(modules)
+    for template in (module, *modules.values()):
+        _namespaces[id(template.__dict__)] = template
+    template = screens[file] = ScreenTemplate(module, code, handlers)
+    return template
+
+def clear():
+    global generation
+    generation += 1
+    for registry in (screens, blocks, _namespaces, _builders, _refers):
+        registry.clear()
+
+def refers(value) -> bool:
+    """value is or contains a unit, a screen function or a builder user,
+    so it has to be copied for a session"""
+    cls = type(value)
+    if cls in immutable_types or cls is type:
+        return False
+    key = id(value)
+    known = _refers.get(key)
+    if known is not None:
+        return known
+    _refers[key] = True #a reference cycle is copied
+    if isinstance(value, Unit) or key in _builders:
+        result = True
+    elif cls is ModuleType:
+        result = id(value.__dict__) in _namespaces
+    elif cls is FunctionType:
+        result = id(value.__globals__) in _namespaces or\
+            any(refers(cell.cell_contents) for cell in value.__closure__ or () if cell_filled(cell)) or\
+            refers(value.__defaults__) or refers(value.__kwdefaults__)
+    elif cls is MethodType:
+        result = refers(value.__func__) or refers(value.__self__)
+    elif cls is partial:
+        result = refers(value.func) or refers(value.args) or refers(value.keywords)
+    elif cls in (list, tuple, set, frozenset):
+        result = any(refers(item) for item in value)
+    elif cls is dict:
+        result = any(refers(k) or refers(v) for k, v in value.items())
+    else:
+        state = getattr(value, '__dict__', None)
+        result = type(state) is dict and refers(state)
+    _refers[key] = result
+    return result
+
+def cell_filled(cell) -> bool:
+    try:
+        cell.cell_contents
+    except ValueError:
+        return False
+    return True
+
+def session_copy(user):
+    """the SessionCopy of user for the current templates"""
+    copier = getattr(user, '_screen_copy', None)
+    if copier is None or copier.generation != generation:
+        copier = user._screen_copy = SessionCopy(user)
+    return copier
+
+class SessionCopy:
+    """copies of template objects for one session"""
+    def __init__(self, user):
+        self.user = user
+        self.generation = generation
+        # id(template object) -> its session copy
+        self.memo = {}
+        # id(screen template) -> memo keys of its copy
+        self.screens = {}
+
+    def screen(self, template: ScreenTemplate):
+        """session copy of a screen template module and of all blocks modules,
+        they are the blocks modules of the user"""
+        for block in list(blocks.values()):
+            self.module(block)
+        memo = self.memo
+        for key in self.screens.pop(id(template), ()): #loaded again: a fresh copy
+            memo.pop(key, None)
+        start = len(memo)
+        module = self.module(template.module)
+        for (unit, event), handler in template.handlers.items():
+            self.user.handlers[self.own(unit), event] = self.own(handler)
+        self.screens[id(template)] = list(islice(memo, start, None))
+        return module
+
+    def module(self, template):
+        memo = self.memo
+        module = memo.get(id(template))
+        if module is None:
+            for key in _builders:
+                memo[key] = self.user
+            module = memo[id(template)] = ModuleType(template.__name__)
+            namespace = memo[id(template.__dict__)] = module.__dict__
+            for name, value in template.__dict__.items():
+                namespace[name] = value if name[:2] == '__' else self.own(value)
+            if template.__name__ in blocks:
+                self.user.modules[template.__name__] = module
+        return module
+
+    def own(self, value):
+        """the session copy of a template value"""
+        cls = type(value)
+        if cls in immutable_types:
+            return value
+        key = id(value)
+        memo = self.memo
+        if key in memo:
+            return memo[key]
+        if cls is list:
+            result = memo[key] = []
+            result.extend(self.own(item) for item in value)
+        elif cls is dict:
+            result = memo[key] = {}
+            for name, item in value.items():
+                result[self.own(name)] = self.own(item)
+        elif cls is set:
+            result = memo[key] = set()
+            result.update(self.own(item) for item in value)
+        elif not refers(value):
+            return value
+        elif isinstance(value, Unit):
+            result = memo[key] = object.__new__(cls)
+            object.__setattr__(result, '_mark_changed', None)
+            result.__dict__['_template'] = (value, self)
+        elif cls is ModuleType:
+            result = self.module(value)
+        elif cls is FunctionType:
+            result = self.function(value)
+        elif cls is MethodType:
+            result = memo[key] = MethodType(self.own(value.__func__), self.own(value.__self__))
+        elif cls is partial:
+            result = memo[key] = partial(self.own(value.func), *self.own(value.args), **self.own(value.keywords))
+        elif cls in (tuple, frozenset):
+            result = memo[key] = cls(self.own(item) for item in value)
+        else:
+            result = memo[key] = copy.copy(value)
+            state = result.__dict__
+            for name, item in state.items():
+                state[name] = self.own(item)
+        return result
+
+    def function(self, fn):
+        """fn rebound to the session copies of its module and closure"""
+        template = _namespaces.get(id(fn.__globals__))
+        namespace = self.module(template).__dict__ if template else fn.__globals__
+        cells = tuple(CellType() for _ in fn.__closure__ or ())
+        result = self.memo[id(fn)] = FunctionType(fn.__code__, namespace, fn.__name__, None, cells or None)
+        for cell, source in zip(cells, fn.__closure__ or ()):
+            if cell_filled(source):
+                cell.cell_contents = self.own(source.cell_contents)
+        result.__defaults__ = self.own(fn.__defaults__)
+        result.__kwdefaults__ = self.own(fn.__kwdefaults__)
+        result.__qualname__ = fn.__qualname__
+        result.__doc__ = fn.__doc__
+        result.__dict__.update(self.own(fn.__dict__))
+        return result
+
+    def take(self, unit, template, name):
+        """unit takes property name over from its template"""
+        value = self.own(template.__dict__[name])
+        if unit._mark_changed and name[0] != '_' and not callable(value) and not isinstance(value, atomics):
+            value = units.track(value, unit, name)
+        unit.__dict__[name] = value
+        return value
+
+    def vars(self, unit, template) -> dict:
+        """unit state in the template order, shared values are read from the template"""
+        own = unit.__dict__
+        state = {}
+        for name, value in template.__dict__.items():
+            if name in own:
+                state[name] = own[name]
+            elif type(value) in immutable_types:
+                state[name] = value
+            elif id(value) in self.memo:
+                state[name] = self.take(unit, template, name)
+            elif refers(value):
+                state[name] = self.take(unit, template, name)
+            else:
+                state[name] = value
+        for name, value in own.items():
+            if name not in state and name != '_template':
+                state[name] = value
+        return state
+
+    def detach(self, unit, template):
+        """unit takes over all its template properties and becomes a plain unit"""
+        state = self.vars(unit, template)
+        for name in template.__dict__:
+            if name not in unit.__dict__:
+                state[name] = self.take(unit, template, name)
+        unit.__dict__.clear()
+        unit.__dict__.update(state)
@@ -1,27 +1,30 @@
 # Copyright © 2024 UNISI Tech. All rights reserved.
 from .common import *
 from .llmrag import get_property
+from .serialize import register_encoder, scalar_types, to_plain, encode_dict
 
 class ChangedProxy:
     MODIFYING_METHODS = {
         'append', 'extend', 'insert', 'remove', 'pop', 'clear', 'sort', 'reverse',
         'update', 'popitem', 'setdefault', '__setitem__', '__delitem__'
     }
-    def __init__(self, obj, unit):
+    def __init__(self, obj, unit, prop = None):
+        """prop is the unit property holding obj, None if unknown"""
         self._obj = obj
         self._unit = unit
+        self._prop = prop
     
     def __getattribute__(self, name):        
-        if name == '_obj' or name == '_unit' or name == '__getstate__':
+        if name == '_obj' or name == '_unit' or name == '_prop' or name == '__getstate__':
             return super().__getattribute__(name)
         obj = super().__getattribute__('_obj')
         value = getattr(obj, name)  
         if isinstance(value, ChangedProxy):
             value = value._obj
         if name in ChangedProxy.MODIFYING_METHODS:
-            super().__getattribute__('_unit')._mark_changed()
+            super().__getattribute__('_unit')._mark_changed(None, None, super().__getattribute__('_prop'))
         elif not callable(value) and not isinstance(value, atomics):
-            return ChangedProxy(value, super().__getattribute__('_unit'))
+            return ChangedProxy(value, super().__getattribute__('_unit'), super().__getattribute__('_prop'))
         return value
     
     def __setattr__(self, name, value):                
@@ -29,16 +32,16 @@ class ChangedProxy:
             super().__setattr__(name, value)
         else:
             self._obj.__setattr__(name, value) 
-            self._unit._mark_changed()
+            self._unit._mark_changed(None, None, self._prop)
 
     def __setitem__(self, key, value):
         self._obj[key] = value
-        self._unit._mark_changed ()
+        self._unit._mark_changed(None, None, self._prop)
        
     def __getitem__(self, key):
         value = self._obj[key]    
         if not callable(value) and not isinstance(value, atomics):
-            value = ChangedProxy(value, self._unit)
+            value = ChangedProxy(value, self._unit, self._prop)
         return value
     
     def __eq__(self, other):
@@ -46,12 +49,12 @@ class ChangedProxy:
 
     def __delitem__(self, key):
         del self._obj[key]
-        self._unit._mark_changed ()
+        self._unit._mark_changed(None, None, self._prop)
 
     def __iter__(self):
         for item in self._obj:
             if not callable(item) and not isinstance(item, atomics):
-                item = ChangedProxy(item, self._unit)
+                item = ChangedProxy(item, self._unit, self._prop)
             yield item        
 
     def __len__(self):
@@ -73,8 +76,167 @@ class ChangedProxy:
     def __getstate__(self):     
         return self._obj
 
-           
+
+class ObservableList(list):
+    """list of a unit property that marks the unit changed on mutation, the
+    config.tracking = 'observable' alternative to ChangedProxy: reads and
+    iteration are plain list operations, nested lists and dicts are observable too"""
+    __slots__ = ('_unit', '_prop')
+
+    def __init__(self, iterable, unit, prop):
+        self._unit = unit
+        self._prop = prop
+        super().__init__(observe(item, unit, prop) for item in iterable)
+
+    def _changed(self):
+        self._unit._mark_changed(None, None, self._prop)
+
+    def __reduce_ex__(self, protocol): #copies are plain lists
+        return list, (list(self),)
+
+    def __setitem__(self, key, value):
+        if isinstance(key, slice):
+            value = [observe(item, self._unit, self._prop) for item in value]
+        else:
+            value = observe(value, self._unit, self._prop)
+        super().__setitem__(key, value)
+        self._changed()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._changed()
+
+    def __iadd__(self, other):
+        self.extend(other)
+        return self
+
+    def __imul__(self, n):
+        super().__imul__(n)
+        self._changed()
+        return self
+
+    def append(self, item):
+        super().append(observe(item, self._unit, self._prop))
+        self._changed()
+
+    def extend(self, items):
+        super().extend(observe(item, self._unit, self._prop) for item in items)
+        self._changed()
+
+    def insert(self, index, item):
+        super().insert(index, observe(item, self._unit, self._prop))
+        self._changed()
+
+    def remove(self, item):
+        super().remove(item)
+        self._changed()
+
+    def pop(self, index = -1):
+        item = super().pop(index)
+        self._changed()
+        return item
+
+    def clear(self):
+        super().clear()
+        self._changed()
+
+    def sort(self, *, key = None, reverse = False):
+        super().sort(key = key, reverse = reverse)
+        self._changed()
+
+    def reverse(self):
+        super().reverse()
+        self._changed()
+
+class ObservableDict(dict):
+    """dict counterpart of ObservableList"""
+    __slots__ = ('_unit', '_prop')
+
+    def __init__(self, mapping, unit, prop):
+        self._unit = unit
+        self._prop = prop
+        super().__init__((key, observe(value, unit, prop)) for key, value in mapping.items())
+
+    def _changed(self):
+        self._unit._mark_changed(None, None, self._prop)
+
+    def __reduce_ex__(self, protocol):
+        return dict, (dict(self),)
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, observe(value, self._unit, self._prop))
+        self._changed()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._changed()
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            super().__setitem__(key, observe(value, self._unit, self._prop))
+        self._changed()
+
+    def setdefault(self, key, default = None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, *args):
+        value = super().pop(*args)
+        self._changed()
+        return value
+
+    def popitem(self):
+        item = super().popitem()
+        self._changed()
+        return item
+
+    def clear(self):
+        super().clear()
+        self._changed()
+
+def proxy(value, unit, prop):
+    return ChangedProxy(value, unit, prop)
+
+def observe(value, unit, prop):
+    """value of unit.prop, a nested item of it, made to mark unit changed on mutation"""
+    match value:
+        case ObservableList() | ObservableDict():
+            return value
+        case list():
+            return ObservableList(value, unit, prop)
+        case dict():
+            return ObservableDict(value, unit, prop)
+        case _ if callable(value) or isinstance(value, atomics) or isinstance(value, tuple):
+            return value
+        case _:
+            return ChangedProxy(value, unit, prop)
+
+# wraps unit property values for change tracking, observe if config.tracking == 'observable'
+track = proxy
+
+class ChangeMarker:
+    """_mark_changed of a reactive unit, registers the unit changes with the user"""
+    __slots__ = ('unit', 'user')
+
+    def __init__(self, unit, user):
+        self.unit = unit
+        self.user = user
+
+    def __call__(self, property = None, value = None, part = None):
+        """part is the property changed inside by a ChangedProxy"""
+        unit = self.unit
+        if unit.specific_changed_register(property, value):
+            note_delta(unit, property or part)
+            self.user.register_changed_unit(unit, property, value)
+
 class Unit:    
+    #_mark_changed is kept out of the state dict, the rest stays in __dict__ in assignment order
+    __slots__ = ('_mark_changed', '__dict__', '__weakref__')
     action_list = set(['complete', 'update', 'changed','delete','append', 'modify'])
     def __init__(self, name, *args, **kwargs):                
         self._mark_changed =  None
@@ -94,12 +256,9 @@ class Unit:
         changed_call = self._mark_changed
         
         if not hasattr(self, 'id') and (override or not changed_call): 
-            self.__dict__.update({property : ChangedProxy(value, self)  for property, value in self.__dict__.items() 
+            self.__dict__.update({property : track(value, self, property)  for property, value in self.__dict__.items() 
                 if property[0] != '_' and not isinstance(value, atomics) and not callable(value)})                    
-                    
-            def changed_call(property = None, value = None):
-                if self.specific_changed_register(property, value):
-                    user.register_changed_unit(self, property, value)            
+            changed_call = ChangeMarker(self, user)
         super().__setattr__('_mark_changed', changed_call)                    
 
     def add(self, kwargs):              
@@ -111,17 +270,28 @@ class Unit:
         if name[0] != "_" and self._mark_changed:            
             self._mark_changed(name, value)
             if not callable(value) and not isinstance(value, atomics):
-                value = ChangedProxy(value, self)
+                value = track(value, self, name)
         super().__setattr__(name, value)        
 
+    def __getattr__(self, name):
+        """a unit of a shared screen takes a property over from its template on first access"""
+        link = self.__dict__.get('_template') if name[:2] != '__' else None
+        if link:
+            template, copy = link
+            if name in template.__dict__:
+                return copy.take(self, template, name)
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+    def __delattr__(self, name):
+        detach(self)
+        super().__delattr__(name)
+
     def mutate(self, obj):
         if self is not obj:
-            mark_changed = self._mark_changed
+            detach(obj)
             self.__dict__.clear()
-            super().__setattr__('_mark_changed', mark_changed)
             for key, value in obj.__dict__.items():
-                if key != '_mark_changed':
-                    setattr(self, key, value)
+                setattr(self, key, value)
             if self._mark_changed:
                 self._mark_changed()
     
@@ -173,7 +343,7 @@ class Unit:
         self.changed = compose_handlers(changed_handler, handler) 
     
     def __getstate__(self):         
-        state = {n: (True if n in Unit.action_list else v) for n, v in self.__dict__.items() if n[0] != '_'}
+        state = {n: (True if n in Unit.action_list else v) for n, v in unit_vars(self).items() if n[0] != '_'}
         return state
 
     def __str__(self):
@@ -182,7 +352,82 @@ class Unit:
     def __repr__(self):
         return f'{type(self).__name__}({self.name})'
     
-atomics = (int, float, complex, bool, str, bytes, ChangedProxy, type(None), Unit)
+atomics = (int, float, complex, bool, str, bytes, ChangedProxy, ObservableList, ObservableDict, type(None), Unit)
+
+def unit_vars(unit) -> dict:
+    """unit.__dict__, for a unit of a shared screen merged with the template
+    properties it has not taken over, see templates.py"""
+    state = unit.__dict__
+    if '_template' in state:
+        template, copy = state['_template']
+        return copy.vars(unit, template)
+    return state
+
+def detach(unit):
+    """a unit of a shared screen takes over all its template properties"""
+    if link := unit.__dict__.get('_template'):
+        template, copy = link
+        copy.detach(unit, template)
+
+def encode_unit(unit, active):
+    """wire encoder for Unit.__getstate__, without building the state dict first"""
+    actions = Unit.action_list
+    state = {}
+    for name, value in unit_vars(unit).items():
+        if name[0] != '_':
+            if name in actions:
+                state[name] = True
+            else:
+                state[name] = value if type(value) in scalar_types else to_plain(value, active)
+    return state
+
+register_encoder(Unit, encode_unit)
+
+def note_delta(unit, prop):
+    """remember that prop of unit changed since its last update was sent,
+    prop None means the unit can have changed as a whole"""
+    delta = unit.__dict__.get('_delta')
+    if prop is None:
+        unit.__dict__['_delta'] = True
+    elif delta is None:
+        unit.__dict__['_delta'] = {prop}
+    elif delta is not True:
+        delta.add(prop)
+
+def take_delta(unit):
+    """properties to send for unit instead of the whole unit, None for a full resend"""
+    delta = unit.__dict__.pop('_delta', None)
+    if delta is None or delta is True or getattr(unit, 'type', None) in ('block', 'screen'):
+        return None
+    state = unit.__dict__
+    return sorted(delta) if all(prop in state for prop in delta) else None
+
+def encode_delta(update, active):
+    """update carrying only update['delta'] properties of its unit"""
+    unit = update['data']
+    actions = Unit.action_list
+    data = {'name': unit.name}
+    for prop in update['delta']:
+        value = getattr(unit, prop)
+        data[prop] = True if prop in actions else value if type(value) in scalar_types else to_plain(value, active)
+    result = {name: to_plain(value, active) for name, value in update.items() if name != 'data'}
+    result['data'] = data
+    result['delta'] = True
+    return result
+
+def encode_message(message, active):
+    state = {}
+    for name, value in message.__dict__.items():
+        if name == 'updates':
+            value = [encode_delta(update, active) if 'delta' in update else encode_dict(update, active)
+                for update in value]
+        elif type(value) not in scalar_types:
+            value = to_plain(value, active)
+        state[name] = value
+    return state
+
+register_encoder(Message, encode_message)
+register_encoder(ChangedProxy, lambda proxy, active: to_plain(proxy._obj, active))
 
 Line = Unit("__Line__", type = 'line')
 
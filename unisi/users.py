@@ -6,9 +6,11 @@ from .voicecom import VoiceCom
 from .containers import Dialog
 from .multimon import notify_monitor, logging_lock, run_external_process
 from .dbunits import dbshare, dbupdates
+from . import dbbus
 from .persist import UserPersistMixin
 from .modules import ModulesMixin, screen_info_from_module
-import asyncio, logging
+from .serialize import to_plain, dumps
+import asyncio, logging, threading, time
 
 class User(ModulesMixin, UserPersistMixin):
     last_user = None
@@ -17,7 +19,7 @@ class User(ModulesMixin, UserPersistMixin):
     toolbar = []
     count = 0
 
-    def __init__(self, session: str, share = None, screen: str | None = None):
+    def __init__(self, session: str, share = None, screen: str | None = None, load = True):
         self.session = session
         self._init_persist()
         self.active_dialog = None
@@ -26,7 +28,21 @@ class User(ModulesMixin, UserPersistMixin):
         self.touched_units = set()
         self.voice = None
         self.screen_module = None
+        # {screen name: {block name: hash}} of screens sent to a client which
+        # accepts block reuse markers, None for a client which does not
+        self.sent_blocks = None
+        # the client applies updates carrying only changed properties, see _set_deltas
+        self.delta_updates = False
         self.modules = dict(getattr(share, 'modules', {})) if share else {}
+        # screen file -> module compiled in the background, see prefetch.py
+        self.prefetched = {}
+        # held while screens or blocks modules of the session are compiled and
+        # while they are read, the first screen is compiled in a thread
+        self.screen_lock = share.screen_lock if share else threading.RLock()
+        # the screens are saved to the session database and freed, see hibernate
+        self.hibernated = False
+        # monotonic time the last message was handled, None while one is handled
+        self.last_activity = time.monotonic()
         self._init_screen_registry()
 
         if share:
@@ -50,7 +66,7 @@ class User(ModulesMixin, UserPersistMixin):
         if share and screen:
             if selected := self.ensure_screen(screen):
                 self.screen_module = selected
-        elif not share:
+        elif load and not share and not (config.hibernate and not self.testing and self.wake(screen)):
             self.load_lazy(screen)
         self.monitor(session, share)
         if self.screen_module and not self.testing:
@@ -71,7 +87,9 @@ class User(ModulesMixin, UserPersistMixin):
         return self.changed_units
 
     def compile_screen(self, file):
-        module = super().compile_screen(file)
+        return self.setup_screen(super().compile_screen(file))
+
+    def setup_screen(self, module):
         if self.testing:
             from .autotest import check_module
             errors = check_module(module)
@@ -103,10 +121,9 @@ class User(ModulesMixin, UserPersistMixin):
     async def broadcast(self, message, persist=True):
         screen = self.screen_module
         if type(message) != str:
-            message = toJson(self.prepare_result(message, persist=persist))
-        await asyncio.gather(*[user.send(message)
-            for user in self.reflections
-                if user is not self and screen is user.screen_module])
+            message = self.prepare_result(message, persist=persist)
+        await fan_out([(message, [user for user in self.reflections
+            if user is not self and screen is user.screen_module])])
 
     async def reflect(self, message, result, persist=True):
         # message is None for an out-of-band reflect not tied to an incoming
@@ -131,6 +148,67 @@ class User(ModulesMixin, UserPersistMixin):
             if notify_monitor:
                 await notify_monitor('e', self.session, self.last_message)
 
+    @property
+    def can_hibernate(self) -> bool:
+        """a session sharing its screens with others (config.share, config.mirror) keeps them"""
+        return not self.hibernated and not self.reflections and bool(self.screens) and self._persist_enabled()
+
+    def hibernate(self):
+        """Save the state of the loaded screens to the session database and free
+        them with the modules of the session. The next message of the session,
+        or a new connection with its session id, wakes it up."""
+        if not self.can_hibernate or not self.screen_lock.acquire(blocking = False): #a screen is compiled
+            return False
+        try:
+            self._hibernate()
+        finally:
+            self.screen_lock.release()
+        return True
+
+    def _hibernate(self):
+        db = self._persist_db(create=True)
+        db.save_hibernated(self, self.screens, self.screen_module)
+        db.close()
+        self.db = None
+        if self.voice:
+            self.voice.stop()
+            self.voice = None
+        self.screens = []
+        self.screen_module = None
+        self.modules = {}
+        self.handlers = {}
+        self.prefetched = {}
+        self.active_dialog = None
+        self.changed_units = set()
+        self.touched_units = set()
+        self._pending_persist_units = set()
+        for cache in ('_screen_copy', '_shared_roots_cache'):
+            self.__dict__.pop(cache, None)
+        self.hibernated = True
+
+    def wake(self, screen = None):
+        """Load the screens saved by hibernate and restore the state of their
+        units, False if there is nothing saved for the session."""
+        self.hibernated = False
+        db = self._persist_db()
+        saved = db.hibernated_screens() if db else None
+        if not saved:
+            return False
+        for file in saved['files']:
+            if self._screen_info(file) and not any(module.__file__.endswith(file) for module in self.screens):
+                self.screens.append(self.load_screen(file))
+        if not self.screens:
+            return False
+        self.screens.sort(key=lambda item: item.screen.order)
+        for module in self.screens:
+            self._finish_loaded_screen(module)
+        db.restore_hibernated(self, self.screens)
+        current = screen or saved['current']
+        self.screen_module = next((module for module in self.screens if module.screen.name == current),
+            None) or (current and self.ensure_screen(current)) or self.screens[0]
+        self._screen_has_persist = self._screen_has_persist_targets(self.screen_module)
+        return True
+
     async def delete(self):
         if self.voice:
             self.voice.stop()
@@ -164,6 +242,15 @@ class User(ModulesMixin, UserPersistMixin):
     def screen(self):
         return self.screen_module.screen if self.screen_module else empty_app
 
+    @property
+    def screen_module(self):
+        return self._screen_module
+
+    @screen_module.setter
+    def screen_module(self, module):
+        self._screen_module = module
+        Unishare.sessions.shown(self)
+
     def set_screen(self, name):
         return self.screen_process(ArgObject(block = 'root', element = None, value = name, screen_type = True))
 
@@ -177,6 +264,17 @@ class User(ModulesMixin, UserPersistMixin):
         self._screen_has_persist = self._screen_has_persist_targets(self.screen_module)
 
     async def result4message(self, message):
+        self.last_activity = None
+        try:
+            if self.hibernated:
+                if not self.wake(): #the snapshot was taken by a reconnection or its screens are gone
+                    self.load_lazy()
+                self.changed_units.add(self.screen) #the client gets the screen as it is now
+            return await self.message_result(message)
+        finally:
+            self.last_activity = time.monotonic()
+
+    async def message_result(self, message):
         result = None
         self.last_message = message
         if dialog := self.active_dialog:
@@ -213,17 +311,37 @@ class User(ModulesMixin, UserPersistMixin):
         if m := self.last_message:
             if m.event == 'modify' and m.element == unit.name and (epath :=
                 self.find_path(unit)) and m.block == strpath(epath):
+                if changes_layout(unit, property):
+                    self._layout_changed()
                 return False
             if m.element != unit.name or property != m.event or value != m.value:
                 self.changed_units.add(unit)
         if is_value_change and getattr(unit, 'type', None) == 'block':
             self._refresh_parents_for_block(unit, value)
+        # after any find_path above: the new layout only lands once this returns
+        if changes_layout(unit, property):
+            self._layout_changed()
 
     @property
     def blocks(self):
         return [self.active_dialog, *self.screen.blocks] if self.active_dialog and \
             self.active_dialog.value else self.screen.blocks
 
+    def _layout_index(self):
+        """(paths, block_paths, elements) of the current screen, see index_layout"""
+        screen = self.screen
+        index = screen.__dict__.get('_layout_index')
+        if index is None:
+            index = index_layout(screen.blocks, screen.toolbar)
+            object.__setattr__(screen, '_layout_index', index)
+        return index
+
+    def _layout_changed(self):
+        """the screens of the session (shared with its reflections) index their
+        layout again on the next lookup, the screens of other sessions keep theirs"""
+        for module in self.screens:
+            module.screen.__dict__.pop('_layout_index', None)
+
     def find_element(self, message):
         elname = message.element
         mb = message.block
@@ -231,27 +349,44 @@ class User(ModulesMixin, UserPersistMixin):
             for e in self.screen.toolbar:
                 if e.name == elname:
                     return e
+        elif self.active_dialog and self.active_dialog.value:
+            return self._scan_element(message)
         else:
-            blnames = message.block.split('@')
-            root_block_name = blnames[-1]
-            for bl in flatten(self.blocks):
-                if bl.name == root_block_name:
-                    for blname in blnames[-2::-1]: #reverse for searching nested blocks
+            _, block_paths, elements = self._layout_index()
+            bl = block_paths.get(mb)
+            if bl is not None:
+                return elements.get((bl, elname)) if elname else bl
+
+    def _scan_element(self, message):
+        """find_element by walking self.blocks, used while a dialog is open"""
+        elname = message.element
+        blnames = message.block.split('@')
+        root_block_name = blnames[-1]
+        for bl in flatten(self.blocks):
+            if bl.name == root_block_name:
+                for blname in blnames[-2::-1]: #reverse for searching nested blocks
+                    for c in flatten(bl.value):
+                        if c.name == blname and c.type == 'block':
+                            bl = c
+                            break
+                    else:
+                        return None
+                else:
+                    if elname:
                         for c in flatten(bl.value):
-                            if c.name == blname and c.type == 'block':
-                                bl = c
-                                break
-                        else:
-                            return None
+                            if c.name == elname:
+                                return c
                     else:
-                        if elname:
-                            for c in flatten(bl.value):
-                                if c.name == elname:
-                                    return c
-                        else:
-                            return bl
+                        return bl
 
     def find_path(self, elem) -> list:
+        if isinstance(elem, Unit) and not (self.active_dialog and self.active_dialog.value):
+            path = self._layout_index()[0].get(elem)
+            return list(path) if path else None
+        return self._scan_path(elem)
+
+    def _scan_path(self, elem) -> list:
+        """find_path by walking self.blocks, used while a dialog is open"""
         def find_in_block(block, elem, path):
             # No `if block == elem: ...` check here on purpose: every call
             # site below (the loop right under this closure, and the
@@ -312,6 +447,7 @@ class User(ModulesMixin, UserPersistMixin):
             children = new_value if new_value is not None else getattr(block, 'value', None)
             if children is not None:
                 fill_parents(children, block, parents)
+        self._layout_changed()
         # a block's children just changed (e.g. ParamBlock.params rebuilt them) — any
         # cached keyed-persist unit list/unit_map for this screen may now be stale
         self._invalidate_keyed_persist_cache()
@@ -369,6 +505,8 @@ class User(ModulesMixin, UserPersistMixin):
                     self.changed_units.update(raw)
                     raw = Message(*self.sorted_changed_units, user = self)
                 case _: ...
+            if isinstance(raw, Message) and hasattr(raw, 'updates'):
+                self._set_deltas(raw)
         if persist:
             self._save_persist_if_needed(persist_units)
             self._pending_persist_units = set()
@@ -378,6 +516,35 @@ class User(ModulesMixin, UserPersistMixin):
         self.touched_units.clear()
         return raw
 
+    def _set_deltas(self, message):
+        """an update of a unit changed only in some properties (units.note_delta)
+        carries only them if the client accepts that"""
+        for update in message.updates:
+            unit = update['data']
+            delta = take_delta(unit) if isinstance(unit, Unit) else None
+            if delta and self.delta_updates:
+                update['delta'] = delta
+            else:
+                update.pop('delta', None)
+
+    def encode_screen(self, screen) -> str:
+        """JSON of a full screen where a block serialized exactly as when the client
+        last got this screen is replaced by a {"type": "reuse", "name": <block name>} marker"""
+        plain = to_plain(screen)
+        sent = self.sent_blocks.setdefault(screen.name, {})
+        def reuse(blocks):
+            for i, block in enumerate(blocks):
+                if isinstance(block, list):
+                    reuse(block)
+                elif isinstance(block, dict) and 'name' in block:
+                    digest = hash(dumps(block))
+                    if sent.get(block['name']) == digest:
+                        blocks[i] = {'type': 'reuse', 'name': block['name']}
+                    else:
+                        sent[block['name']] = digest
+        reuse(plain.get('blocks', []))
+        return dumps(plain)
+
     def screen_process(self, message):
         screen_change_message = message.screen and self.screen.name != message.screen
         if screen_change_message or message.screen_type:
@@ -492,18 +659,103 @@ class User(ModulesMixin, UserPersistMixin):
                         dbshare[elem.id][screen.name].append({'element': elem.name, 'block': block.name})
 
     async def sync_dbupdates(self):
-        sync_calls = []
-        for id, updates in dbupdates.items():
-            for update in updates:
-                if update:
-                    screen2el_bl = dbshare[id]
-                    exclude = update.get('exclude', False)
-                    for user in Unishare.sessions.values():
-                        if not exclude or user is not self:
-                            scr_name = user.screen.name
-                            if scr_name in screen2el_bl:
-                                for elem_block in screen2el_bl[scr_name]:
-                                    update4user = {**update, **elem_block}
-                                    sync_calls.append(user.send(update4user))
+        await dbbus.publish(dbupdates)
+        deliveries = dbupdate_deliveries(dbupdates, self)
         dbupdates.clear()
-        await asyncio.gather(*sync_calls)
\ No newline at end of file
+        await fan_out(deliveries)
+        await receive_dbupdates()
+
+def changes_layout(unit, property) -> bool:
+    """a change of property ('changed' for value, None for the whole unit) can move
+    units of the screen: renames, block contents and the blocks or toolbar of a screen"""
+    if property in ('name', None):
+        return True
+    unit_type = getattr(unit, 'type', None)
+    return unit_type == 'block' and property == 'changed' or \
+        unit_type == 'screen' and property in ('blocks', 'toolbar')
+
+def dbupdate_deliveries(updates, sender = None):
+    """(payload, recipients) of updates (db id -> updates) for fan_out: the sessions
+    showing the updated data, except the sender for an update marked 'exclude'.
+    They are found through the screens of a db id in dbshare and the sessions of
+    a screen in Unishare.sessions.showing, other sessions are not visited."""
+    showing = Unishare.sessions.showing
+    deliveries = []
+    for id, id_updates in updates.items():
+        for scr_name, elem_blocks in dbshare.get(id, {}).items():
+            #a hibernated session reloads its screen from the database on wake
+            subscribers = [user for user in showing.get(scr_name, ()) if not user.hibernated]
+            if not subscribers:
+                continue
+            others = [user for user in subscribers if user is not sender]
+            for update in id_updates:
+                if update:
+                    recipients = others if update.get('exclude', False) else subscribers
+                    for elem_block in elem_blocks:
+                        deliveries.append(({**update, **elem_block}, recipients))
+    return deliveries
+
+async def deliver_dbupdates(updates):
+    """deliver updates (db id -> updates) made by another process: the tables of
+    this one drop the rows they cached and the sessions showing them get them"""
+    if db := Unishare.db:
+        for id, id_updates in updates.items():
+            if table := db.tables.get(id):
+                table.refresh(id_updates)
+    await fan_out(dbupdate_deliveries(updates))
+
+async def receive_dbupdates():
+    """deliver the updates published to config.dbbus by the other processes"""
+    updates = await dbbus.receive()
+    if updates is None:
+        await refresh_dbtables()
+    elif updates:
+        await deliver_dbupdates(updates)
+
+async def refresh_dbtables():
+    """updates of other processes were lost: every table is read again and the
+    sessions showing it get its first rows"""
+    updates = {}
+    if db := Unishare.db:
+        for id, table in list(db.tables.items()):
+            table.refresh()
+            _, rows = await table.list.aget_delta_chunk(0)
+            updates[id] = [dict(type = 'action', update = 'updates', index = 0,
+                data = rows or [], length = table.length)]
+    await fan_out(dbupdate_deliveries(updates))
+
+async def dbbus_polling(interval):
+    """the background task of config.dbbus"""
+    while True:
+        await asyncio.sleep(interval)
+        await receive_dbupdates()
+
+def hibernate_idle(timeout):
+    """hibernate the sessions which have not had a message for timeout seconds"""
+    deadline = time.monotonic() - timeout
+    return [user for user in list(Unishare.sessions.values()) if user.last_activity is not None
+        and user.last_activity < deadline and user.can_hibernate and user.hibernate()]
+
+async def hibernation(timeout):
+    """the background task of config.hibernate"""
+    while True:
+        await asyncio.sleep(timeout / 2)
+        hibernate_idle(timeout)
+
+fan_out_limit = 256 #sends of a fan_out in flight at once
+
+async def fan_out(deliveries):
+    """deliveries is an iterable of (payload, recipients): every payload is encoded
+    once and the same text is sent to all its recipients concurrently, at most
+    fan_out_limit sends at once, so a large audience does not start a send
+    per session in one go"""
+    semaphore = asyncio.BoundedSemaphore(fan_out_limit)
+    async def send(user, text):
+        async with semaphore:
+            await user.send(text)
+    sends = []
+    for payload, recipients in deliveries:
+        if recipients:
+            text = payload if type(payload) == str else toJson(payload)
+            sends.extend(send(user, text) for user in recipients)
+    await asyncio.gather(*sends)
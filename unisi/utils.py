@@ -1,7 +1,8 @@
 # Copyright © 2024 UNISI Tech. All rights reserved.
 import os, sys, types, tempfile, atexit, shutil, platform, requests, logging
-from .common import set_defaults
+from .common import set_defaults, flatten, strpath
 from .containers import Screen
+from . import units
 
 blocks_dir = 'blocks'        
 screens_dir =  'screens'        
@@ -70,6 +71,16 @@ set_defaults(config,  dict(
     public_dirs = [],
     debug = False,
     session = None,
+    pipeline = 0,
+    outbox = 0,
+    compress = True,
+    tracking = 'proxy',
+    shared_screens = False,
+    prefetch = 0,
+    hibernate = 0,
+    workers = 1,
+    dbbus = 0,
+    chunk_cache = 100,
     image = 'icons/favicon-32x32.png'
 ))
 
@@ -87,6 +98,9 @@ Screen.defaults = dict(
     image = config.image
 )
 
+if config.tracking == 'observable':
+    units.track = units.observe
+
 if config.froze_time == 0:
     print('froze_time in config.py can not be 0!')
     config.froze_time = None
@@ -145,6 +159,31 @@ def fill_parents(value, parent, parents):
         if getattr(value, 'type', None) == 'block' and hasattr(value, 'value'):
             fill_parents(value.value, value, parents)
 
+def index_layout(blocks, toolbar):
+    """Build the lookup maps of a screen layout in one pass:
+    paths {unit: path}, where path is the find_path() name list (unit first),
+    block_paths {'inner@...@root': block} and elements {(block, name): unit}.
+    The first occurrence wins everywhere, the same as a depth-first scan."""
+    paths, block_paths, elements = {}, {}, {}
+
+    def add_block(block, path):
+        block_paths.setdefault(strpath(path), block)
+        if isinstance(block.value, list | tuple):
+            for unit in flatten(block.value):
+                elements.setdefault((block, unit.name), unit)
+                if unit not in paths:
+                    unit_path = paths[unit] = [unit.name, *path]
+                    if unit.type == 'block':
+                        add_block(unit, unit_path)
+
+    for block in flatten(blocks):
+        if block not in paths:
+            paths[block] = [block.name]
+            add_block(block, paths[block])
+    for unit in toolbar:
+        paths.setdefault(unit, [unit.name, 'toolbar'])
+    return paths, block_paths, elements
+
 def py_files(directory):
     """Yield .py filenames in directory, excluding __init__.py."""
     if os.path.exists(directory):
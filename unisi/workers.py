@@ -0,0 +1,215 @@
+# Copyright © 2024 UNISI Tech. All rights reserved.
+"""
+Opt-in multi-process server, see config.workers.
+
+start() forks `workers` processes which serve the same port with SO_REUSEPORT,
+the kernel spreads new connections over them. The parent process only runs
+the bus: a Unix socket every worker is connected to, a line published by a
+worker is relayed to all the others.
+
+  * a session lives in the worker which created it. The workers publish the
+    sessions they create and delete, so each of them knows where the sessions
+    of the others are (`owners`);
+  * a connection to a session living in another worker -- joining it with
+    config.share, coming back with its ?session= -- is relayed to that worker
+    through the worker's own Unix socket, so reflections stay in one process.
+    With config.mirror every connection is relayed to worker 0, which has the
+    mirrored sessions;
+  * the dbupdates of a message are published after it is processed, the other
+    workers deliver them to their sessions showing the same data.
+
+A worker receiving dbupdates also refreshes its own Dbtable of the updated
+data (Dbtable.refresh), so the Dblist chunks they touch are read again from
+the database.
+The workers do not watch the screen files: serve() turns config.hot_reload off.
+"""
+import asyncio, json, logging, multiprocessing, os, shutil, signal, socket, sys, tempfile, traceback
+import aiohttp
+from aiohttp import web, WSMsgType
+from .common import Unishare, toJson
+from .dbunits import dbupdates
+from .multimon import logging_lock
+from .users import deliver_dbupdates
+import config
+
+RELAYED = 'Unisi-Relayed'
+LINE_LIMIT = 2 ** 24 #a published line, updates of a whole table fit in it
+
+number = None #of this worker, None in a single process server
+directory = None #of the Unix sockets of the bus and the workers
+bus = None
+owners = {} #session id -> number of the worker it lives in, sessions of other workers
+
+def socket_path(name) -> str:
+    return os.path.join(directory, f'{name}.sock')
+
+class Bus:
+    """connection of a worker to the bus"""
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.handlers = dict(session = on_session, dbupdates = on_dbupdates)
+
+    def publish(self, kind, **data):
+        line = toJson(dict(data, kind = kind, worker = number)).encode() + b'\n'
+        if len(line) <= LINE_LIMIT:
+            self.writer.write(line)
+        elif kind == 'dbupdates' and (parts := split_updates(data['updates'])):
+            for part in parts:
+                self.publish(kind, updates = part)
+        else:
+            log(f'A {kind} publication of {len(line)} bytes is over the bus line limit, it is dropped.')
+
+    async def listen(self):
+        while True:
+            try:
+                if not (line := await read_line(self.reader)):
+                    return
+                message = json.loads(line)
+                await self.handlers[message['kind']](message)
+            except ConnectionError: #the bus is gone
+                return
+            except Exception: #a bad line or a failing handler: the next one is read
+                log(traceback.format_exc())
+
+async def read_line(reader) -> bytes:
+    """the next line of reader, b'' at its end; a line over LINE_LIMIT is
+    logged and skipped"""
+    skipping = False
+    while True:
+        try:
+            line = await reader.readuntil(b'\n')
+        except asyncio.IncompleteReadError as error: #the end
+            return b'' if skipping else error.partial
+        except asyncio.LimitOverrunError as error:
+            if not skipping:
+                log(f'A bus line over {LINE_LIMIT} bytes is skipped.')
+                skipping = True
+            await reader.readexactly(error.consumed)
+            continue
+        if not skipping:
+            return line
+        skipping = False
+
+def log(message):
+    with logging_lock:
+        logging.error(message)
+
+def split_updates(updates: dict) -> list | None:
+    """dbupdates (db id -> list of updates) in two halves, None for a single update"""
+    pairs = [(id, update) for id, id_updates in updates.items() for update in id_updates]
+    if len(pairs) < 2:
+        return None
+    parts = []
+    for half in (pairs[:len(pairs) // 2], pairs[len(pairs) // 2:]):
+        part = {}
+        for id, update in half:
+            part.setdefault(id, []).append(update)
+        parts.append(part)
+    return parts
+
+def publish(kind, **data):
+    """send data to the other workers, nothing in a single process server"""
+    if bus:
+        bus.publish(kind, **data)
+
+def publish_dbupdates():
+    if bus and dbupdates:
+        bus.publish('dbupdates', updates = {id: list(updates) for id, updates in dbupdates.items()})
+
+async def on_session(message):
+    session, worker = message['session'], message['worker']
+    if message['live']:
+        owners[session] = worker
+    elif owners.get(session) == worker:
+        del owners[session]
+
+async def on_dbupdates(message):
+    await deliver_dbupdates(message['updates'])
+
+def owner(request):
+    """number of the worker the websocket of request has to be relayed to,
+    None if it is served by this one"""
+    if bus is None or request.headers.get(RELAYED):
+        return None
+    if config.mirror:
+        return 0 if number else None
+    return owners.get(request.query.get('session'))
+
+async def relay(request, worker):
+    """serve the websocket of request by worker, passing the messages both ways"""
+    ws = web.WebSocketResponse(compress = config.compress is not False)
+    await ws.prepare(request)
+    connector = aiohttp.UnixConnector(socket_path(worker))
+    async with aiohttp.ClientSession(connector = connector) as client:
+        async with client.ws_connect(f'http://worker{request.path_qs}', headers = {RELAYED: '1'}) as target:
+            async def forward(source, sink):
+                async for msg in source:
+                    if msg.type == WSMsgType.TEXT:
+                        await sink.send_str(msg.data)
+                    elif msg.type == WSMsgType.BINARY:
+                        await sink.send_bytes(msg.data)
+                await sink.close()
+            await asyncio.gather(forward(ws, target), forward(target, ws))
+    return ws
+
+async def join_bus(app):
+    global bus
+    reader, writer = await asyncio.open_unix_connection(socket_path('bus'), limit = LINE_LIMIT)
+    bus = Bus(reader, writer)
+    app['bus_listener'] = asyncio.create_task(bus.listen())
+
+async def run_bus(hub):
+    writers = set()
+    async def connected(reader, writer):
+        writers.add(writer)
+        try:
+            while line := await read_line(reader):
+                for other in writers:
+                    if other is not writer:
+                        other.write(line)
+        except (asyncio.CancelledError, ConnectionError): #the bus is stopped
+            pass
+        finally:
+            writers.discard(writer)
+    server = await asyncio.start_unix_server(connected, sock = hub, limit = LINE_LIMIT)
+    async with server:
+        await server.serve_forever()
+
+def work(app, port, worker, hub):
+    global number
+    hub.close()
+    number = worker
+    if Unishare.db:
+        Unishare.db.connect()
+    app.on_startup.append(join_bus)
+    web.run_app(app, port = port, path = socket_path(worker), reuse_port = True,
+        print = print if worker == 0 else None)
+
+def serve(app, port, workers):
+    """fork workers serving app on port and run the bus until they are stopped"""
+    global directory
+    if config.hot_reload:
+        config.hot_reload = False
+        from . import reloader
+        if reloader.active_reloader:
+            reloader.observer.stop()
+        print('config.hot_reload is turned off, the screen files are not watched by the workers.')
+    directory = tempfile.mkdtemp(prefix = 'unisi_workers_')
+    hub = socket.socket(socket.AF_UNIX)
+    hub.bind(socket_path('bus'))
+    hub.listen(workers)
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target = work, args = (app, port, worker, hub)) for worker in range(workers)]
+    for process in processes:
+        process.start()
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit()) #stop the workers too
+    try:
+        asyncio.run(run_bus(hub))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+            process.join()
+        shutil.rmtree(directory, ignore_errors = True)